@@ -0,0 +1,88 @@
+"""aggregation of album (media_group_id) updates.
+
+Telegram delivers an album as one update per photo/video. Instead of
+handling each on its own, the handlers add them here: the items of an
+album are collected until no new one arrived for ALBUM_DEBOUNCE seconds,
+then handed over together, in message order, in one flush call. Items may
+be awaitables (e.g. a document still being converted to a photo); they
+are awaited before the flush.
+"""
+
+import asyncio
+import logging
+
+from config import ALBUM_DEBOUNCE
+
+logger = logging.getLogger(__name__)
+
+
+class _Album:
+    def __init__(self, flush):
+        self.flush = flush
+        # (message id, item or awaitable)
+        self.items = []
+        self.timer = None
+
+
+class AlbumBuffer:
+    """media_group_id -> items waiting to be flushed together."""
+
+    def __init__(self, delay=ALBUM_DEBOUNCE):
+        self.delay = delay
+        self._albums = {}
+        self._flushing = set()
+        self.albums = 0
+        self.updates = 0
+
+    def add(self, key, order, item, flush):
+        """add one update of the album ``key``.
+
+        ``order`` sorts the items (the message id), ``flush(items)`` is
+        awaited once per album with the items that did not resolve to None;
+        the first update's ``flush`` is used.
+        """
+        if asyncio.iscoroutine(item):
+            item = asyncio.ensure_future(item)
+        album = self._albums.get(key)
+        if album is None:
+            album = self._albums[key] = _Album(flush)
+        album.items.append((order, item))
+        self.updates += 1
+        if album.timer:
+            album.timer.cancel()
+        album.timer = asyncio.get_running_loop().call_later(self.delay, self._start_flush, key)
+
+    def _start_flush(self, key):
+        task = asyncio.ensure_future(self._flush(self._albums.pop(key)))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, album):
+        album.items.sort(key=lambda pair: pair[0])
+        items = []
+        for _, item in album.items:
+            if isinstance(item, asyncio.Future):
+                try:
+                    item = await item
+                except Exception as e:
+                    logger.error(f"Album item failed: {e}")
+                    continue
+            if item is not None:
+                items.append(item)
+        self.albums += 1
+        try:
+            await album.flush(items)
+        except Exception:
+            logger.exception("Album flush failed")
+
+    async def close(self):
+        """flush the albums that are still waiting."""
+        for key in list(self._albums):
+            self._albums[key].timer.cancel()
+            self._start_flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing)
+
+
+# shared by the media handlers
+album_buffer = AlbumBuffer()
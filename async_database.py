@@ -0,0 +1,99 @@
+"""async versions of the database.py helpers.
+
+Handlers run on the asyncio event loop, so a blocking sqlite call stalls
+every other user's update. Each helper here runs its database.py
+counterpart on a worker thread: reads go to a small pool of reader
+threads, writes are serialized on a single writer thread (sqlite only
+allows one writer at a time, so more writer threads would just wait on
+the lock). Keep this module in sync when adding helpers to database.py.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from config import DATABASE_READER_THREADS
+
+_readers = ThreadPoolExecutor(
+    max_workers=DATABASE_READER_THREADS, thread_name_prefix="db-reader"
+)
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+
+def _run_in(executor, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+def reader(func):
+    """wrap a read-only db helper to run on the reader threads."""
+    return _run_in(_readers, func)
+
+
+def writer(func):
+    """wrap a db helper that writes to run on the writer thread."""
+    return _run_in(_writer, func)
+
+
+def shutdown():
+    """wait for queued queries and stop the worker threads."""
+    _writer.shutdown(wait=True)
+    _readers.shutdown(wait=True)
+
+
+# post media
+get_post_media = reader(database.get_post_media)
+get_media_summaries = reader(database.get_media_summaries)
+get_posts_using_file = reader(database.get_posts_using_file)
+
+# scheduled posts
+job_id_for_post = database.job_id_for_post  # no db access
+get_scheduled_posts = reader(database.get_scheduled_posts)
+get_scheduled_posts_page = reader(database.get_scheduled_posts_page)
+get_scheduled_post_by_id = reader(database.get_scheduled_post_by_id)
+get_scheduled_post_for_job = reader(database.get_scheduled_post_for_job)
+get_upcoming_posts = reader(database.get_upcoming_posts)
+get_job_id_by_post_id = reader(database.get_job_id_by_post_id)
+save_scheduled_post = writer(database.save_scheduled_post)
+update_scheduled_post = writer(database.update_scheduled_post)
+delete_scheduled_post = writer(database.delete_scheduled_post)
+
+# published posts
+save_published_post = writer(database.save_published_post)
+get_published_post = reader(database.get_published_post)
+update_published_post = writer(database.update_published_post)
+get_published_posts_by_user = reader(database.get_published_posts_by_user)
+get_published_posts_page = reader(database.get_published_posts_page)
+
+# publish attempts
+start_publish_attempt = writer(database.start_publish_attempt)
+finish_publish_attempt = writer(database.finish_publish_attempt)
+get_publish_attempts = reader(database.get_publish_attempts)
+recover_interrupted_attempts = writer(database.recover_interrupted_attempts)
+
+# publish ledger
+claim_publish = writer(database.claim_publish)
+mark_publish_sent = writer(database.mark_publish_sent)
+release_publish_claim = writer(database.release_publish_claim)
+get_open_claims = reader(database.get_open_claims)
+get_publish_ledger = reader(database.get_publish_ledger)
+
+# telegraph url cache
+get_telegraph_url = reader(database.get_telegraph_url)
+save_telegraph_url = writer(database.save_telegraph_url)
+
+# photos converted from image documents
+get_converted_photo = reader(database.get_converted_photo)
+save_converted_photo = writer(database.save_converted_photo)
+
+# media metadata cache
+get_media_metadata = reader(database.get_media_metadata)
+get_media_metadata_by_file_id = reader(database.get_media_metadata_by_file_id)
+save_media_metadata = writer(database.save_media_metadata)
@@ -0,0 +1,117 @@
+"""Handler latency under concurrent writes: sync sqlite calls vs async_database.
+
+Simulates handlers that run one read query each while a few background
+tasks keep inserting scheduled posts at a fixed rate. Latency is measured
+from the moment a handler was due to start until it finished, so time spent
+waiting for a blocked event loop counts too.
+
+Local disks (and tmpfs) often make commits look free, so every write also
+sleeps for --disk-ms inside the write call to model a slow fsync. Each mode
+gets a fresh, identically seeded database.
+
+    python benchmarks/bench_async_db.py [--handlers 1000] [--writers 4] [--disk-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_database  # noqa: E402
+import database  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def slow_save(disk_seconds, *args):
+    database.save_scheduled_post(*args)
+    time.sleep(disk_seconds)
+
+
+def seed(users, posts_per_user):
+    for user_id in range(users):
+        for i in range(posts_per_user):
+            database.save_scheduled_post(
+                user_id, "x" * 200, None, None, None, datetime.now(), "@bench"
+            )
+
+
+async def run(mode, args):
+    stop = asyncio.Event()
+    disk_seconds = args.disk_ms / 1000
+    async_slow_save = async_database.writer(slow_save)
+
+    async def write_loop(worker):
+        while not stop.is_set():
+            save_args = (
+                worker,
+                "x" * 200,
+                None,
+                None,
+                [{"text": "b", "url": "https://example.com"}],
+                datetime.now(),
+                "@bench",
+            )
+            if mode == "sync":
+                slow_save(disk_seconds, *save_args)
+            else:
+                await async_slow_save(disk_seconds, *save_args)
+            await asyncio.sleep(args.write_interval_ms / 1000)
+
+    async def handler(user_id, due):
+        if mode == "sync":
+            database.get_scheduled_posts(user_id)
+        else:
+            await async_database.get_scheduled_posts(user_id)
+        return time.perf_counter() - due
+
+    write_tasks = [asyncio.create_task(write_loop(w)) for w in range(args.writers)]
+    tasks = []
+    start = time.perf_counter()
+    for i in range(args.handlers):
+        due = start + i * args.interval_ms / 1000
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handler(1000 + i % 10, due)))
+    latencies = await asyncio.gather(*tasks)
+    stop.set()
+    await asyncio.gather(*write_tasks)
+    return [lat * 1000 for lat in latencies]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    parser.add_argument("--write-interval-ms", type=float, default=10.0)
+    parser.add_argument("--disk-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as tmp:
+            database.init_db(os.path.join(tmp, "bench.db"))
+            seed(users=1010, posts_per_user=20)
+            latencies = asyncio.run(run(mode, args))
+            database.close_db()
+        print(
+            f"{mode:>5}: p50={statistics.median(latencies):7.2f}ms "
+            f"p99={percentile(latencies, 99):7.2f}ms "
+            f"max={max(latencies):7.2f}ms"
+        )
+    async_database.shutdown()
+
+
+if __name__ == "__main__":
+    main()
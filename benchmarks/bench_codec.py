@@ -0,0 +1,48 @@
+"""Decode cost of stored media/buttons: legacy str()+literal_eval vs post_codec.
+
+    python benchmarks/bench_codec.py [--items 10] [--number 20000]
+"""
+
+import argparse
+import ast
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from post_codec import decode_buttons, decode_media, encode_buttons, encode_media  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    media = [
+        {"file_id": f"AgACAgIAAxkBAAI{i:04d}" + "x" * 60, "type": "photo"}
+        for i in range(args.items)
+    ]
+    buttons = [{"text": f"Button {i}", "url": f"https://example.com/{i}"} for i in range(3)]
+
+    legacy_media = str(media)
+    legacy_buttons = str(buttons)
+    canonical_media = encode_media(media)
+    canonical_buttons = encode_buttons(buttons)
+
+    cases = [
+        ("media   eval (legacy)", lambda: eval(legacy_media)),
+        ("media   literal_eval (legacy)", lambda: ast.literal_eval(legacy_media)),
+        ("media   decode_media (legacy row)", lambda: decode_media(legacy_media)),
+        ("media   decode_media (canonical)", lambda: decode_media(canonical_media)),
+        ("buttons literal_eval (legacy)", lambda: ast.literal_eval(legacy_buttons)),
+        ("buttons decode_buttons (canonical)", lambda: decode_buttons(canonical_buttons)),
+    ]
+    for name, func in cases:
+        seconds = timeit.timeit(func, number=args.number)
+        print(f"{name:<36} {seconds / args.number * 1e6:8.2f} us/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Scheduling a large backlog: APScheduler jobs vs the due-post dispatcher.
+
+Seeds a backlog of --posts scheduled posts lying days ahead and schedules
+it with each approach, then adds --due new posts that fire within a few
+seconds:
+
+  apscheduler-legacy  one in-memory "date" job per post holding a copy of
+                      post_data (how the bot scheduled posts originally)
+  apscheduler         one persistent job per post in SQLiteJobStore, added
+                      in bulk by reconcile_jobs (SCHEDULER_MODE=apscheduler)
+  dispatcher          DuePostDispatcher (SCHEDULER_MODE=dispatcher)
+
+Reports the resident memory added by scheduling and the lag between each
+due post's publish_time and the moment the (stubbed) send ran. Every mode
+runs in a fresh subprocess so RSS numbers do not mix.
+
+    python benchmarks/bench_dispatcher.py [--posts 100000] [--due 500]
+"""
+
+import argparse
+import asyncio
+import copy
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("apscheduler-legacy", "apscheduler", "dispatcher")
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+TEXT = "Scheduled post body " * 20
+
+
+def insert_posts(database, times, prefix):
+    rows = [
+        (1, TEXT, "photo", None, str(publish_time), "@bench", f"{prefix}_{i}")
+        for i, publish_time in enumerate(times)
+    ]
+    with database.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO scheduled_posts (user_id, text, media_type, buttons, publish_time, channel_id, job_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        return conn.execute(
+            "SELECT id, job_id, publish_time FROM scheduled_posts WHERE job_id LIKE ? ORDER BY publish_time",
+            (f"{prefix}_%",),
+        ).fetchall()
+
+
+async def run_mode(mode, args):
+    import database
+    import scheduled_jobs
+    from publish_queue import PublishQueue
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    tmp = tempfile.mkdtemp()
+    database.init_db(os.path.join(tmp, "bench.db"))
+    now = datetime.now()
+    backlog = insert_posts(
+        database,
+        [now + timedelta(days=1, seconds=i) for i in range(args.posts - args.due)],
+        "backlog",
+    )
+
+    fired = []
+
+    async def send_post_job(channel_id, post_data, user_id, context=None, **kwargs):
+        fired.append(time.time())
+
+    class Bot:
+        class post_handlers:
+            pass
+
+        publish_queue = PublishQueue()
+
+    Bot.post_handlers.send_post_job = staticmethod(send_post_job)
+    scheduled_jobs.setup(Bot)
+
+    post_data = {
+        "text": TEXT,
+        "media": [{"file_id": "AgACAgIAAxkBAAI" + "x" * 60, "type": "photo"}],
+        "buttons": [{"text": "Open", "url": "https://example.com"}],
+        "layout": "photo_top",
+    }
+
+    def legacy_add(scheduler, job_id, publish_time):
+        scheduler.add_job(
+            send_post_job,
+            "date",
+            run_date=datetime.fromisoformat(str(publish_time)),
+            args=["@bench", copy.deepcopy(post_data), 1],
+            id=job_id,
+        )
+
+    # schedule the backlog the way each mode does at startup
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    if mode == "apscheduler-legacy":
+        scheduler = AsyncIOScheduler()
+        scheduler.start()
+        for _, job_id, publish_time in backlog:
+            legacy_add(scheduler, job_id, publish_time)
+    elif mode == "apscheduler":
+        from jobstore import SQLiteJobStore
+
+        jobstore = SQLiteJobStore()
+        scheduler = AsyncIOScheduler(jobstores={"default": jobstore})
+        scheduled_jobs.reconcile_jobs(scheduler, jobstore)
+        scheduler.start()
+    else:
+        from dispatcher import DuePostDispatcher
+
+        dispatcher = DuePostDispatcher()
+        dispatcher.start()
+    await asyncio.sleep(0.2)
+    setup_seconds = time.perf_counter() - t0
+    added_rss = rss_mb() - base_rss
+
+    # new posts due soon arrive while the backlog is scheduled
+    start = datetime.now() + timedelta(seconds=args.lead)
+    due = insert_posts(
+        database,
+        [start + timedelta(seconds=2 * i / args.due) for i in range(args.due)],
+        "due",
+    )
+    for post_id, job_id, publish_time in due:
+        run_date = datetime.fromisoformat(str(publish_time))
+        if mode == "apscheduler-legacy":
+            legacy_add(scheduler, job_id, publish_time)
+        elif mode == "apscheduler":
+            scheduled_jobs.schedule_post(scheduler, job_id, post_id, run_date)
+        else:
+            dispatcher.notify(post_id, run_date)
+
+    deadline = time.time() + args.lead + 2 + args.timeout
+    while len(fired) < args.due and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    if mode == "dispatcher":
+        await dispatcher.stop()
+    else:
+        scheduler.shutdown(wait=False)
+
+    due_times = sorted(datetime.fromisoformat(str(p)).timestamp() for _, _, p in due)
+    lag_ms = [(f - d) * 1000 for f, d in zip(sorted(fired), due_times)]
+    print(
+        f"{mode:<20} setup={setup_seconds:6.2f}s rss=+{added_rss:7.1f}MB "
+        f"fired={len(fired)}/{args.due} "
+        f"lag p50={statistics.median(lag_ms) if lag_ms else float('nan'):7.1f}ms "
+        f"p99={percentile(lag_ms, 99) if lag_ms else float('nan'):7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--due", type=int, default=500)
+    parser.add_argument("--lead", type=float, default=3.0, help="seconds before the first post is due")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run_mode(args.mode, args))
+        return
+
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode]
+            + ["--posts", str(args.posts), "--due", str(args.due)]
+            + ["--lead", str(args.lead), "--timeout", str(args.timeout)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Image documents converted to photos: old handler code vs photo_converter.
+
+Sends --albums albums of --album-size image documents through both paths
+with a stub Telegram bot (every call takes --api-latency seconds):
+
+  old  get_file, download_to_drive, send_photo from the file, delete the
+       message, os.remove (how MediaHandler converted documents)
+  new  photo_converter.PhotoConverter: in-memory download, batched
+       deleteMessages, results reused by file_unique_id
+
+--repeat sends the same albums again (an author re-adding files), which
+the new path serves from its cache. Reports time per album, Bot API calls
+and bytes written to disk.
+
+    python benchmarks/bench_document_photos.py [--albums 20] [--album-size 10]
+        [--api-latency 0.05] [--repeat 1]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+import photo_converter  # noqa: E402
+
+
+def make_photo(seed):
+    from PIL import Image
+
+    img = Image.effect_noise((1600, 1200), 20 + seed).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+class Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TelegramFile:
+    def __init__(self, bot, data):
+        self.bot = bot
+        self.data = data
+
+    async def download_to_memory(self, out):
+        await self.bot.call("download")
+        out.write(self.data)
+
+    async def download_to_drive(self):
+        await self.bot.call("download")
+        fd, path = tempfile.mkstemp(suffix=".jpg")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self.data)
+        self.bot.disk_bytes += len(self.data)
+        return path
+
+
+class StubBot:
+    """the Bot API calls made while converting documents."""
+
+    def __init__(self, photos, latency):
+        self.photos = photos
+        self.latency = latency
+        self.calls = Counter()
+        self.disk_bytes = 0
+        self._next_id = 0
+
+    async def call(self, name):
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency)
+
+    async def get_file(self, file_id):
+        await self.call("get_file")
+        return TelegramFile(self, self.photos[file_id])
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        await self.call("send_photo")
+        if hasattr(photo, "read"):
+            photo.read()
+        self._next_id += 1
+        message = Obj(message_id=self._next_id, delete=self._delete_one)
+        message.photo = [
+            Obj(
+                file_id=f"photo_{self._next_id}",
+                file_unique_id=f"photo_unique_{self._next_id}",
+                width=1280,
+                height=960,
+                file_size=200_000,
+            )
+        ]
+        return message
+
+    async def _delete_one(self):
+        await self.call("delete_message")
+
+    async def delete_messages(self, chat_id, message_ids):
+        await self.call("delete_messages")
+
+
+async def old_convert(bot, chat_id, document):
+    file = await bot.get_file(document.file_id)
+    file_path = await file.download_to_drive()
+    with open(file_path, "rb") as photo_file:
+        sent_photo = await bot.send_photo(chat_id=chat_id, photo=photo_file)
+    source = sent_photo.photo[-1]
+    await sent_photo.delete()
+    os.remove(file_path)
+    return source.file_id
+
+
+async def run(args, photos, mode):
+    database.init_db(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    bot = StubBot({}, args.api_latency)
+    converter = photo_converter.PhotoConverter(delete_delay=0.5)
+
+    async def convert(document):
+        if mode == "old":
+            return await old_convert(bot, 1, document)
+        return (await converter.convert(bot, 1, document))["file_id"]
+
+    albums = [
+        [
+            Obj(
+                file_id=f"doc_{a}_{i}",
+                file_unique_id=f"doc_unique_{a}_{i}",
+                file_name=f"IMG_{i}.jpg",
+                mime_type="image/jpeg",
+            )
+            for i in range(args.album_size)
+        ]
+        for a in range(args.albums)
+    ]
+    for album in albums:
+        for i, document in enumerate(album):
+            bot.photos[document.file_id] = photos[i % len(photos)]
+
+    start = time.perf_counter()
+    for _ in range(1 + args.repeat):
+        for album in albums:
+            # PTB hands the documents of an album over one update at a time
+            for document in album:
+                await convert(document)
+    took = time.perf_counter() - start
+    await converter.close()
+    database.close_db()
+
+    total = args.albums * (1 + args.repeat)
+    calls = sum(bot.calls.values())
+    print(
+        f"{mode:<4} {took / total * 1000:7.1f}ms/album "
+        f"api calls={calls} ({calls / total:.1f}/album: "
+        + ", ".join(f"{name}={count}" for name, count in sorted(bot.calls.items()))
+        + f") disk={bot.disk_bytes / 1e6:.1f}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--albums", type=int, default=20)
+    parser.add_argument("--album-size", type=int, default=10)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    photos = [make_photo(i) for i in range(5)]
+    for mode in ("old", "new"):
+        asyncio.run(run(args, photos, mode))
+
+
+if __name__ == "__main__":
+    main()
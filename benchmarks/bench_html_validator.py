@@ -0,0 +1,121 @@
+"""detect_parse_mode on ~4 KB posts: old regex validator vs the tokenizer.
+
+  old  24 substring checks, then two findall passes per supported tag and
+       a re.search over the whole prefix for every closing tag (how
+       utils._is_valid_html_markup worked)
+  new  utils.analyze_markup: one precompiled tokenizer pass with a stack
+
+Posts: formatted HTML (many short tags), one long <pre> block, Markdown
+and plain text, each about --size bytes. Reports microseconds per call
+and checks that both agree on the parse mode.
+
+    python benchmarks/bench_html_validator.py [--size 4096] [--number 2000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import detect_parse_mode  # noqa: E402
+
+
+def old_is_valid_html_markup(sample):
+    normalized = re.sub(r"<a\s+[^>]*>", "<a>", sample, flags=re.IGNORECASE)
+    paired_tags = [
+        "b", "strong", "i", "em", "u", "s", "strike", "code",
+        "pre", "a", "tg-spoiler", "blockquote",
+    ]
+    for tag in paired_tags:
+        opens = len(re.findall(fr"<\s*{tag}\s*>", normalized, flags=re.IGNORECASE))
+        closes = len(re.findall(fr"</\s*{tag}\s*>", normalized, flags=re.IGNORECASE))
+        if opens != closes:
+            return False
+    for m in re.finditer(r"</\s*([a-zA-Z\-]+)\s*>", normalized):
+        tag = m.group(1).lower()
+        if tag in paired_tags:
+            before = normalized[: m.start()]
+            if not re.search(fr"<\s*{tag}\b", before, flags=re.IGNORECASE):
+                return False
+    return True
+
+
+_OLD_HINTS = [
+    "<b>", "</b>", "<strong>", "</strong>", "<i>", "</i>", "<em>", "</em>",
+    "<u>", "</u>", "<s>", "</s>", "<strike>", "</strike>", "<a href=", "</a>",
+    "<code>", "</code>", "<pre>", "</pre>", "<tg-spoiler>", "</tg-spoiler>",
+    "<blockquote>", "</blockquote>",
+]
+
+
+def old_detect_parse_mode(text):
+    if not text:
+        return None
+    sample = text.strip()
+    if any(hint in sample for hint in _OLD_HINTS):
+        return "HTML" if old_is_valid_html_markup(sample) else None
+    if (
+        "**" in sample
+        or "*" in sample
+        or "_" in sample
+        or "`" in sample
+        or "](" in sample
+        or sample.startswith("#")
+    ):
+        return "Markdown"
+    return None
+
+
+def make_posts(size):
+    words = "Lorem ipsum dolor sit amet consectetur adipiscing elit sed do".split()
+    formatted, plain, markdown = [], [], []
+    i = 0
+    while sum(map(len, plain)) < size:
+        word = words[i % len(words)]
+        formatted.append(
+            [
+                f"<b>{word}</b> ",
+                f"<i>{word}</i> ",
+                f'<a href="https://example.com/{i}">{word}</a> ',
+                f"<u><s>{word}</s></u> ",
+                f"{word} ",
+            ][i % 5]
+        )
+        plain.append(f"{word} ")
+        markdown.append(f"**{word}** " if i % 3 == 0 else f"{word} ")
+        i += 1
+    text = "".join(plain)
+    return {
+        "html": "".join(formatted)[:size].rsplit("<", 1)[0],
+        "pre": f"<pre>{text}</pre>",
+        "markdown": "".join(markdown),
+        "plain": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=4096)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, post in make_posts(args.size).items():
+        old, new = old_detect_parse_mode(post), detect_parse_mode(post)
+        assert old == new, (name, old, new)
+        times = {}
+        for label, func in (("old", old_detect_parse_mode), ("new", detect_parse_mode)):
+            took = min(timeit.repeat(lambda: func(post), number=args.number, repeat=3))
+            times[label] = took / args.number * 1e6
+        print(
+            f"{name:<9} {len(post):5d} B  mode={str(new):<8} "
+            f"old={times['old']:8.1f}us new={times['new']:7.1f}us "
+            f"x{times['old'] / times['new']:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Event loop responsiveness while large photos are re-encoded.
+
+Processes --images photos of --megapixels each (the telegra.ph upload
+path: decode, LANCZOS resize, optimized JPEG) while a ticker measures
+how late the event loop wakes up from 10 ms sleeps, i.e. how long any
+other user's update would have waited:
+
+  inline   encode_jpeg() called on the event loop (the old behaviour)
+  thread   image_pool with IMAGE_EXECUTOR=thread
+  process  image_pool with IMAGE_EXECUTOR=process
+
+    python benchmarks/bench_image_pool.py [--images 6] [--megapixels 12]
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import image_pool  # noqa: E402
+
+TICK = 0.01
+
+
+def make_photo(megapixels, seed):
+    """a noisy gradient, roughly as hard to compress as a real photo."""
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    noise = Image.effect_noise((width, height), 40 + seed)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+async def ticker(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def run(mode, photos, args):
+    if mode != "inline":
+        image_pool.shutdown()
+        image_pool.IMAGE_EXECUTOR = mode
+        image_pool._slots = None
+        # start the workers before timing
+        await image_pool.to_jpeg(photos[0], 64)
+
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    async def process(data):
+        if mode == "inline":
+            return image_pool.encode_jpeg(data)
+        return await image_pool.to_jpeg(data)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(process(p) for p in photos))
+    took = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    image_pool.shutdown()
+
+    lags.sort()
+    print(
+        f"{mode:<8} total={took:6.2f}s out={sum(map(len, results)) / 1e6:5.1f}MB "
+        f"loop lag p50={statistics.median(lags):7.1f}ms "
+        f"p99={lags[int(0.99 * (len(lags) - 1))]:7.1f}ms max={lags[-1]:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--modes", default="inline,thread,process")
+    args = parser.parse_args()
+
+    photos = [make_photo(args.megapixels, i) for i in range(args.images)]
+    print(
+        f"{args.images} photos, {args.megapixels:g} MP, "
+        f"{sum(map(len, photos)) / 1e6:.1f}MB in, {image_pool.IMAGE_WORKERS} workers"
+    )
+    for mode in args.modes.split(","):
+        asyncio.run(run(mode, photos, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""photo_bottom publish path, offline.
+
+Publishes --posts single-photo posts in the photo_bottom layout through
+PreviewHandler.send_post_job with a stub Telegram bot (downloads and
+sends with simulated latency) and image_hosts.FakeHost, once per
+PHOTO_BOTTOM_MODE:
+
+  telegraph  download, re-encode, upload, send text with a link preview
+  native     one send_photo with show_caption_above_media
+
+--photos distinct photos are reused across the posts, so the telegra.ph
+url cache is exercised too (--photos equal to --posts disables reuse).
+Reports end-to-end publish latency, throughput, uploads, host errors
+(telegraph posts then fall back to a plain captioned photo) and cache
+hit rate.
+
+    python benchmarks/bench_photo_bottom.py [--posts 200] [--photos 20]
+        [--host-latency 0.3] [--error-rate 0.05] [--concurrency 8]
+        [--modes telegraph,native]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config  # noqa: E402
+import database  # noqa: E402
+import image_hosts  # noqa: E402
+import image_pool  # noqa: E402
+import telegraph_cache  # noqa: E402
+from handlers_files import preview_handler  # noqa: E402
+
+
+def make_photo(megapixels, seed):
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    img = Image.merge(
+        "RGB",
+        (
+            Image.effect_noise((width, height), 30 + seed),
+            Image.linear_gradient("L").resize((width, height)),
+            Image.effect_noise((width, height), 50),
+        ),
+    )
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+class Message:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class TelegramFile:
+    def __init__(self, data, file_unique_id, latency):
+        self.data = data
+        self.file_unique_id = file_unique_id
+        self.latency = latency
+
+    async def download_to_memory(self, out):
+        await asyncio.sleep(self.latency)
+        out.write(self.data)
+
+
+class StubBot:
+    """the Bot API calls made by the photo_bottom path."""
+
+    def __init__(self, photos, latency):
+        self.photos = photos
+        self.latency = latency
+        self.downloads = 0
+        self.sent = {"send_message": 0, "send_photo": 0}
+        self._next_id = 0
+
+    async def get_file(self, file_id):
+        await asyncio.sleep(self.latency)
+        self.downloads += 1
+        index = int(file_id.rsplit("_", 1)[1])
+        return TelegramFile(self.photos[index], f"unique_{index}", self.latency)
+
+    async def _send(self, kind, chat_id):
+        await asyncio.sleep(self.latency)
+        if not str(chat_id).isdigit():
+            self.sent[kind] += 1
+        self._next_id += 1
+        return Message(self._next_id)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self._send("send_message", chat_id)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        return await self._send("send_photo", chat_id)
+
+
+class StubChannelBot:
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def publishing_bot(self):
+        return self.bot
+
+
+async def run(args, photos, mode):
+    config.PHOTO_BOTTOM_MODE = mode
+    database.init_db(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    host = image_hosts.FakeHost(latency=args.host_latency, error_rate=args.error_rate, seed=1)
+    image_hosts.set_image_host(host)
+    cache = telegraph_cache.TelegraphCache()
+    preview_handler.telegraph_cache = cache
+
+    bot = StubBot(photos, args.api_latency)
+    handler = preview_handler.PreviewHandler(StubChannelBot(bot))
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def publish(i):
+        post = {
+            "text": f"Post {i} with a photo under the text",
+            "media": [
+                {
+                    "file_id": f"photo_{i % args.photos}",
+                    "file_unique_id": f"unique_{i % args.photos}",
+                    "type": "photo",
+                }
+            ],
+            "buttons": [],
+            "layout": "photo_bottom",
+        }
+        async with slots:
+            start = time.perf_counter()
+            await handler.send_post_job("@bench", post, 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(publish(i) for i in range(args.posts)))
+    took = time.perf_counter() - start
+    image_pool.shutdown()
+    database.close_db()
+
+    latencies.sort()
+    metrics = cache.metrics()
+    print(
+        f"{mode:<9} {args.posts} posts in {took:.2f}s ({args.posts / took:.1f}/s) "
+        f"latency p50={statistics.median(latencies):.0f}ms "
+        f"p99={latencies[int(0.99 * (len(latencies) - 1))]:.0f}ms"
+    )
+    print(
+        f"{'':<9} host uploads={host.uploads} errors={host.errors} "
+        f"downloads={bot.downloads} "
+        f"sent as text+preview={bot.sent['send_message']} photo={bot.sent['send_photo']} "
+        f"cache hit rate={metrics['hit_rate']:.0%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--megapixels", type=float, default=2)
+    parser.add_argument("--host-latency", type=float, default=0.3)
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--modes", default="telegraph,native")
+    args = parser.parse_args()
+    # simulated failures are expected, keep the output to the summary
+    logging.disable(logging.ERROR)
+
+    photos = [make_photo(args.megapixels, i) for i in range(args.photos)]
+    for mode in args.modes.split(","):
+        asyncio.run(run(args, photos, mode))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Publish latency of the first and the Nth scheduled post.
+
+Compares the two ways a scheduled post got its Bot:
+
+  per-send  Application.builder()...build().bot for every post (how
+            send_post_job worked without a context): a new HTTP client and
+            connection pool per post, never closed
+  shared    ChannelBot.publishing_bot(), the running Application's bot,
+            reused by every post
+
+Requests go to a local fake Bot API server. Real Telegram connections pay
+TCP and TLS handshakes (a few round trips); --connect-ms simulates that by
+delaying every new connection, --rtt-ms delays every response.
+
+    python benchmarks/bench_publish_latency.py [--posts 200] [--connect-ms 150] [--rtt-ms 40]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram.ext import Application  # noqa: E402
+
+TOKEN = "123456:bench"
+MESSAGE = {"message_id": 1, "date": 0, "chat": {"id": -1001, "type": "channel"}, "text": "x"}
+ME = {"id": 123456, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+
+
+class FakeBotApi:
+    """minimal keep-alive HTTP server answering like the Bot API."""
+
+    def __init__(self, connect_delay, rtt):
+        self.connect_delay = connect_delay
+        self.rtt = rtt
+        self.connections = 0
+        self.server = None
+        # handler task -> its connection
+        self._handlers = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/bot"
+
+    async def stop(self):
+        # per-send bots never close their clients, hang up on them
+        for writer in self._handlers.values():
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self._handlers[asyncio.current_task()] = writer
+        try:
+            await asyncio.sleep(self.connect_delay)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                method = request_line.split()[1].decode().rsplit("/", 1)[-1]
+                result = ME if method == "getMe" else MESSAGE
+                body = json.dumps({"ok": True, "result": result}).encode()
+                await asyncio.sleep(self.rtt)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+
+async def run(mode, args):
+    server = FakeBotApi(args.connect_ms / 1000, args.rtt_ms / 1000)
+    base_url = await server.start()
+
+    shared = None
+    if mode == "shared":
+        # what main does: one initialized Application, its bot reused
+        application = Application.builder().token(TOKEN).base_url(base_url).build()
+        await application.initialize()
+        shared = application.bot
+
+    latencies = []
+    for _ in range(args.posts):
+        start = time.perf_counter()
+        if shared is None:
+            bot = Application.builder().token(TOKEN).base_url(base_url).build().bot
+        else:
+            bot = shared
+        await bot.send_message(chat_id=-1001, text="Scheduled post")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if shared is not None:
+        await application.shutdown()
+    await server.stop()
+
+    rest = latencies[1:] or latencies
+    print(
+        f"{mode:<9} first={latencies[0]:7.1f}ms "
+        f"nth p50={statistics.median(rest):7.1f}ms "
+        f"max={max(rest):7.1f}ms "
+        f"connections={server.connections}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--connect-ms", type=float, default=150.0, help="simulated TCP+TLS setup")
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated response time")
+    args = parser.parse_args()
+    for mode in ("per-send", "shared"):
+        asyncio.run(run(mode, args))
+
+
+if __name__ == "__main__":
+    main()
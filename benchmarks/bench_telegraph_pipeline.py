@@ -0,0 +1,191 @@
+"""Peak memory of one telegra.ph upload: old pipeline vs the current one.
+
+  old  download_as_bytearray, BytesIO copy for Pillow, full-resolution
+       decode, LANCZOS resize, buf.getvalue(), multipart body built with
+       b'\\r\\n'.join (how utils.upload_photo_to_telegraph_by_file_id worked)
+  new  downloaded bytes kept as is, image_pool.encode_jpeg (draft/reduce
+       decode), multipart body streamed from memoryviews
+
+Each mode runs in a fresh subprocess; the photo is "downloaded" from and
+uploaded to a local HTTP server, which reports the size of the body it
+received. Peak memory is the growth of ru_maxrss over the process RSS
+right before the upload starts.
+
+    python benchmarks/bench_telegraph_pipeline.py [--megapixels 12] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import io
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOUNDARY = "----WebKitFormBoundarybench"
+
+
+def make_photo(megapixels):
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    noise = Image.effect_noise((width, height), 40)
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Server:
+    """serves the photo on GET, counts the body of every POST."""
+
+    def __init__(self, photo):
+        self.photo = photo
+        self.uploads = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def _serve(self, reader, writer):
+        request_line = await reader.readline()
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        if request_line.startswith(b"POST"):
+            received = 0
+            while received < length:
+                received += len(await reader.read(min(length - received, 1 << 16)))
+            self.uploads.append(received)
+            body = b'[{"src": "/file/bench.jpg"}]'
+        else:
+            body = self.photo
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+        await writer.drain()
+        writer.close()
+
+
+async def old_pipeline(client, base_url):
+    from PIL import Image
+
+    response = await client.get(base_url + "/photo.jpg")
+    file_bytes = bytearray()
+    file_bytes.extend(response.content)
+    del response
+
+    img = Image.open(io.BytesIO(file_bytes))
+    img = img.convert("RGB")
+    max_side = 1600
+    w, h = img.size
+    if max(w, h) > max_side:
+        ratio = max_side / max(w, h)
+        img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90, optimize=True)
+    jpeg_data = buf.getvalue()
+
+    body = b"\r\n".join(
+        [
+            f"--{BOUNDARY}".encode(),
+            b'Content-Disposition: form-data; name="file"; filename="image.jpg"',
+            b"Content-Type: image/jpeg",
+            b"",
+            jpeg_data,
+            f"--{BOUNDARY}--".encode(),
+            b"",
+        ]
+    )
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    await client.post(base_url + "/upload", content=body, headers=headers)
+
+
+async def new_pipeline(client, base_url):
+    import image_pool
+    from utils import multipart_file_body
+
+    response = await client.get(base_url + "/photo.jpg")
+    file_bytes = response.content
+    del response
+
+    jpeg_data = image_pool.encode_jpeg(file_bytes)
+    length, body = multipart_file_body(BOUNDARY, "file", "image.jpg", "image/jpeg", jpeg_data)
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}",
+        "Content-Length": str(length),
+    }
+    await client.post(base_url + "/upload", content=body, headers=headers)
+
+
+async def run_mode(mode, args):
+    import httpx
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    with open(args.photo, "rb") as f:
+        server = Server(f.read())
+    base_url = await server.start()
+    pipeline = old_pipeline if mode == "old" else new_pipeline
+    async with httpx.AsyncClient() as client:
+        # warm up imports and the connection code paths on a small photo
+        photo, server.photo = server.photo, make_photo(0.1)
+        await pipeline(client, base_url)
+        server.photo = photo
+
+        base = rss_mb()
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            await pipeline(client, base_url)
+        took = (time.perf_counter() - start) / args.runs
+    print(
+        f"{mode:<4} photo={len(server.photo) / 1e6:5.1f}MB "
+        f"peak=+{peak_mb() - base:6.1f}MB time={took * 1000:7.1f}ms "
+        f"body={server.uploads[-1] / 1e3:6.1f}kB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--mode", choices=("old", "new"))
+    parser.add_argument("--photo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run_mode(args.mode, args))
+        return
+    # generated here so building it does not count towards the peak
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as photo:
+        photo.write(make_photo(args.megapixels))
+        photo.flush()
+        for mode in ("old", "new"):
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode]
+                + ["--photo", photo.name, "--runs", str(args.runs)],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,26 @@
-import ast
-
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from telegram import ReplyKeyboardRemove, Update
+from telegram import Bot, ReplyKeyboardRemove, Update
 from telegram.ext import ContextTypes
 
 from config import (
     DELETE_PUBLISHED_CONFIRM,
     EDIT_PUBLISHED_MENU,
     EDIT_PUBLISHED_TEXT,
+    LIST_PAGE_SIZE,
     MAIN_MENU,
     VIEW_PUBLISHED_POSTS,
+    get_bot_token,
+)
+from async_database import (
+    get_published_post,
+    get_published_posts_page,
+    update_published_post,
 )
-from database import get_published_post, update_published_post
 from handlers import PostHandlers
+from media_metadata import media_metadata
+from post_codec import decode_buttons, decode_media
+from publish_queue import PublishQueue
+import scheduled_jobs
 from scheduled_handlers import ScheduledPostHandlers
 from utils import (
     clean_unsupported_formatting,
@@ -22,15 +30,51 @@ from utils import (
     detect_parse_mode,
     entities_to_html,
     parse_buttons,
+    parse_page_callback,
+    published_posts_page,
 )
 
 
 class ChannelBot:
-    def __init__(self, scheduler: AsyncIOScheduler):
+    def __init__(self, scheduler: AsyncIOScheduler, dispatcher=None, publish_queue=None):
         self.scheduler = scheduler
+        # DuePostDispatcher when SCHEDULER_MODE is "dispatcher"
+        self.dispatcher = dispatcher
+        # an unstarted queue publishes directly (used outside main)
+        self.publish_queue = publish_queue or PublishQueue()
+        # bot of the running Application, set by main
+        self.telegram_bot = None
+        self._fallback_bot = None
         self.post_handlers = PostHandlers(self)
         self.scheduled_handlers = ScheduledPostHandlers(self)
 
+    async def publishing_bot(self):
+        """Bot for sends without an update context (scheduled posts).
+
+        Reuses the Application's bot, so scheduled posts share its
+        connection pool and rate limiter.
+        """
+        if self.telegram_bot is not None:
+            return self.telegram_bot
+        if self._fallback_bot is None:
+            # outside main: one bot per process, not one per post
+            self._fallback_bot = Bot(get_bot_token())
+            await self._fallback_bot.initialize()
+        return self._fallback_bot
+
+    def schedule_post(self, job_id, post_id, run_date):
+        """queue a saved scheduled post for publishing at run_date."""
+        if self.dispatcher:
+            self.dispatcher.notify(post_id, run_date)
+        else:
+            scheduled_jobs.schedule_post(self.scheduler, job_id, post_id, run_date)
+
+    def unschedule_post(self, job_id):
+        """cancel the pending publication of a scheduled post."""
+        # the dispatcher drops entries whose row is gone when they come due
+        if not self.dispatcher:
+            scheduled_jobs.unschedule_post(self.scheduler, job_id)
+
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """main menu of bot."""
         welcome_text = "Вітаю! Я допоможу вам керувати публікаціями у вашому каналі."
@@ -76,36 +120,19 @@ class ChannelBot:
 
         if action == "editpublished":
             # load published post data
-            row = get_published_post(channel_id, int(msg_id))
+            row = await get_published_post(channel_id, int(msg_id))
             if not row:
                 await query.message.reply_text(
                     "❌ Опублікований пост не знайдено в базі."
                 )
                 return ConversationHandler.END
-            user_id, text, photo_id, media_type, buttons = row
-            photos = []
-            if photo_id:
-                try:
-                    photos = (
-                        ast.literal_eval(photo_id)
-                        if photo_id.startswith("[")
-                        else [photo_id]
-                    )
-                except Exception:
-                    photos = [photo_id]
-            if buttons:
-                try:
-                    buttons = ast.literal_eval(buttons)
-                except Exception:
-                    buttons = []
-            else:
-                buttons = []
+            user_id, text, media, media_type, buttons = row
 
             context.user_data["editing_published"] = {
                 "channel_id": channel_id,
                 "message_id": int(msg_id),
                 "text": text or "",
-                "photos": photos,
+                "photos": [m["file_id"] for m in media],
                 "buttons": buttons,
             }
 
@@ -224,8 +251,8 @@ class ChannelBot:
         
         # Try to update in database
         try:
-            from database import update_published_post
-            update_published_post(
+            from async_database import update_published_post
+            await update_published_post(
                 pub_data["channel_id"],
                 pub_data["message_id"],
                 text=new_text,
@@ -402,12 +429,11 @@ class ChannelBot:
         
         try:
             # Update database
-            from database import update_published_post
-            photos_str = str(photos) if photos else None
-            update_published_post(
+            from async_database import update_published_post
+            await update_published_post(
                 channel_id, 
                 message_id, 
-                photos=photos_str
+                media=photos
             )
             
             # Note: We can't edit media in Telegram, so we inform user
@@ -447,21 +473,9 @@ class ChannelBot:
         photos = pub_data.get("photos", [])
         buttons = pub_data.get("buttons", [])
         
-        # Parse photos if they exist
-        if photos:
-            try:
-                import ast
-                photos = ast.literal_eval(photos) if isinstance(photos, str) else photos
-            except Exception:
-                photos = [photos] if photos else []
-        
-        # Parse buttons if they exist
-        if buttons:
-            try:
-                import ast
-                buttons = ast.literal_eval(buttons) if isinstance(buttons, str) else buttons
-            except Exception:
-                buttons = []
+        # Parse photos and buttons if they are still encoded
+        photos = [m["file_id"] for m in decode_media(photos)]
+        buttons = decode_buttons(buttons)
         
         # Show preview
         if photos:
@@ -545,12 +559,12 @@ class ChannelBot:
         
         try:
             # Update database first
-            from database import update_published_post
-            update_published_post(
+            from async_database import update_published_post
+            await update_published_post(
                 channel_id, 
                 message_id, 
                 text=pub_data.get("text"),
-                photos=pub_data.get("photos"),
+                media=pub_data.get("photos"),
                 buttons=pub_data.get("buttons")
             )
             
@@ -616,6 +630,7 @@ class ChannelBot:
 
         try:
             new_file_id = update.message.photo[-1].file_id
+            await media_metadata.record(update.message.photo[-1], "photo")
             current_photos = context.user_data.get("editing_published", {}).get("photos", [])
             current_photos.append(new_file_id)
             context.user_data["editing_published"]["photos"] = current_photos
@@ -667,92 +682,58 @@ class ChannelBot:
 
         return ConversationHandler.END
 
+    async def _published_posts_page(self, user_id, cursor=None, backward=False):
+        """render a page of the published list, or None if there are no posts."""
+        rows, has_more = await get_published_posts_page(
+            user_id, LIST_PAGE_SIZE, cursor, backward
+        )
+        if not rows and cursor is not None:
+            cursor, backward = None, False
+            rows, has_more = await get_published_posts_page(user_id, LIST_PAGE_SIZE)
+        if not rows:
+            return None
+        if backward:
+            return published_posts_page(rows, has_prev=has_more, has_next=True)
+        return published_posts_page(rows, has_prev=cursor is not None, has_next=has_more)
+
     async def view_published_posts(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """show list of published posts."""
-        from database import get_published_posts_by_user
-        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-        
-        posts = get_published_posts_by_user(update.effective_user.id)
-        
-        if not posts:
-            # Handle both message and callback query
-            if update.message:
-                await update.message.reply_text(
-                    "📋 У вас немає опублікованих постів.",
-                    reply_markup=create_main_keyboard(),
-                )
-            elif update.callback_query:
-                await update.callback_query.message.reply_text(
-                    "📋 У вас немає опублікованих постів.",
-                    reply_markup=create_main_keyboard(),
-                )
-            return MAIN_MENU
-        
-        # Send main menu buttons
-        if update.message:
-            await update.message.reply_text(
-                "📋 **Ваші опубліковані пости:**",
-                reply_markup=create_main_keyboard(),
-                parse_mode="Markdown",
-            )
-        elif update.callback_query:
-            await update.callback_query.message.reply_text(
-                "📋 **Ваші опубліковані пости:**",
+        page = await self._published_posts_page(update.effective_user.id)
+        message = update.message or update.callback_query.message
+
+        if not page:
+            await message.reply_text(
+                "📋 У вас немає опублікованих постів.",
                 reply_markup=create_main_keyboard(),
-                parse_mode="Markdown",
             )
-        
-        for post in posts:
-            channel_id, message_id, text, photo_id, media_type, buttons = post
-            
-            # Parse buttons if they exist
-            buttons_list = []
-            if buttons:
-                try:
-                    import ast
-                    buttons_list = ast.literal_eval(buttons)
-                except Exception:
-                    buttons_list = []
-            
-            # Create preview text - first 5 words only
-            if text and text.strip():
-                words = text.split()[:5]
-                preview_text = " ".join(words)
-                if len(text.split()) > 5:
-                    preview_text += "..."
-            else:
-                preview_text = "📷 Фото"
-            
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "👀 Перегляд", callback_data=f"preview_{message_id}_{channel_id}"
-                    ),
-                    InlineKeyboardButton(
-                        "✏️ Редагувати", callback_data=f"editpublished_{message_id}_{channel_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🗑️ Видалити", callback_data=f"deletepublished_{message_id}_{channel_id}"
-                    )
-                ],
-            ]
-            
-            # Handle both message and callback query
-            if update.message:
-                await update.message.reply_text(
-                    f"📝 **@{channel_id}** (ID: {message_id})\n\n{preview_text}",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="Markdown",
-                )
-            elif update.callback_query:
-                await update.callback_query.message.reply_text(
-                    f"📝 **@{channel_id}** (ID: {message_id})\n\n{preview_text}",
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="Markdown",
-                )
-        
+            return MAIN_MENU
+
+        # Send main menu buttons
+        await message.reply_text(
+            "📋 **Ваші опубліковані пости:**",
+            reply_markup=create_main_keyboard(),
+            parse_mode="Markdown",
+        )
+
+        text, keyboard = page
+        await message.reply_text(text, reply_markup=keyboard, parse_mode="HTML")
+        return VIEW_PUBLISHED_POSTS
+
+    async def published_posts_page_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """switch the published list message to the previous/next page."""
+        query = update.callback_query
+        await query.answer()
+        backward, post_id = parse_page_callback(query.data)
+
+        page = await self._published_posts_page(
+            update.effective_user.id, int(post_id), backward
+        )
+        if not page:
+            await query.edit_message_text("📋 У вас немає опублікованих постів.")
+            return VIEW_PUBLISHED_POSTS
+
+        text, keyboard = page
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode="HTML")
         return VIEW_PUBLISHED_POSTS
 
     async def preview_published_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -767,152 +748,88 @@ class ChannelBot:
         channel_id = data[2]
         
         # Get post data from database
-        post_data = get_published_post(channel_id, message_id)
+        post_data = await get_published_post(channel_id, message_id)
         if not post_data:
             await query.edit_message_text("❌ Пост не знайдено.")
             return VIEW_PUBLISHED_POSTS
         
-        user_id, text, photo_id, media_type, buttons = post_data
-        
-        # Parse buttons if they exist
-        buttons_list = []
-        if buttons:
-            try:
-                import ast
-                buttons_list = ast.literal_eval(buttons)
-            except Exception:
-                buttons_list = []
+        user_id, text, media_list, media_type, buttons_list = post_data
         
         # Create full preview
-        if photo_id:
-            try:
-                import ast
-                # Try to parse as new media format first
-                media_list = ast.literal_eval(photo_id)
-                if isinstance(media_list, list) and len(media_list) > 0 and isinstance(media_list[0], dict):
-                    # New media format
-                    if len(media_list) == 1:
-                        media_item = media_list[0]
-                        if media_item['type'] == 'photo':
-                            await query.message.reply_photo(
-                                photo=media_item['file_id'],
+        if media_list:
+            if len(media_list) == 1:
+                media_item = media_list[0]
+                if media_item['type'] == 'photo':
+                    await query.message.reply_photo(
+                        photo=media_item['file_id'],
+                        caption=text or "📷 Фото",
+                        reply_markup=create_buttons_markup(buttons_list),
+                        parse_mode="HTML" if text else None,
+                    )
+                elif media_item['type'] == 'video':
+                    await query.message.reply_video(
+                        video=media_item['file_id'],
+                        caption=text or "🎥 Відео",
+                        reply_markup=create_buttons_markup(buttons_list),
+                        parse_mode="HTML" if text else None,
+                    )
+                elif media_item['type'] == 'document':
+                    await query.message.reply_document(
+                        document=media_item['file_id'],
+                        caption=text or "📄 Файл",
+                        reply_markup=create_buttons_markup(buttons_list),
+                        parse_mode="HTML" if text else None,
+                    )
+            else:
+                # Multiple media - send as media group (only photos supported in media groups)
+                photo_media = [m for m in media_list if m['type'] == 'photo']
+                other_media = [m for m in media_list if m['type'] != 'photo']
+                
+                if photo_media:
+                    from telegram import InputMediaPhoto
+                    media = []
+                    for idx, media_item in enumerate(photo_media):
+                        if idx == 0:
+                            media.append(InputMediaPhoto(
+                                media=media_item['file_id'], 
                                 caption=text or "📷 Фото",
-                                reply_markup=create_buttons_markup(buttons_list),
-                                parse_mode="HTML" if text else None,
-                            )
-                        elif media_item['type'] == 'video':
-                            await query.message.reply_video(
-                                video=media_item['file_id'],
-                                caption=text or "🎥 Відео",
-                                reply_markup=create_buttons_markup(buttons_list),
-                                parse_mode="HTML" if text else None,
-                            )
-                        elif media_item['type'] == 'document':
-                            await query.message.reply_document(
-                                document=media_item['file_id'],
-                                caption=text or "📄 Файл",
-                                reply_markup=create_buttons_markup(buttons_list),
-                                parse_mode="HTML" if text else None,
-                            )
-                    else:
-                        # Multiple media - send as media group (only photos supported in media groups)
-                        photo_media = [m for m in media_list if m['type'] == 'photo']
-                        other_media = [m for m in media_list if m['type'] != 'photo']
-                        
-                        if photo_media:
-                            from telegram import InputMediaPhoto
-                            media = []
-                            for idx, media_item in enumerate(photo_media):
-                                if idx == 0:
-                                    media.append(InputMediaPhoto(
-                                        media=media_item['file_id'], 
-                                        caption=text or "📷 Фото",
-                                        parse_mode="HTML" if text else None
-                                    ))
-                                else:
-                                    media.append(InputMediaPhoto(media=media_item['file_id']))
-                            
-                            sent_messages = await context.bot.send_media_group(
-                                chat_id=query.message.chat_id,
-                                media=media
-                            )
-                        
-                        # Send other media types separately
-                        for media_item in other_media:
-                            if media_item['type'] == 'video':
-                                await context.bot.send_video(
-                                    chat_id=query.message.chat_id,
-                                    video=media_item['file_id'],
-                                    caption=text if not photo_media else None,
-                                    parse_mode="HTML" if text and not photo_media else None,
-                                )
-                            elif media_item['type'] == 'document':
-                                await context.bot.send_document(
-                                    chat_id=query.message.chat_id,
-                                    document=media_item['file_id'],
-                                    caption=text if not photo_media else None,
-                                    parse_mode="HTML" if text and not photo_media else None,
-                                )
-                        
-                        # Send buttons separately for media group
-                        if buttons_list:
-                            button_text = "🔗"
-                            for i, button in enumerate(buttons_list):
-                                button_text += f" [{i+1}]"
-                            await context.bot.send_message(
-                                chat_id=query.message.chat_id,
-                                text=button_text,
-                                reply_markup=create_buttons_markup(buttons_list),
-                            )
-                else:
-                    # Old photos format
-                    photos = media_list if isinstance(media_list, list) else [photo_id]
+                                parse_mode="HTML" if text else None
+                            ))
+                        else:
+                            media.append(InputMediaPhoto(media=media_item['file_id']))
                     
-                    if len(photos) == 1:
-                        # Single photo
-                        await query.message.reply_photo(
-                            photo=photos[0],
-                            caption=text or "📷 Фото",
-                            reply_markup=create_buttons_markup(buttons_list),
-                            parse_mode="HTML" if text else None,
+                    sent_messages = await context.bot.send_media_group(
+                        chat_id=query.message.chat_id,
+                        media=media
+                    )
+                
+                # Send other media types separately
+                for media_item in other_media:
+                    if media_item['type'] == 'video':
+                        await context.bot.send_video(
+                            chat_id=query.message.chat_id,
+                            video=media_item['file_id'],
+                            caption=text if not photo_media else None,
+                            parse_mode="HTML" if text and not photo_media else None,
                         )
-                    else:
-                        # Multiple photos - send as media group
-                        from telegram import InputMediaPhoto
-                        media = []
-                        for idx, fid in enumerate(photos):
-                            if idx == 0:
-                                media.append(InputMediaPhoto(
-                                    media=fid, 
-                                    caption=text or "📷 Фото",
-                                    parse_mode="HTML" if text else None
-                                ))
-                            else:
-                                media.append(InputMediaPhoto(media=fid))
-                        
-                        sent_messages = await context.bot.send_media_group(
+                    elif media_item['type'] == 'document':
+                        await context.bot.send_document(
                             chat_id=query.message.chat_id,
-                            media=media
+                            document=media_item['file_id'],
+                            caption=text if not photo_media else None,
+                            parse_mode="HTML" if text and not photo_media else None,
                         )
-                        
-                        # Send buttons separately for media group
-                        if buttons_list:
-                            button_text = "🔗"
-                            for i, button in enumerate(buttons_list):
-                                button_text += f" [{i+1}]"
-                            await context.bot.send_message(
-                                chat_id=query.message.chat_id,
-                                text=button_text,
-                                reply_markup=create_buttons_markup(buttons_list),
-                            )
-            except Exception:
-                # Fallback to simple photo
-                await query.message.reply_photo(
-                    photo=photo_id,
-                    caption=text or "📷 Фото",
-                    reply_markup=create_buttons_markup(buttons_list),
-                    parse_mode="HTML" if text else None,
-                )
+                
+                # Send buttons separately for media group
+                if buttons_list:
+                    button_text = "🔗"
+                    for i, button in enumerate(buttons_list):
+                        button_text += f" [{i+1}]"
+                    await context.bot.send_message(
+                        chat_id=query.message.chat_id,
+                        text=button_text,
+                        reply_markup=create_buttons_markup(buttons_list),
+                    )
         else:
             # Text only
             await query.message.reply_text(
@@ -0,0 +1,25 @@
+"""numeric ids of channels stored as '@name'.
+
+Channels are saved the way the author entered them. Once a channel has
+been resolved (pre-flight's getChat, or the chat of a message sent to it)
+its numeric id is kept here, so sends can use it and the rate limiter can
+count '@name' and -100... requests against one bucket.
+"""
+
+# normalized channel ('name' / '-100...') -> numeric chat id
+_chat_ids = {}
+
+
+def channel_key(channel_id):
+    """normalize '@Name' / 'name' / -100... into one key."""
+    return str(channel_id).strip().lstrip("@").lower()
+
+
+def cached_chat_id(channel_id):
+    """numeric chat id of a resolved channel, or None."""
+    return _chat_ids.get(channel_key(channel_id))
+
+
+def remember_chat_id(channel_id, chat_id):
+    """record the numeric id a channel resolved to."""
+    _chat_ids[channel_key(channel_id)] = chat_id
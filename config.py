@@ -39,6 +39,114 @@ HARDCODED_CHANNELS = {
 
 # database settings
 DATABASE_PATH = "data/bot_database.db"
+DATABASE_READER_THREADS = int(os.getenv("DATABASE_READER_THREADS", "4"))
+# one connection per reader thread plus one for the writer thread
+DATABASE_POOL_SIZE = int(
+    os.getenv("DATABASE_POOL_SIZE", str(DATABASE_READER_THREADS + 1))
+)
+DATABASE_STATEMENT_CACHE_SIZE = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "128"))
+DATABASE_MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(64 * 1024 * 1024)))
+DATABASE_CACHE_SIZE_KB = int(os.getenv("DATABASE_CACHE_SIZE_KB", "16384"))
+
+# what to do at startup with scheduled posts whose time passed while the
+# bot was down: "run" publishes them right away, "skip" leaves them in the
+# list unpublished. Posts late by more than SCHEDULE_CATCHUP_MAX_LATENESS
+# seconds are always skipped.
+SCHEDULE_CATCHUP_POLICY = os.getenv("SCHEDULE_CATCHUP_POLICY", "run")
+SCHEDULE_CATCHUP_MAX_LATENESS = int(os.getenv("SCHEDULE_CATCHUP_MAX_LATENESS", "86400"))
+
+# "apscheduler" keeps one persistent job per scheduled post, "dispatcher"
+# runs a single task that reads due posts from scheduled_posts (see
+# dispatcher.py) and scales to very large backlogs
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "apscheduler")
+# number of upcoming posts the dispatcher keeps in memory
+DISPATCHER_WINDOW = int(os.getenv("DISPATCHER_WINDOW", "1000"))
+# how often the dispatcher re-reads the window even without changes
+DISPATCHER_REFILL_SECONDS = int(os.getenv("DISPATCHER_REFILL_SECONDS", "300"))
+
+# outgoing Bot API throttling (see rate_limiter.py); Telegram allows about
+# 30 messages/s overall, 1/s per private chat and 20/min per group/channel
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv("RATE_LIMIT_GLOBAL_PER_SECOND", "30"))
+RATE_LIMIT_PRIVATE_PER_SECOND = float(os.getenv("RATE_LIMIT_PRIVATE_PER_SECOND", "1"))
+RATE_LIMIT_PRIVATE_BURST = int(os.getenv("RATE_LIMIT_PRIVATE_BURST", "3"))
+RATE_LIMIT_GROUP_PER_MINUTE = float(os.getenv("RATE_LIMIT_GROUP_PER_MINUTE", "20"))
+# retries after a 429 RetryAfter before the error reaches the caller
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "1"))
+
+# publish retries for transient errors (RetryAfter, timeouts, network)
+PUBLISH_RETRY_DEADLINE = float(os.getenv("PUBLISH_RETRY_DEADLINE", "300"))
+PUBLISH_RETRY_BASE_DELAY = float(os.getenv("PUBLISH_RETRY_BASE_DELAY", "1"))
+PUBLISH_RETRY_MAX_DELAY = float(os.getenv("PUBLISH_RETRY_MAX_DELAY", "60"))
+
+# how long a publish claim is honoured before another worker may take over
+# (must outlast the retries of one attempt)
+PUBLISH_CLAIM_LEASE = float(os.getenv("PUBLISH_CLAIM_LEASE", str(PUBLISH_RETRY_DEADLINE + 120)))
+
+# scheduled posts are checked and prepared this many seconds before their
+# publish time (see preflight.py); 0 turns pre-flight off
+PREFLIGHT_LEAD = int(os.getenv("PREFLIGHT_LEAD", "300"))
+PREFLIGHT_INTERVAL = int(os.getenv("PREFLIGHT_INTERVAL", "30"))
+
+# channels published to in parallel; posts to one channel are serialized
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "4"))
+
+# telegra.ph urls of photos kept in memory (all of them are kept in the db)
+TELEGRAPH_CACHE_SIZE = int(os.getenv("TELEGRAPH_CACHE_SIZE", "512"))
+
+# image documents converted to photos (see photo_converter.py): results
+# kept in memory (all of them are kept in the db) and how long scratch
+# messages wait to be deleted together
+CONVERTED_PHOTO_CACHE_SIZE = int(os.getenv("CONVERTED_PHOTO_CACHE_SIZE", "512"))
+SCRATCH_DELETE_DELAY = float(os.getenv("SCRATCH_DELETE_DELAY", "2"))
+
+# metadata (size, dimensions, mime type) of media seen in incoming messages
+# kept in memory (all of it is kept in the db, see media_metadata.py)
+MEDIA_METADATA_CACHE_SIZE = int(os.getenv("MEDIA_METADATA_CACHE_SIZE", "2048"))
+
+# updates of one album (media_group_id) are collected until none arrived
+# for this many seconds, then added to the post together (album_buffer.py)
+ALBUM_DEBOUNCE = float(os.getenv("ALBUM_DEBOUNCE", "1"))
+
+# photo re-encoding (see image_pool.py): "process" keeps Pillow off the
+# interpreter lock, "thread" avoids the worker processes
+IMAGE_EXECUTOR = os.getenv("IMAGE_EXECUTOR", "process")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# images queued or being processed at once; more callers wait their turn
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", str(IMAGE_WORKERS * 4)))
+# telegra.ph upload: longest side and JPEG quality
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "90"))
+
+# photo_bottom layout: "native" sends the photo with the caption above it
+# (show_caption_above_media, Bot API 7.3+), "telegraph" uploads the photo
+# and sends the text with a link preview; captions over 1024 characters
+# always take the telegraph path
+PHOTO_BOTTOM_MODE = os.getenv("PHOTO_BOTTOM_MODE", "native")
+
+# where photo_bottom photos are uploaded (see image_hosts.py):
+# "telegraph", "local" (files in IMAGE_HOST_DIR served at IMAGE_HOST_URL
+# by a static web server) or "fake" (in-process, for tests and benchmarks)
+IMAGE_HOST = os.getenv("IMAGE_HOST", "telegraph")
+IMAGE_HOST_DIR = os.getenv("IMAGE_HOST_DIR", "data/images")
+IMAGE_HOST_URL = os.getenv("IMAGE_HOST_URL", "")
+IMAGE_HOST_FAKE_LATENCY = float(os.getenv("IMAGE_HOST_FAKE_LATENCY", "0.2"))
+IMAGE_HOST_FAKE_ERROR_RATE = float(os.getenv("IMAGE_HOST_FAKE_ERROR_RATE", "0"))
+
+# shared HTTP client for telegra.ph and other outgoing requests (see
+# http_client.py); HTTP2=1 needs the h2 package (pip install httpx[http2])
+HTTP2 = os.getenv("HTTP2", "0") == "1"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "10"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "5"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+# whole request, including waiting for a free connection
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "30"))
+
+# post lists (scheduled / published) are shown as one paginated message
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "8"))
+# characters of post text fetched per list entry
+LIST_TEXT_PREFIX = int(os.getenv("LIST_TEXT_PREFIX", "120"))
 
 
 # get bot token
@@ -1,236 +1,737 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 
-from config import DATABASE_PATH
+from config import (
+    DATABASE_CACHE_SIZE_KB,
+    DATABASE_MMAP_SIZE,
+    DATABASE_PATH,
+    DATABASE_POOL_SIZE,
+    DATABASE_STATEMENT_CACHE_SIZE,
+    LIST_TEXT_PREFIX,
+)
+from migrations import apply_migrations
+from post_codec import decode_buttons, encode_buttons, normalize_media
 
 
-def db_connect():
-    """create connection to db and tables if they don't exist."""
-    # create data directory if it doesn't exist
-    os.makedirs("data", exist_ok=True)
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    # channels
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS channels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            channel_id TEXT NOT NULL UNIQUE
-        )
-    """
-    )
+class ConnectionPool:
+    """pool of long-lived sqlite connections shared by all db helpers.
 
-    # scheduled posts
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS scheduled_posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            text TEXT,
-            photo_id TEXT,
-            media_type TEXT,
-            media_type TEXT,
-            buttons TEXT, 
-            publish_time DATETIME NOT NULL,
-            channel_id TEXT NOT NULL,
-            job_id TEXT NOT NULL UNIQUE
-        )
+    Connections are opened lazily (up to ``size``), tuned once with
+    pragmas and then reused, so a query costs neither a connect nor a
+    schema check. sqlite3 keeps an LRU of prepared statements per
+    connection (``cached_statements``), which is why helpers below use
+    constant SQL strings with placeholders.
     """
-    )
 
-    # published posts for further editing/deletion
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS published_posts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            channel_id TEXT NOT NULL,
-            message_id INTEGER NOT NULL,
-            text TEXT,
-            photo_id TEXT,
-            media_type TEXT,
-            media_type TEXT,
-            buttons TEXT
+    def __init__(self, path, size=DATABASE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=DATABASE_STATEMENT_CACHE_SIZE,
         )
-    """
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={int(DATABASE_MMAP_SIZE)}")
+        # negative value means size in KiB rather than in pages
+        conn.execute(f"PRAGMA cache_size=-{int(DATABASE_CACHE_SIZE_KB)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        # every connection is busy - wait until one is returned
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_db(path=DATABASE_PATH):
+    """open the connection pool and migrate the schema once at startup."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pool = ConnectionPool(path)
+        with pool.connection() as conn:
+            apply_migrations(conn)
+        _pool = pool
+        return _pool
+
+
+def close_db():
+    """close all pooled connections (called on shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def db_connect():
+    """backward compatible alias for init_db()."""
+    return init_db()
+
+
+@contextmanager
+def get_connection():
+    """borrow a pooled connection for read queries."""
+    pool = _pool or init_db()
+    with pool.connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction():
+    """borrow a pooled connection and commit (or roll back) on exit."""
+    with get_connection() as conn:
+        with conn:
+            yield conn
+
+
+# --- Post media helpers ---
+SCHEDULED = "scheduled"
+PUBLISHED = "published"
+
+_MEDIA_COLUMNS = ("file_unique_id", "width", "height", "size")
+
+
+def _media_row_to_item(file_id, media_type, *extra):
+    item = {"file_id": file_id, "type": media_type}
+    for key, value in zip(_MEDIA_COLUMNS, extra):
+        if value is not None:
+            item[key] = value
+    return item
+
+
+def _replace_post_media(conn, post_kind, post_id, media):
+    """replace the media rows of a post with the given list (bulk insert)."""
+    conn.execute(
+        "DELETE FROM post_media WHERE post_kind = ? AND post_id = ?",
+        (post_kind, post_id),
+    )
+    conn.executemany(
+        "INSERT INTO post_media (post_kind, post_id, position, file_id, file_unique_id, type, width, height, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                post_kind,
+                post_id,
+                position,
+                item["file_id"],
+                item.get("file_unique_id"),
+                item["type"],
+                item.get("width"),
+                item.get("height"),
+                item.get("size"),
+            )
+            for position, item in enumerate(normalize_media(media))
+        ],
     )
 
-    conn.commit()
-    return conn
+
+def _fetch_post_media(conn, post_kind, post_id):
+    rows = conn.execute(
+        "SELECT file_id, type, file_unique_id, width, height, size FROM post_media WHERE post_kind = ? AND post_id = ? ORDER BY position",
+        (post_kind, post_id),
+    ).fetchall()
+    return [_media_row_to_item(*row) for row in rows]
+
+
+def get_post_media(post_kind, post_id):
+    """get ordered media items of a scheduled or published post."""
+    with get_connection() as conn:
+        return _fetch_post_media(conn, post_kind, post_id)
+
+
+def get_media_summaries(post_kind, post_ids):
+    """get {post_id: (count, first_file_id, first_type)} without loading full lists."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+    placeholders = ", ".join("?" * len(post_ids))
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT m.post_id, c.total, m.file_id, m.type
+            FROM post_media m
+            JOIN (
+                SELECT post_id, COUNT(*) AS total FROM post_media
+                WHERE post_kind = ? AND post_id IN ({placeholders})
+                GROUP BY post_id
+            ) c ON c.post_id = m.post_id
+            WHERE m.post_kind = ? AND m.position = 0
+            """,
+            (post_kind, *post_ids, post_kind),
+        ).fetchall()
+    return {post_id: (total, file_id, media_type) for post_id, total, file_id, media_type in rows}
+
+
+def get_posts_using_file(file_unique_id):
+    """get (post_kind, post_id) pairs of all posts that contain a file."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT DISTINCT post_kind, post_id FROM post_media WHERE file_unique_id = ?",
+            (file_unique_id,),
+        ).fetchall()
 
 
 def get_scheduled_posts(user_id):
     """get list of scheduled posts of user."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, publish_time, channel_id, text FROM scheduled_posts WHERE user_id = ?",
-        (user_id,),
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, publish_time, channel_id, text FROM scheduled_posts WHERE user_id = ? ORDER BY publish_time",
+            (user_id,),
+        ).fetchall()
+
+
+def get_scheduled_posts_page(user_id, limit, cursor=None, backward=False):
+    """get one page of scheduled posts ordered by (publish_time, id).
+
+    Keyset pagination: ``cursor`` is the (publish_time, id) of the last row
+    of the previous page, or of the first row of the next page when
+    ``backward``. Returns ``(rows, has_more)`` where rows are
+    (id, publish_time, channel_id, text prefix) and has_more tells whether
+    more rows follow in the direction of travel.
+    """
+    order = "DESC" if backward else "ASC"
+    sql = (
+        "SELECT id, publish_time, channel_id, substr(text, 1, ?) FROM scheduled_posts "
+        "WHERE user_id = ?"
     )
-    posts = cursor.fetchall()
-    conn.close()
-    return posts
+    params = [LIST_TEXT_PREFIX, user_id]
+    if cursor is not None:
+        sql += f" AND (publish_time, id) {'<' if backward else '>'} (?, ?)"
+        params.extend(cursor)
+    sql += f" ORDER BY publish_time {order}, id {order} LIMIT ?"
+    params.append(limit + 1)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
 
 
 def get_scheduled_post_by_id(post_id):
     """get data of scheduled post by id."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT text, photo_id, buttons, publish_time, channel_id, layout FROM scheduled_posts WHERE id = ?",
-        (post_id,),
-    )
-    post_data = cursor.fetchone()
-    conn.close()
-    return post_data
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT text, buttons, publish_time, channel_id, layout FROM scheduled_posts WHERE id = ?",
+            (post_id,),
+        ).fetchone()
+        if not row:
+            return None
+        media = _fetch_post_media(conn, SCHEDULED, post_id)
+    text, buttons, publish_time, channel_id, layout = row
+    # (text, media, buttons, publish_time, channel_id, layout)
+    return text, media, decode_buttons(buttons), publish_time, channel_id, layout
+
+
+def get_scheduled_post_for_job(post_id):
+    """get (user_id, channel_id, publish_time, post_data) of a scheduled post for publishing."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT user_id, channel_id, publish_time, text, buttons, layout FROM scheduled_posts WHERE id = ?",
+            (post_id,),
+        ).fetchone()
+        if not row:
+            return None
+        media = _fetch_post_media(conn, SCHEDULED, post_id)
+    user_id, channel_id, publish_time, text, buttons, layout = row
+    post_data = {
+        "text": text,
+        "media": media,
+        "buttons": decode_buttons(buttons),
+        "layout": layout or "photo_top",
+    }
+    return user_id, channel_id, publish_time, post_data
+
+
+def get_upcoming_posts(after, limit, after_id=None):
+    """get (id, publish_time) of the next ``limit`` posts due after ``after``.
+
+    With ``after_id``, posts due exactly at ``after`` with a larger id are
+    included too (a cursor over (publish_time, id)).
+    """
+    with get_connection() as conn:
+        if after_id is None:
+            return conn.execute(
+                "SELECT id, publish_time FROM scheduled_posts WHERE publish_time > ? ORDER BY publish_time, id LIMIT ?",
+                (str(after), limit),
+            ).fetchall()
+        return conn.execute(
+            "SELECT id, publish_time FROM scheduled_posts WHERE (publish_time, id) > (?, ?) ORDER BY publish_time, id LIMIT ?",
+            (str(after), after_id, limit),
+        ).fetchall()
+
+
+def get_pending_schedule():
+    """get (id, job_id, publish_time) of every scheduled post."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT id, job_id, publish_time FROM scheduled_posts"
+        ).fetchall()
 
 
 def get_job_id_by_post_id(post_id):
     """get job_id of scheduled post."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute("SELECT job_id FROM scheduled_posts WHERE id = ?", (post_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_connection() as conn:
+        result = conn.execute(
+            "SELECT job_id FROM scheduled_posts WHERE id = ?", (post_id,)
+        ).fetchone()
     return result[0] if result else None
 
 
+def job_id_for_post(post_id):
+    """scheduler job id of a scheduled post."""
+    return f"post_{post_id}"
+
+
 def save_scheduled_post(
-    user_id, text, photo_id, media_type, buttons, publish_time, channel_id, job_id
+    user_id,
+    text,
+    media,
+    media_type,
+    buttons,
+    publish_time,
+    channel_id,
+    layout=None,
 ):
-    """save scheduled post to db."""
-    import json
-
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO scheduled_posts (user_id, text, photo_id, media_type, buttons, publish_time, channel_id, job_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-        (
-            user_id,
-            text,
-            photo_id,
-            media_type,
-            media_type,
-            json.dumps(buttons) if buttons else None,
-            publish_time,
-            channel_id,
-            job_id,
-            layout,
-        ),
-    )
-    conn.commit()
-    conn.close()
+    """save scheduled post to db and return its id (job id is job_id_for_post(id))."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO scheduled_posts (user_id, text, media_type, buttons, publish_time, channel_id, job_id, layout) VALUES (?, ?, ?, ?, ?, ?, 'post_new_' || hex(randomblob(8)), ?)",
+            (
+                user_id,
+                text,
+                media_type,
+                encode_buttons(buttons),
+                publish_time,
+                channel_id,
+                layout,
+            ),
+        )
+        post_id = cursor.lastrowid
+        conn.execute(
+            "UPDATE scheduled_posts SET job_id = ? WHERE id = ?",
+            (job_id_for_post(post_id), post_id),
+        )
+        _replace_post_media(conn, SCHEDULED, post_id, media)
+        return post_id
 
 
-def update_scheduled_post(post_id, text, photo_id, media_type, buttons, publish_time, job_id):
-def update_scheduled_post(post_id, text, photo_id, media_type, buttons, publish_time, job_id):
+def update_scheduled_post(
+    post_id, text, media, media_type, buttons, publish_time, layout=None
+):
     """update scheduled post in db."""
-    import json
-
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE scheduled_posts SET text=?, photo_id=?, media_type=?, buttons=?, publish_time=?, job_id=? WHERE id=?",
-        "UPDATE scheduled_posts SET text=?, photo_id=?, media_type=?, buttons=?, publish_time=?, job_id=? WHERE id=?",
-        (
-            text,
-            photo_id,
-            media_type,
-            media_type,
-            json.dumps(buttons) if buttons else None,
-            publish_time,
-            job_id,
-            post_id,
-        ),
-    )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE scheduled_posts SET text=?, media_type=?, buttons=?, publish_time=?, layout=? WHERE id=?",
+            (
+                text,
+                media_type,
+                encode_buttons(buttons),
+                publish_time,
+                layout,
+                post_id,
+            ),
+        )
+        _replace_post_media(conn, SCHEDULED, post_id, media)
 
 
 def delete_scheduled_post(post_id):
     """delete scheduled post from db."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM scheduled_posts WHERE id = ?", (post_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("DELETE FROM scheduled_posts WHERE id = ?", (post_id,))
+        conn.execute(
+            "DELETE FROM post_media WHERE post_kind = ? AND post_id = ?",
+            (SCHEDULED, post_id),
+        )
+        # the ledger is only read while the post exists; drop it so the table
+        # does not grow with every published post
+        conn.execute("DELETE FROM publish_ledger WHERE post_id = ?", (post_id,))
 
 
 # --- Published posts helpers ---
-def save_published_post(user_id, channel_id, message_id, text, photo_id, media_type, buttons):
-def save_published_post(user_id, channel_id, message_id, text, photo_id, media_type, buttons):
-    """save a published post to db."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO published_posts (user_id, channel_id, message_id, text, photo_id, media_type, buttons) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        "INSERT INTO published_posts (user_id, channel_id, message_id, text, photo_id, media_type, buttons) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (
-            user_id,
-            channel_id,
-            message_id,
-            text,
-            photo_id,
-            media_type,
-            media_type,
-            str(buttons) if buttons is not None else None,
-        ),
-    )
-    conn.commit()
-    conn.close()
+def save_published_post(user_id, channel_id, message_id, text, media, media_type, buttons):
+    """save a published post to db and return its id."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO published_posts (user_id, channel_id, message_id, text, media_type, buttons) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                channel_id,
+                message_id,
+                text,
+                media_type,
+                encode_buttons(buttons),
+            ),
+        )
+        _replace_post_media(conn, PUBLISHED, cursor.lastrowid, media)
+        return cursor.lastrowid
 
 
 def get_published_post(channel_id, message_id):
     """get published post by channel and message id."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT user_id, text, photo_id, media_type, buttons FROM published_posts WHERE channel_id = ? AND message_id = ?",
-        "SELECT user_id, text, photo_id, media_type, buttons FROM published_posts WHERE channel_id = ? AND message_id = ?",
-        (channel_id, message_id),
-    )
-    row = cursor.fetchone()
-    conn.close()
-    return row  # (user_id, text, photo_id, media_type, buttons)
-    return row  # (user_id, text, photo_id, media_type, buttons)
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT id, user_id, text, media_type, buttons FROM published_posts WHERE channel_id = ? AND message_id = ?",
+            (channel_id, message_id),
+        ).fetchone()
+        if not row:
+            return None
+        post_id, user_id, text, media_type, buttons = row
+        media = _fetch_post_media(conn, PUBLISHED, post_id)
+    # (user_id, text, media, media_type, buttons)
+    return user_id, text, media, media_type, decode_buttons(buttons)
 
 
-def update_published_post(channel_id, message_id, text=None, buttons=None):
-    """update fields of a published post."""
-    if text is None and buttons is None:
+def update_published_post(channel_id, message_id, text=None, buttons=None, media=None):
+    """update fields of a published post (None leaves a field unchanged)."""
+    fields = []
+    params = []
+    if text is not None:
+        fields.append("text=?")
+        params.append(text)
+    if buttons is not None:
+        fields.append("buttons=?")
+        params.append(encode_buttons(buttons))
+    if media is not None:
+        media = normalize_media(media)
+        fields.append("media_type=?")
+        params.append(media[0]["type"] if media else None)
+    if not fields:
         return
-    conn = db_connect()
-    cursor = conn.cursor()
-    if text is not None and buttons is not None:
-        cursor.execute(
-            "UPDATE published_posts SET text=?, buttons=? WHERE channel_id=? AND message_id=?",
-            (text, str(buttons), channel_id, message_id),
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE published_posts SET {', '.join(fields)} WHERE channel_id=? AND message_id=?",
+            (*params, channel_id, message_id),
         )
-    elif text is not None:
-        cursor.execute(
-            "UPDATE published_posts SET text=? WHERE channel_id=? AND message_id=?",
-            (text, channel_id, message_id),
-        )
-    else:
-        cursor.execute(
-            "UPDATE published_posts SET buttons=? WHERE channel_id=? AND message_id=?",
-            (str(buttons), channel_id, message_id),
-        )
-    conn.commit()
-    conn.close()
+        if media is not None:
+            for (post_id,) in conn.execute(
+                "SELECT id FROM published_posts WHERE channel_id=? AND message_id=?",
+                (channel_id, message_id),
+            ).fetchall():
+                _replace_post_media(conn, PUBLISHED, post_id, media)
+
+
+def get_published_posts_page(user_id, limit, cursor=None, backward=False):
+    """get one page of published posts, newest first.
+
+    Same keyset scheme as get_scheduled_posts_page with the post id as the
+    key. Rows are (id, channel_id, message_id, text prefix).
+    """
+    sql = (
+        "SELECT id, channel_id, message_id, substr(text, 1, ?) FROM published_posts "
+        "WHERE user_id = ?"
+    )
+    params = [LIST_TEXT_PREFIX, user_id]
+    if cursor is not None:
+        sql += f" AND id {'>' if backward else '<'} ?"
+        params.append(cursor)
+    sql += f" ORDER BY id {'ASC' if backward else 'DESC'} LIMIT ?"
+    params.append(limit + 1)
+    with get_connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
 
 
 def get_published_posts_by_user(user_id):
     """get all published posts by user."""
-    conn = db_connect()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT channel_id, message_id, text, photo_id, media_type, buttons FROM published_posts WHERE user_id = ? ORDER BY id DESC",
-        "SELECT channel_id, message_id, text, photo_id, media_type, buttons FROM published_posts WHERE user_id = ? ORDER BY id DESC",
-        (user_id,)
-    )
-    posts = cursor.fetchall()
-    conn.close()
-    return posts
\ No newline at end of file
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT channel_id, message_id, text, media_type, buttons FROM published_posts WHERE user_id = ? ORDER BY id DESC",
+            (user_id,),
+        ).fetchall()
+
+
+# --- Publish attempts helpers ---
+def start_publish_attempt(post_id):
+    """record the start of a publish attempt and return its id."""
+    with transaction() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO publish_attempts (post_id, attempt, status, started_at)
+            SELECT ?, COALESCE(MAX(attempt), 0) + 1, 'started', ?
+            FROM publish_attempts WHERE post_id = ?
+            """,
+            (post_id, datetime.now(), post_id),
+        )
+        return cursor.lastrowid
+
+
+def finish_publish_attempt(attempt_id, status, error=None):
+    """mark a publish attempt as sent / retry / failed."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE publish_attempts SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, error, datetime.now(), attempt_id),
+        )
+
+
+def get_publish_attempts(post_id):
+    """get (attempt, status, error, started_at, finished_at) of a post."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT attempt, status, error, started_at, finished_at FROM publish_attempts WHERE post_id = ? ORDER BY attempt",
+            (post_id,),
+        ).fetchall()
+
+
+def recover_interrupted_attempts():
+    """close attempts cut off by a crash and return (id, publish_time) of their posts.
+
+    Call once at startup, before anything is published.
+    """
+    with transaction() as conn:
+        rows = conn.execute(
+            """
+            SELECT DISTINCT s.id, s.publish_time FROM publish_attempts a
+            JOIN scheduled_posts s ON s.id = a.post_id
+            WHERE a.status = 'started'
+            """
+        ).fetchall()
+        conn.execute(
+            "UPDATE publish_attempts SET status = 'interrupted', finished_at = ? WHERE status = 'started'",
+            (datetime.now(),),
+        )
+    return rows
+
+
+# --- Publish ledger helpers ---
+def claim_publish(post_id, owner, lease_seconds):
+    """claim the right to publish a post; return the attempt number or None.
+
+    Succeeds for a still scheduled post that was never claimed, whose last
+    attempt failed or whose claim lease expired. A post that was sent, is
+    claimed by someone else or was deleted is refused. The check and the
+    claim are one statement, so concurrent jobs cannot both win.
+    """
+    now = datetime.now()
+    with transaction() as conn:
+        row = conn.execute(
+            """
+            INSERT INTO publish_ledger (post_id, attempt, status, owner, claimed_at, lease_until)
+            SELECT id, 1, 'claimed', ?, ?, ? FROM scheduled_posts WHERE id = ?
+            ON CONFLICT (post_id) DO UPDATE SET
+                attempt = publish_ledger.attempt + 1,
+                status = 'claimed',
+                owner = excluded.owner,
+                claimed_at = excluded.claimed_at,
+                lease_until = excluded.lease_until,
+                message_id = NULL
+            WHERE publish_ledger.status = 'failed'
+                OR (publish_ledger.status = 'claimed' AND publish_ledger.lease_until < excluded.claimed_at)
+            RETURNING attempt
+            """,
+            (owner, now, now + timedelta(seconds=lease_seconds), post_id),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def mark_publish_sent(post_id, attempt, message_id=None):
+    """record that the claimed attempt delivered the post."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE publish_ledger SET status = 'sent', message_id = COALESCE(?, message_id), finished_at = ? WHERE post_id = ? AND attempt = ?",
+            (message_id, datetime.now(), post_id, attempt),
+        )
+
+
+def release_publish_claim(post_id, attempt):
+    """mark the claimed attempt as failed so the post can be claimed again."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE publish_ledger SET status = 'failed', finished_at = ? WHERE post_id = ? AND attempt = ? AND status = 'claimed'",
+            (datetime.now(), post_id, attempt),
+        )
+
+
+def get_open_claims():
+    """get (post_id, attempt, owner) of claims that were neither sent nor released."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT post_id, attempt, owner FROM publish_ledger WHERE status = 'claimed'"
+        ).fetchall()
+
+
+def get_publish_ledger(post_id):
+    """get (attempt, status, owner, message_id) of a post, or None."""
+    with get_connection() as conn:
+        return conn.execute(
+            "SELECT attempt, status, owner, message_id FROM publish_ledger WHERE post_id = ?",
+            (post_id,),
+        ).fetchone()
+
+
+# --- Telegraph url cache ---
+def get_telegraph_url(file_unique_id):
+    """get the telegra.ph url a photo was uploaded to, or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT url FROM telegraph_urls WHERE file_unique_id = ?",
+            (file_unique_id,),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def save_telegraph_url(file_unique_id, url):
+    """remember the telegra.ph url of a photo."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO telegraph_urls (file_unique_id, url, created_at) VALUES (?, ?, ?)",
+            (file_unique_id, url, datetime.now()),
+        )
+
+
+# --- Photos converted from image documents ---
+def get_converted_photo(document_unique_id):
+    """get the photo media item an image document was converted to, or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT file_id, file_unique_id, width, height, file_size
+            FROM converted_photos WHERE document_unique_id = ?
+            """,
+            (document_unique_id,),
+        ).fetchone()
+    if not row:
+        return None
+    item = {"file_id": row[0], "type": "photo"}
+    for key, value in zip(("file_unique_id", "width", "height", "size"), row[1:]):
+        if value is not None:
+            item[key] = value
+    return item
+
+
+def save_converted_photo(document_unique_id, item):
+    """remember the photo media item an image document was converted to."""
+    with transaction() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO converted_photos
+                (document_unique_id, file_id, file_unique_id, width, height, file_size, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                document_unique_id,
+                item["file_id"],
+                item.get("file_unique_id"),
+                item.get("width"),
+                item.get("height"),
+                item.get("size"),
+                datetime.now(),
+            ),
+        )
+
+
+# --- Media metadata cache ---
+_METADATA_FIELDS = (
+    "file_unique_id",
+    "file_id",
+    "type",
+    "width",
+    "height",
+    "file_size",
+    "mime_type",
+    "duration",
+    "file_name",
+)
+
+
+def _metadata_row(row):
+    if not row:
+        return None
+    return {key: value for key, value in zip(_METADATA_FIELDS, row) if value is not None}
+
+
+def get_media_metadata(file_unique_id):
+    """get the stored metadata of a file, or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_METADATA_FIELDS)} FROM media_metadata WHERE file_unique_id = ?",
+            (file_unique_id,),
+        ).fetchone()
+    return _metadata_row(row)
+
+
+def get_media_metadata_by_file_id(file_id):
+    """get the stored metadata of a file by one of its file_ids, or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_METADATA_FIELDS)} FROM media_metadata WHERE file_id = ?",
+            (file_id,),
+        ).fetchone()
+    return _metadata_row(row)
+
+
+def save_media_metadata(metadata):
+    """store the metadata of a file (the latest file_id wins)."""
+    with transaction() as conn:
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO media_metadata ({', '.join(_METADATA_FIELDS)}, updated_at)
+            VALUES ({', '.join('?' * len(_METADATA_FIELDS))}, ?)
+            """,
+            tuple(metadata.get(key) for key in _METADATA_FIELDS) + (datetime.now(),),
+        )
@@ -0,0 +1,168 @@
+"""database-driven dispatcher for scheduled posts (SCHEDULER_MODE=dispatcher).
+
+Instead of one APScheduler job per post, a single task keeps a min-heap of
+(publish_time, post_id) for the next DISPATCHER_WINDOW posts, refilled
+from the publish_time index, and sleeps until the earliest one is due.
+Posts are loaded only when they fire, so memory stays flat however many
+posts are scheduled. Edits and deletes need no bookkeeping: an entry whose
+row is gone or has a different publish_time is dropped when it comes due.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+
+import scheduled_jobs
+from async_database import get_upcoming_posts, recover_interrupted_attempts
+from config import (
+    DISPATCHER_REFILL_SECONDS,
+    DISPATCHER_WINDOW,
+    SCHEDULE_CATCHUP_MAX_LATENESS,
+    SCHEDULE_CATCHUP_POLICY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class DuePostDispatcher:
+    """single task that publishes scheduled posts when they are due."""
+
+    def __init__(self, window=DISPATCHER_WINDOW, refill_interval=DISPATCHER_REFILL_SECONDS):
+        self.window = window
+        self.refill_interval = refill_interval
+        self._heap = []
+        self._queued = set()
+        # latest publish_time loaded from db (None when all rows fit the window)
+        self._horizon = None
+        # posts due at or before this time are never dispatched (catch-up policy);
+        # moved past every post that fired, so refills do not load them again
+        self._floor = None
+        self._floor_id = None
+        self._last_refill = 0.0
+        self._in_flight = set()
+        self._failed = set()
+        # (post_id, publish_time) that fired but were skipped (gone, rescheduled,
+        # claimed elsewhere); not fired again for that time
+        self._skipped = set()
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self, now=None):
+        """start the dispatch loop on the running event loop."""
+        now = now or datetime.now()
+        if SCHEDULE_CATCHUP_POLICY == "run":
+            self._floor = now - timedelta(seconds=SCHEDULE_CATCHUP_MAX_LATENESS)
+        else:
+            self._floor = now
+        scheduled_jobs.release_orphaned_claims()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """stop the loop and wait for posts that are being published."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def notify(self, post_id, publish_time):
+        """queue a new or rescheduled post (call after the row is saved)."""
+        self._failed.discard(post_id)
+        self._skipped.discard((post_id, publish_time))
+        if self._horizon is not None and publish_time > self._horizon:
+            # not in the window yet, a later refill picks it up
+            return
+        self._push(publish_time, post_id)
+        self._wakeup.set()
+
+    def _push(self, publish_time, post_id):
+        key = (publish_time, post_id)
+        if key not in self._queued:
+            self._queued.add(key)
+            heapq.heappush(self._heap, key)
+
+    async def _refill(self):
+        rows = await get_upcoming_posts(self._floor, self.window, self._floor_id)
+        loaded = set()
+        for post_id, publish_time in rows:
+            publish_time = datetime.fromisoformat(str(publish_time))
+            loaded.add((post_id, publish_time))
+            if (
+                post_id in self._in_flight
+                or post_id in self._failed
+                or (post_id, publish_time) in self._skipped
+            ):
+                continue
+            self._push(publish_time, post_id)
+        # skipped rows that were deleted or rescheduled are not needed anymore
+        self._skipped &= loaded
+        if len(rows) == self.window:
+            self._horizon = datetime.fromisoformat(str(rows[-1][1]))
+        else:
+            self._horizon = None
+        self._last_refill = time.monotonic()
+
+    async def _run(self):
+        # posts whose publish was cut off by a crash go first, whatever the floor
+        for post_id, publish_time in await recover_interrupted_attempts():
+            self._push(datetime.fromisoformat(str(publish_time)), post_id)
+        await self._refill()
+        while True:
+            now = datetime.now()
+            while self._heap and self._heap[0][0] <= now:
+                publish_time, post_id = heapq.heappop(self._heap)
+                self._queued.discard((publish_time, post_id))
+                self._advance_floor(publish_time, post_id)
+                self._fire(post_id, publish_time)
+
+            since_refill = time.monotonic() - self._last_refill
+            if not self._heap or since_refill >= self.refill_interval:
+                await self._refill()
+                if self._heap and self._heap[0][0] <= datetime.now():
+                    continue
+                since_refill = 0.0
+
+            timeout = self.refill_interval - since_refill
+            if self._heap:
+                due_in = (self._heap[0][0] - datetime.now()).total_seconds()
+                timeout = min(timeout, due_in)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _advance_floor(self, publish_time, post_id):
+        # failed and refused posts keep their rows; past the floor they no
+        # longer fill the window and hide the posts due after them
+        if publish_time > self._floor or (
+            publish_time == self._floor
+            and self._floor_id is not None
+            and post_id > self._floor_id
+        ):
+            self._floor, self._floor_id = publish_time, post_id
+
+    def _fire(self, post_id, publish_time):
+        self._in_flight.add(post_id)
+        task = asyncio.create_task(self._publish(post_id, publish_time))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish(self, post_id, publish_time):
+        try:
+            if not await scheduled_jobs.publish_scheduled_post(post_id, publish_time):
+                # a refused claim would otherwise be due again on every refill
+                self._skipped.add((post_id, publish_time))
+        except Exception:
+            # like a failed APScheduler job: not retried until rescheduled or restarted
+            logger.exception(f"Failed to publish scheduled post {post_id}")
+            self._failed.add(post_id)
+        finally:
+            self._in_flight.discard(post_id)
@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -71,8 +71,16 @@ class PostHandlers:
     async def preview_post(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data_key: str):
         return await self.preview_handler.preview_post(update, context, data_key)
 
-    async def send_post_job(self, channel_id, post_data, user_id, context=None):
-        return await self.preview_handler.send_post_job(channel_id, post_data, user_id, context)
+    async def send_post_job(self, channel_id, post_data, user_id, context=None, on_retry=None, on_sent=None, notify_failure=True):
+        return await self.preview_handler.send_post_job(
+            channel_id,
+            post_data,
+            user_id,
+            context,
+            on_retry=on_retry,
+            on_sent=on_sent,
+            notify_failure=notify_failure,
+        )
 
     # Post creation methods
     async def create_post_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
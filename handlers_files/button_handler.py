@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -20,6 +20,9 @@ from database import (
     save_scheduled_post,
     update_scheduled_post,
 )
+from album_buffer import album_buffer
+from media_metadata import media_metadata
+from photo_converter import photo_converter
 from telegramcalendar import create_calendar, process_calendar_selection
 from utils import (
     cancel_keyboard,
@@ -36,6 +39,7 @@ from utils import (
     entities_to_html,
     format_text_for_preview,
     get_formatting_warnings,
+    media_item,
     parse_buttons,
     photo_selection_keyboard,
     skip_keyboard,
@@ -52,92 +56,82 @@ class MediaHandler:
     async def add_media_handler(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
-        """Handle all types of media (photo, video, document)."""
+        """Handle all types of media (photo, video, document).
+
+        Updates of an album are collected by album_buffer and added to the
+        post in one step, with a single reply.
+        """
         if "new_post" not in context.user_data:
             context.user_data["new_post"] = {}
 
-        # Determine media type and get file_id
-        media_type = None
-        file_id = None
-        
-        if update.message.photo:
-            media_type = 'photo'
-            file_id = update.message.photo[-1].file_id
-        elif update.message.video:
-            media_type = 'video'
-            file_id = update.message.video.file_id
-        elif update.message.document:
-            # Check if document is an image file
-            document = update.message.document
-            file_name = document.file_name or ""
-            is_image = any(file_name.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'])
-            
-            if is_image or (document.mime_type and document.mime_type.startswith('image/')):
-                # It's an image file - download and re-upload as photo
-                try:
-                    # Download the file
-                    file = await context.bot.get_file(document.file_id)
-                    file_path = await file.download_to_drive()
-                    
-                    # Re-upload as photo to get a photo file_id
-                    with open(file_path, 'rb') as photo_file:
-                        sent_photo = await context.bot.send_photo(
-                            chat_id=update.effective_chat.id,
-                            photo=photo_file
-                        )
-                    
-                    # Use the photo file_id
-                    media_type = 'photo'
-                    file_id = sent_photo.photo[-1].file_id
-                    
-                    # Delete the temporary uploaded photo
-                    try:
-                        await sent_photo.delete()
-                    except:
-                        pass
-                    
-                    # Clean up downloaded file
-                    try:
-                        import os
-                        os.remove(file_path)
-                    except:
-                        pass
-                        
-                except Exception as e:
-                    # If conversion fails, treat as document
-                    await update.message.reply_text(f"⚠️ Не вдалося конвертувати файл у фото. Використовую як документ.")
-                    media_type = 'document'
-                    file_id = document.file_id
-            else:
-                # It's a real document (PDF, TXT, DOC, etc.)
-                media_type = 'document'
-                file_id = document.file_id
-        
-        if not file_id:
-            await update.message.reply_text("❌ Не вдалося обробити медіафайл.")
+        message = update.message
+        if message.media_group_id:
+            album_buffer.add(
+                (update.effective_user.id, message.media_group_id),
+                message.message_id,
+                self._media_from_message(update, context),
+                lambda items: self._add_media(update, context, items),
+            )
+            return MANAGE_NEW_PHOTOS
+
+        item = await self._media_from_message(update, context)
+        if not item:
+            await message.reply_text("❌ Не вдалося обробити медіафайл.")
             return None
+        await self._add_media(update, context, [item])
+        return MANAGE_NEW_PHOTOS
+
+    async def _media_from_message(self, update, context):
+        """stored media item for the photo/video/document of a message, or None."""
+        message = update.message
+        if message.photo:
+            await media_metadata.record(message.photo[-1], 'photo')
+            return media_item(message.photo[-1], 'photo')
+        if message.video:
+            await media_metadata.record(message.video, 'video')
+            return media_item(message.video, 'video')
+        if not message.document:
+            return None
+
+        # Check if document is an image file
+        document = message.document
+        await media_metadata.record(document, 'document')
+        file_name = document.file_name or ""
+        is_image = any(file_name.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'])
+        if is_image or (document.mime_type and document.mime_type.startswith('image/')):
+            # It's an image file - re-upload it as a photo (in memory, cached)
+            converted = await photo_converter.convert(
+                context.bot, update.effective_chat.id, document
+            )
+            if converted:
+                return converted
+            # If conversion fails, treat as document
+            await message.reply_text(f"⚠️ Не вдалося конвертувати файл у фото. Використовую як документ.")
+        # It's a real document (PDF, TXT, DOC, etc.)
+        return media_item(document, 'document')
+
+    async def _add_media(self, update, context, items):
+        """append media items to the new post and show the management menu."""
+        if not items:
+            await update.message.reply_text("❌ Не вдалося обробити медіафайл.")
+            return
+        new_post = context.user_data.setdefault("new_post", {})
+        new_post.setdefault("media", []).extend(items)
+
+        if len(items) == 1:
+            media_type = items[0]["type"]
+            media_icon = '🎥' if media_type == 'video' else '📄' if media_type == 'document' else '📷'
+            await update.message.reply_text(f"✅ {media_icon} Медіа додано!")
+        else:
+            await update.message.reply_text(f"✅ Альбом додано: {len(items)} медіа")
 
-        # Store media with type information
-        context.user_data["new_post"].setdefault("media", [])
-        context.user_data["new_post"]["media"].append({
-            'file_id': file_id,
-            'type': media_type
-        })
-        
-        media_icon = '🎥' if media_type == 'video' else '📄' if media_type == 'document' else '📷'
-        await update.message.reply_text(f"✅ {media_icon} Медіа додано!")
-        
         # Show media management interface
-        media_list = context.user_data["new_post"]["media"]
-        keyboard = create_media_management_keyboard(media_list, "new")
+        keyboard = create_media_management_keyboard(new_post["media"], "new")
         await update.message.reply_text(
             "📷 *Управління медіа:*",
             reply_markup=keyboard,
             parse_mode="Markdown",
         )
-        from config import MANAGE_NEW_PHOTOS
-
-        return MANAGE_NEW_PHOTOS
 
     async def add_photo_handler(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -322,13 +316,17 @@ class MediaHandler:
             # Determine media type and get file_id
             media_type = None
             file_id = None
+            source = None
+            converted = None
             
             if update.message.photo:
                 media_type = 'photo'
-                file_id = update.message.photo[-1].file_id
+                source = update.message.photo[-1]
+                file_id = source.file_id
             elif update.message.video:
                 media_type = 'video'
-                file_id = update.message.video.file_id
+                source = update.message.video
+                file_id = source.file_id
             elif update.message.document:
                 # Check if document is an image file
                 document = update.message.document
@@ -336,45 +334,24 @@ class MediaHandler:
                 is_image = any(file_name.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'])
                 
                 if is_image or (document.mime_type and document.mime_type.startswith('image/')):
-                    # It's an image file - download and re-upload as photo
-                    try:
-                        # Download the file
-                        file = await context.bot.get_file(document.file_id)
-                        file_path = await file.download_to_drive()
-                        
-                        # Re-upload as photo to get a photo file_id
-                        with open(file_path, 'rb') as photo_file:
-                            sent_photo = await context.bot.send_photo(
-                                chat_id=update.effective_chat.id,
-                                photo=photo_file
-                            )
-                        
-                        # Use the photo file_id
+                    # It's an image file - re-upload it as a photo (in memory, cached)
+                    converted = await photo_converter.convert(
+                        context.bot, update.effective_chat.id, document
+                    )
+                    if converted:
                         media_type = 'photo'
-                        file_id = sent_photo.photo[-1].file_id
-                        
-                        # Delete the temporary uploaded photo
-                        try:
-                            await sent_photo.delete()
-                        except:
-                            pass
-                        
-                        # Clean up downloaded file
-                        try:
-                            import os
-                            os.remove(file_path)
-                        except:
-                            pass
-                            
-                    except Exception as e:
+                        file_id = converted["file_id"]
+                    else:
                         # If conversion fails, treat as document
                         await update.message.reply_text(f"⚠️ Не вдалося конвертувати файл у фото. Використовую як документ.")
                         media_type = 'document'
-                        file_id = document.file_id
+                        source = document
+                        file_id = source.file_id
                 else:
                     # It's a real document (PDF, TXT, DOC, etc.)
                     media_type = 'document'
-                    file_id = document.file_id
+                    source = document
+                    file_id = source.file_id
             
             if not file_id:
                 await update.message.reply_text("❌ Не вдалося обробити медіафайл.")
@@ -382,10 +359,9 @@ class MediaHandler:
 
             # Store media with type information
             context.user_data["new_post"].setdefault("media", [])
-            context.user_data["new_post"]["media"].append({
-                'file_id': file_id,
-                'type': media_type
-            })
+            context.user_data["new_post"]["media"].append(
+                converted or media_item(source, media_type)
+            )
             
             media_icon = '🎥' if media_type == 'video' else '📄' if media_type == 'document' else '📷'
             await update.message.reply_text(f"✅ {media_icon} Медіа додано!")
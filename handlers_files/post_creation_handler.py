@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -42,6 +42,8 @@ from utils import (
     skip_photo_keyboard,
 )
 
+from validation import format_errors, validate_text
+
 logger = logging.getLogger(__name__)
 
 
@@ -73,6 +75,15 @@ class PostCreationHandler:
         if update.message.entities:
             text = entities_to_html(text, update.message.entities)
 
+        errors = validate_text(text)
+        if errors:
+            await update.message.reply_text(
+                f"{format_errors(errors)}\n\nНадішліть виправлений текст."
+            )
+            from config import ADD_TEXT
+
+            return ADD_TEXT
+
         context.user_data["new_post"]["text"] = text
 
         # Go directly to media management interface
@@ -101,6 +112,15 @@ class PostCreationHandler:
         if update.message.entities:
             text = entities_to_html(text, update.message.entities)
 
+        errors = validate_text(text)
+        if errors:
+            await update.message.reply_text(
+                f"{format_errors(errors)}\n\nНадішліть виправлений текст."
+            )
+            from config import EDIT_TEXT_FROM_SCHEDULE
+
+            return EDIT_TEXT_FROM_SCHEDULE
+
         context.user_data["new_post"]["text"] = text
 
         # Return to schedule menu
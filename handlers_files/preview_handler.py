@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -20,8 +20,12 @@ from database import (
     save_scheduled_post,
     update_scheduled_post,
 )
+from chat_ids import cached_chat_id
+from retry import RetryingBot
+from telegraph_cache import telegraph_cache
 from telegramcalendar import create_calendar, process_calendar_selection
 from utils import (
+    caption_above_media_kwargs,
     cancel_keyboard,
     clean_unsupported_formatting,
     create_button_management_keyboard,
@@ -38,9 +42,10 @@ from utils import (
     get_formatting_warnings,
     parse_buttons,
     photo_selection_keyboard,
+    resolve_chat_id,
     skip_keyboard,
     skip_photo_keyboard,
-    upload_photo_to_telegraph_by_file_id,
+    use_native_photo_bottom,
 )
 
 logger = logging.getLogger(__name__)
@@ -90,10 +95,19 @@ class PreviewHandler:
             if len(media_list) == 1:
                 media_item = media_list[0]
                 if media_item['type'] == 'photo':
-                    if layout == "photo_bottom":
+                    if layout == "photo_bottom" and use_native_photo_bottom(f"{prefix}{preview_text}"):
+                        # Photo under the text natively, no upload needed
+                        await update.effective_message.reply_photo(
+                            photo=media_item['file_id'],
+                            caption=f"{prefix}{preview_text}",
+                            reply_markup=buttons_markup,
+                            parse_mode=parse_mode,
+                            **caption_above_media_kwargs(),
+                        )
+                    elif layout == "photo_bottom":
                         # Upload photo to telegra.ph for a single-message preview (image under text)
                         try:
-                            telegraph_url = await upload_photo_to_telegraph_by_file_id(context.bot, media_item['file_id'])
+                            telegraph_url = await telegraph_cache.get_url(context.bot, media_item)
                             logger.info(f"Telegraph URL result: {telegraph_url}")
                         except Exception as e:
                             logger.error(f"Error uploading to Telegraph: {e}")
@@ -231,33 +245,35 @@ class PreviewHandler:
                 warning_text, parse_mode="Markdown"
             )
 
-    async def send_post_job(self, channel_id, post_data, user_id, context=None):
-        """function that is called by scheduler to send post."""
-        import os
-        import re
+    async def send_post_job(
+        self,
+        channel_id,
+        post_data,
+        user_id,
+        context=None,
+        on_retry=None,
+        on_sent=None,
+        notify_failure=True,
+    ):
+        """function that is called by scheduler to send post.
 
-        from telegram.ext import Application
+        Bot API calls are retried on transient errors (see retry.py);
+        ``on_retry(error, delay)`` is awaited before each retry and
+        ``on_sent(message)`` as soon as the post is in the channel. The
+        author is told about a failed send unless ``notify_failure`` is
+        False (for callers that report the error themselves).
+        """
+        import re
 
-        bot = (
-            context.bot
-            if context
-            else Application.builder().token(os.getenv("BOT_TOKEN")).build().bot
+        bot = RetryingBot(
+            context.bot if context else await self.bot.publishing_bot(),
+            on_retry=on_retry,
         )
         buttons_markup = create_buttons_markup(post_data.get("buttons"))
 
         try:
-            # Resolve chat_id: support both @username and numeric -100... ids
-            def _resolve_chat_id(raw_id):
-                s = str(raw_id).strip()
-                if s.startswith("-100") and s[1:].isdigit():
-                    return int(s)
-                if s.lstrip("-").isdigit():
-                    # Any other numeric id
-                    return int(s)
-                s = s.lstrip("@")
-                return f"@{s}"
-
-            chat_id = _resolve_chat_id(channel_id)
+            # numeric id resolved ahead of time by pre-flight, if any
+            chat_id = cached_chat_id(channel_id) or resolve_chat_id(channel_id)
             clean_channel_id = str(channel_id).lstrip("@")
 
             # Check for new media format first
@@ -280,9 +296,19 @@ class PreviewHandler:
                 if len(media_list) == 1:
                     media_item = media_list[0]
                     if media_item['type'] == 'photo':
-                        if layout == "photo_bottom":
+                        if layout == "photo_bottom" and use_native_photo_bottom(clean_text):
+                            # Photo under the text natively, no upload needed
+                            sent_message = await bot.send_photo(
+                                chat_id=chat_id,
+                                photo=media_item['file_id'],
+                                caption=clean_text,
+                                reply_markup=buttons_markup,
+                                parse_mode=parse_mode,
+                                **caption_above_media_kwargs(),
+                            )
+                        elif layout == "photo_bottom":
                             # Use single message with link preview via telegra.ph
-                            telegraph_url = await upload_photo_to_telegraph_by_file_id(bot, media_item['file_id'])
+                            telegraph_url = await telegraph_cache.get_url(bot, media_item)
                             
                             if telegraph_url:
                                 # Remove URLs from text to avoid double previews
@@ -459,32 +485,47 @@ class PreviewHandler:
                     parse_mode=parse_mode,
                     disable_web_page_preview=True,
                 )
-            
-            try:
-                # Store media data
-                media_to_store = None
-                media_type = None
-                
-                if media_list:
-                    media_to_store = str(media_list)
-                    if media_list:
-                        media_type = media_list[0]['type']
-                elif photos:
-                    media_to_store = str(photos)
-                    media_type = 'photo'
-                
-                save_published_post(
+        except Exception as e:
+            logger.error(f"Error sending post to {channel_id}: {e}")
+            if notify_failure:
+                clean_channel_id = channel_id.lstrip("@")
+                await bot.send_message(
                     user_id,
-                    channel_id,
-                    sent_message.message_id,
-                    text,
-                    media_to_store,
-                    media_type,
-                    post_data.get("buttons"),
+                    f"❌ Не вдалося надіслати пост у канал @{clean_channel_id}. {e}",
                 )
-            except Exception as _:
-                pass
+            # Re-raise the exception so the caller knows it failed
+            raise
+
+        # the post is live from here on: later errors must not reach the
+        # author as a failed send
+        if on_sent:
+            await on_sent(sent_message)
+
+        try:
+            # Store media data
+            media_to_store = None
+            media_type = None
+
+            if media_list:
+                media_to_store = media_list
+                media_type = media_list[0]['type']
+            elif photos:
+                media_to_store = photos
+                media_type = 'photo'
+
+            await save_published_post(
+                user_id,
+                channel_id,
+                sent_message.message_id,
+                text,
+                media_to_store,
+                media_type,
+                post_data.get("buttons"),
+            )
+        except Exception:
+            logger.exception(f"Could not save published post {sent_message.message_id} in {channel_id}")
 
+        try:
             admin_keyboard = [
                 [
                     InlineKeyboardButton(
@@ -502,13 +543,5 @@ class PreviewHandler:
                 text=f"Пост опубліковано в @{clean_channel_id}. Ви можете ним керувати.",
                 reply_markup=InlineKeyboardMarkup(admin_keyboard),
             )
-
-        except Exception as e:
-            logger.error(f"Error sending post to {channel_id}: {e}")
-            clean_channel_id = channel_id.lstrip("@")
-            await bot.send_message(
-                user_id,
-                f"❌ Не вдалося надіслати пост у канал @{clean_channel_id}. {e}",
-            )
-            # Re-raise the exception so the caller knows it failed
-            raise
\ No newline at end of file
+        except Exception:
+            logger.exception(f"Could not notify {user_id} about published post {sent_message.message_id}")
\ No newline at end of file
@@ -11,11 +11,12 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
     get_scheduled_posts,
+    job_id_for_post,
     save_published_post,
     save_scheduled_post,
     update_scheduled_post,
@@ -38,6 +39,7 @@ from utils import (
     get_formatting_warnings,
     parse_buttons,
     photo_selection_keyboard,
+    send_error_hint,
     skip_keyboard,
     skip_photo_keyboard,
 )
@@ -79,19 +81,7 @@ class PublishHandler:
         publish_time = post_data.get("time")
 
         if publish_time:
-            # scheduled post
-            job_id = (
-                f"post_{update.effective_user.id}_{int(datetime.now().timestamp())}"
-            )
-            self.bot.scheduler.add_job(
-                self.send_post_job,
-                "date",
-                run_date=publish_time,
-                args=[channel_id, post_data, update.effective_user.id],
-                id=job_id,
-            )
-            # save to db
-            # serialize media list for DB storage
+            # scheduled post, save to db
             media_list = post_data.get("media", [])
             photos = post_data.get("photos")
             
@@ -100,16 +90,16 @@ class PublishHandler:
             media_type = None
             
             if media_list:
-                media_to_store = str(media_list)
-                media_type = media_list[0]['type'] if media_list else None
+                media_to_store = media_list
+                media_type = media_list[0]['type']
             elif photos:
-                media_to_store = str(photos)
+                media_to_store = photos
                 media_type = 'photo'
             elif post_data.get("photo"):
-                media_to_store = str([post_data.get("photo")])
+                media_to_store = [post_data.get("photo")]
                 media_type = 'photo'
             
-            save_scheduled_post(
+            post_id = await save_scheduled_post(
                 update.effective_user.id,
                 post_data.get("text"),
                 media_to_store,
@@ -117,27 +107,20 @@ class PublishHandler:
                 post_data.get("buttons", []),
                 publish_time,
                 channel_id,
-                job_id,
+                post_data.get("layout"),
             )
+            self.bot.schedule_post(job_id_for_post(post_id), post_id, publish_time)
             await query.edit_message_text(
                 f"✅ Пост заплановано на {publish_time.strftime('%Y-%m-%d %H:%M')} у канал {channel_id}."
             )
         else:
-            # immediate send
-            try:
-                from handlers_files.preview_handler import PreviewHandler
-                preview_handler = PreviewHandler(self.bot)
-                await preview_handler.send_post_job(
-                    channel_id, post_data, update.effective_user.id, context
-                )
-                await query.edit_message_text(
-                    f"✅ Пост успішно надіслано в канал {channel_id}."
-                )
-            except Exception as e:
-                await query.edit_message_text(
-                    f"❌ Не вдалося надіслати пост у канал {channel_id}. Перевірте, чи бот є адміністратором з правами на публікацію."
-                )
-                return
+            # immediate send: queued behind the channel's other posts, the
+            # result is reported by editing this message
+            await query.edit_message_text(f"⏳ Пост у черзі на публікацію в канал {channel_id}...")
+            context.application.create_task(
+                self._publish_in_background(query, context, channel_id, dict(post_data)),
+                update=update,
+            )
 
         context.user_data.clear()
         # send new message with main menu
@@ -151,8 +134,52 @@ class PublishHandler:
 
         return MAIN_MENU
 
-    async def send_post_job(self, channel_id, post_data, user_id, context=None):
+    async def _publish_in_background(self, query, context, channel_id, post_data):
+        """send the post through the publish queue and report the result."""
+        from handlers_files.preview_handler import PreviewHandler
+        preview_handler = PreviewHandler(self.bot)
+        sent = False
+
+        async def on_sent(message):
+            nonlocal sent
+            sent = True
+            await query.edit_message_text(
+                f"✅ Пост успішно надіслано в канал {channel_id}."
+            )
+
+        try:
+            # the error is reported here, not also as a message from send_post_job
+            await self.bot.publish_queue.run(
+                channel_id,
+                lambda: preview_handler.send_post_job(
+                    channel_id,
+                    post_data,
+                    query.from_user.id,
+                    context,
+                    on_sent=on_sent,
+                    notify_failure=False,
+                ),
+            )
+        except Exception as e:
+            if sent:
+                # the post is in the channel, only what came after the send failed
+                logger.exception(f"Post sent to {channel_id}, but finishing it failed")
+                return
+            logger.error(f"Failed to publish post to {channel_id}: {e}")
+            await query.edit_message_text(
+                f"❌ Не вдалося надіслати пост у канал {channel_id}. {send_error_hint(e)}"
+            )
+
+    async def send_post_job(self, channel_id, post_data, user_id, context=None, on_retry=None, on_sent=None, notify_failure=True):
         """function that is called by scheduler to send post."""
         from handlers_files.preview_handler import PreviewHandler
         preview_handler = PreviewHandler(self.bot)
-        return await preview_handler.send_post_job(channel_id, post_data, user_id, context)
+        return await preview_handler.send_post_job(
+            channel_id,
+            post_data,
+            user_id,
+            context,
+            on_retry=on_retry,
+            on_sent=on_sent,
+            notify_failure=notify_failure,
+        )
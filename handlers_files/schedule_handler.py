@@ -11,7 +11,7 @@ from telegram import (
 from telegram.ext import CallbackQueryHandler, ContextTypes
 
 from config import HARDCODED_CHANNELS, MANAGE_NEW_BUTTONS, MANAGE_NEW_PHOTOS, EDIT_BUTTONS_FROM_SCHEDULE
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
@@ -42,6 +42,8 @@ from utils import (
     skip_photo_keyboard,
 )
 
+from validation import format_errors, validate_post
+
 logger = logging.getLogger(__name__)
 
 
@@ -67,7 +69,19 @@ class ScheduleHandler:
     ):
         query = update.callback_query
         await query.answer()
-        
+
+        if query.data in ("send_now", "schedule"):
+            # check the whole post before a channel or time is picked
+            errors = validate_post(context.user_data.get("new_post", {}))
+            if errors:
+                await query.message.reply_text(
+                    f"{format_errors(errors)}\n\nВиправте пост і спробуйте ще раз.",
+                    reply_markup=create_schedule_keyboard(),
+                )
+                from config import SCHEDULE_TIME
+
+                return SCHEDULE_TIME
+
         if query.data == "send_now":
             from handlers_files.publish_handler import PublishHandler
             publish_handler = PublishHandler(self.bot)
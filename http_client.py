@@ -0,0 +1,69 @@
+"""one long-lived httpx client for outgoing HTTP requests (telegra.ph).
+
+Reusing the client keeps connections alive between uploads, so only the
+first one pays the DNS lookup, TCP connect and TLS handshake. The client
+is created on first use and closed by main on shutdown.
+"""
+
+import asyncio
+import logging
+
+import httpx
+
+from config import (
+    HTTP2,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    HTTP_READ_TIMEOUT,
+    HTTP_TOTAL_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client():
+    """the shared AsyncClient (created on first use)."""
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = HTTP2 and _http2_available()
+        if HTTP2 and not http2:
+            logger.warning("HTTP2=1 but the h2 package is not installed, using HTTP/1.1")
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                HTTP_READ_TIMEOUT,
+                connect=HTTP_CONNECT_TIMEOUT,
+                pool=HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+    return _client
+
+
+async def post(url, **kwargs):
+    """POST with the shared client, failing after HTTP_TOTAL_TIMEOUT seconds overall."""
+    return await asyncio.wait_for(get_client().post(url, **kwargs), HTTP_TOTAL_TIMEOUT)
+
+
+async def close():
+    """close the shared client and its connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
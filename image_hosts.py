@@ -0,0 +1,173 @@
+"""image hosting backends for the photo_bottom layout.
+
+The photo is uploaded somewhere public and its url is put under the text,
+so Telegram shows it as the link preview. IMAGE_HOST picks the backend:
+
+  telegraph  telegra.ph (default)
+  local      files written to IMAGE_HOST_DIR and served by a static web
+             server at IMAGE_HOST_URL
+  fake       kept in memory, with simulated latency and errors, so the
+             publish path can be tested and benchmarked offline
+
+upload() returns the public url or raises ImageHostError.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import uuid
+from abc import ABC, abstractmethod
+
+import http_client
+from config import (
+    IMAGE_HOST,
+    IMAGE_HOST_DIR,
+    IMAGE_HOST_FAKE_ERROR_RATE,
+    IMAGE_HOST_FAKE_LATENCY,
+    IMAGE_HOST_URL,
+)
+from utils import multipart_file_body
+
+logger = logging.getLogger(__name__)
+
+
+class ImageHostError(Exception):
+    """the image could not be uploaded."""
+
+
+class ImageHost(ABC):
+    """uploads an image and returns its public url."""
+
+    name = "base"
+
+    @abstractmethod
+    async def upload(self, data, content_type="image/jpeg"):
+        """upload the image and return its public url."""
+
+
+class TelegraphHost(ImageHost):
+    """telegra.ph upload endpoint.
+
+    Telegraph is very picky about multipart encoding, so the body is built
+    manually and sent with browser-like headers.
+    """
+
+    name = "telegraph"
+    upload_url = "https://telegra.ph/upload"
+
+    async def upload(self, data, content_type="image/jpeg"):
+        boundary = f"----WebKitFormBoundary{uuid.uuid4().hex[:16]}"
+        length, body = multipart_file_body(boundary, "file", "image.jpg", content_type, data)
+        logger.info(f"Multipart body: {length} bytes")
+
+        response = await http_client.post(
+            self.upload_url,
+            content=body,
+            headers={
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Content-Length": str(length),
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+                "Accept": "*/*",
+                "Origin": "https://telegra.ph",
+                "Referer": "https://telegra.ph/",
+            },
+        )
+        logger.info(f"Response: {response.status_code}")
+        if response.status_code != 200:
+            raise ImageHostError(f"HTTP {response.status_code}: {response.text[:300]}")
+        try:
+            result = json.loads(response.text)
+        except ValueError as e:
+            raise ImageHostError(f"Parse error: {e}") from e
+        if isinstance(result, list) and result and result[0].get("src"):
+            return f"https://telegra.ph{result[0]['src']}"
+        if isinstance(result, dict) and result.get("error"):
+            raise ImageHostError(f"API error: {result['error']}")
+        raise ImageHostError(f"Unexpected response: {response.text[:300]}")
+
+
+class LocalHost(ImageHost):
+    """files in a directory that a static web server publishes.
+
+    Files are named by content hash, so re-uploading a photo is free.
+    """
+
+    name = "local"
+    _extensions = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+    def __init__(self, directory=IMAGE_HOST_DIR, base_url=IMAGE_HOST_URL):
+        if not base_url:
+            raise ImageHostError("IMAGE_HOST_URL is required for IMAGE_HOST=local")
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+
+    async def upload(self, data, content_type="image/jpeg"):
+        name = hashlib.sha256(data).hexdigest()[:32] + self._extensions.get(content_type, "")
+        await asyncio.to_thread(self._write, name, data)
+        return f"{self.base_url}/{name}"
+
+    def _write(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            return
+        # write then rename, so the web server never serves half a file
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+class FakeHost(ImageHost):
+    """in-process host with simulated latency and failures."""
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency=IMAGE_HOST_FAKE_LATENCY,
+        error_rate=IMAGE_HOST_FAKE_ERROR_RATE,
+        jitter=0.25,
+        seed=None,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.images = {}
+        self.uploads = 0
+        self.errors = 0
+
+    async def upload(self, data, content_type="image/jpeg"):
+        self.uploads += 1
+        spread = self.latency * self.jitter
+        await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-spread, spread)))
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise ImageHostError("simulated upload failure")
+        key = hashlib.sha256(data).hexdigest()[:16]
+        self.images[key] = bytes(data)
+        return f"https://images.invalid/{key}.jpg"
+
+
+_BACKENDS = {"telegraph": TelegraphHost, "local": LocalHost, "fake": FakeHost}
+_host = None
+
+
+def get_image_host():
+    """the configured image host (created on first use)."""
+    global _host
+    if _host is None:
+        if IMAGE_HOST not in _BACKENDS:
+            raise ImageHostError(f"Unknown IMAGE_HOST {IMAGE_HOST!r}")
+        _host = _BACKENDS[IMAGE_HOST]()
+    return _host
+
+
+def set_image_host(host):
+    """replace the image host (tests and benchmarks)."""
+    global _host
+    _host = host
@@ -0,0 +1,98 @@
+"""Pillow work off the event loop.
+
+Decoding, resizing and re-encoding a large photo takes hundreds of
+milliseconds of CPU, which on the event loop thread would stall every
+other user. to_jpeg() runs it on a small pool of worker processes (or
+threads, IMAGE_EXECUTOR=thread). Only bytes go in and out, so nothing
+has to be pickled but the image data (threads share it without any
+copy). At most IMAGE_QUEUE_SIZE images are queued or in progress;
+further callers wait for a free slot instead of piling decoded images
+up in memory.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from config import (
+    IMAGE_EXECUTOR,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_SIDE,
+    IMAGE_QUEUE_SIZE,
+    IMAGE_WORKERS,
+)
+
+_executor = None
+_slots = None
+
+
+def encode_jpeg(data, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY):
+    """decode an image, shrink it to max_side and return it as JPEG bytes.
+
+    JPEGs are decoded by libjpeg at 1/2, 1/4 or 1/8 scale when that is
+    still at least the target size (Image.draft), other formats are shrunk
+    with a cheap reduce() before the LANCZOS pass, so a 12 MP photo is
+    never fully decoded only to be thrown away by the resize.
+    """
+    from PIL import Image
+
+    # BytesIO shares a bytes object instead of copying it
+    img = Image.open(BytesIO(data))
+    w, h = img.size
+    ratio = min(1.0, max_side / max(w, h))
+    size = (max(1, int(w * ratio)), max(1, int(h * ratio)))
+    if ratio < 1:
+        img.draft("RGB", size)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if IMAGE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(
+                max_workers=IMAGE_WORKERS, thread_name_prefix="image"
+            )
+        else:
+            # spawn: forking a process that runs db threads is not safe
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _executor
+
+
+async def to_jpeg(data, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY):
+    """encode_jpeg() on the image pool."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(IMAGE_QUEUE_SIZE)
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                _get_executor(),
+                functools.partial(encode_jpeg, data, max_side, quality),
+            )
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for memory); start a fresh pool next time
+            shutdown()
+            raise
+
+
+def shutdown():
+    """stop the worker processes (or threads)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
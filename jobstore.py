@@ -0,0 +1,138 @@
+"""apscheduler job store kept in the bot's own sqlite database.
+
+The default MemoryJobStore loses every pending publication on restart.
+SQLiteJobStore keeps pickled jobs in the ``apscheduler_jobs`` table
+(created by migration 6) using the shared connection pool, so jobs live
+next to the scheduled_posts rows they point to.
+"""
+
+import logging
+import pickle
+import sqlite3
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from database import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteJobStore(BaseJobStore):
+    """job store backed by the apscheduler_jobs table."""
+
+    def __init__(self, pickle_protocol=pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT job_state FROM apscheduler_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._reconstitute_job(row[0]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs(
+            "WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),)
+        )
+
+    def get_next_run_time(self):
+        with get_connection() as conn:
+            row = conn.execute(
+                "SELECT MIN(next_run_time) FROM apscheduler_jobs WHERE next_run_time IS NOT NULL"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row[0]) if row[0] is not None else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def get_job_ids(self):
+        """ids of all stored jobs, without unpickling them."""
+        with get_connection() as conn:
+            return {row[0] for row in conn.execute("SELECT id FROM apscheduler_jobs")}
+
+    def add_job(self, job):
+        try:
+            with transaction() as conn:
+                conn.execute(
+                    "INSERT INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    self._job_row(job),
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def add_jobs(self, jobs):
+        """insert many jobs in one transaction, replacing jobs with the same id."""
+        with transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO apscheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                [self._job_row(job) for job in jobs],
+            )
+
+    def update_job(self, job):
+        job_id, next_run_time, job_state = self._job_row(job)
+        with transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE apscheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (next_run_time, job_state, job_id),
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with transaction() as conn:
+            cursor = conn.execute("DELETE FROM apscheduler_jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_jobs(self, job_ids):
+        """delete many jobs in one transaction (missing ids are ignored)."""
+        with transaction() as conn:
+            conn.executemany(
+                "DELETE FROM apscheduler_jobs WHERE id = ?", [(job_id,) for job_id in job_ids]
+            )
+
+    def remove_all_jobs(self):
+        with transaction() as conn:
+            conn.execute("DELETE FROM apscheduler_jobs")
+
+    def _job_row(self, job):
+        return (
+            job.id,
+            datetime_to_utc_timestamp(job.next_run_time),
+            pickle.dumps(job.__getstate__(), self.pickle_protocol),
+        )
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where="", params=()):
+        with get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, job_state FROM apscheduler_jobs {where} ORDER BY next_run_time",
+                params,
+            ).fetchall()
+        jobs = []
+        failed_ids = []
+        for job_id, job_state in rows:
+            try:
+                jobs.append(self._reconstitute_job(job_state))
+            except Exception:
+                logger.exception(f"Unable to restore job {job_id}, removing it")
+                failed_ids.append(job_id)
+        if failed_ids:
+            self.remove_jobs(failed_ids)
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}>"
@@ -11,6 +11,11 @@ from telegram.ext import (
     filters,
 )
 
+import async_database
+import http_client
+import image_pool
+import scheduled_jobs
+from album_buffer import album_buffer
 from bot import ChannelBot
 from config import (
     ADD_BUTTONS,
@@ -35,27 +40,52 @@ from config import (
     EDIT_TEXT_FROM_SCHEDULE,
     EDIT_BUTTONS_FROM_SCHEDULE,
     EDIT_PHOTO_FROM_SCHEDULE,
+    SCHEDULER_MODE,
     get_bot_token,
 )
-from database import db_connect
+from database import close_db, init_db
+from dispatcher import DuePostDispatcher
+from jobstore import SQLiteJobStore
+from photo_converter import photo_converter
+from preflight import Preflight
+from publish_queue import PublishQueue
+from rate_limiter import TokenBucketRateLimiter
 
 
 async def main():
-    # Create database on startup
-    db_connect()
+    # Create database and connection pool on startup
+    init_db()
 
     TOKEN = get_bot_token()
     if not TOKEN:
         print("No BOT_TOKEN")
         return
 
-    # Create scheduler
-    scheduler = AsyncIOScheduler()
-    scheduler.start()
+    # Create scheduler with jobs persisted in the bot database
+    jobstore = SQLiteJobStore()
+    scheduler = AsyncIOScheduler(jobstores={"default": jobstore})
+
+    # one dispatcher task instead of per-post jobs for large backlogs
+    dispatcher = DuePostDispatcher() if SCHEDULER_MODE == "dispatcher" else None
+
+    # every publish goes through one per-channel queue
+    publish_queue = PublishQueue()
 
     # create bot instance
-    bot = ChannelBot(scheduler)
-    application = Application.builder().token(TOKEN).build()
+    bot = ChannelBot(scheduler, dispatcher, publish_queue)
+    # checks and prepares posts a few minutes before they go out
+    preflight = Preflight(bot)
+    scheduled_jobs.setup(bot)
+    if not dispatcher:
+        scheduled_jobs.reconcile_jobs(scheduler, jobstore)
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .rate_limiter(TokenBucketRateLimiter())
+        .build()
+    )
+    # scheduled posts are sent with the application's bot
+    bot.telegram_bot = application.bot
 
     # configure ConversationHandler
     conv_handler = ConversationHandler(
@@ -179,14 +209,6 @@ async def main():
                     bot.post_handlers.schedule_time_handler,
                     pattern=r"^(send_now|schedule|edit_text|edit_photo|edit_buttons|layout_photo_bottom)$",
                 ),
-                CallbackQueryHandler(
-                    bot.post_handlers.change_layout_handler,
-                    pattern="^change_layout$",
-                ),
-                CallbackQueryHandler(
-                    bot.post_handlers.handle_layout_choice,
-                    pattern=r"^(layout_photo_top|layout_photo_bottom|back_to_schedule)$",
-                ),
                 CallbackQueryHandler(
                     bot.post_handlers.manage_photos_handler,
                     pattern=r"^photo_(del_new_\d+|add_new|finish_new)$",
@@ -234,6 +256,10 @@ async def main():
                     bot.scheduled_handlers.publish_now_scheduled_post,
                     pattern="^publish_now_",
                 ),
+                CallbackQueryHandler(
+                    bot.scheduled_handlers.scheduled_posts_page_handler,
+                    pattern="^sp_(prev|next)_",
+                ),
             ],
             # edit scheduled posts
             EDIT_SCHEDULED_POST: [
@@ -333,6 +359,10 @@ async def main():
                     bot.back_to_posts_list,
                     pattern=r"^back_to_posts$",
                 ),
+                CallbackQueryHandler(
+                    bot.published_posts_page_handler,
+                    pattern=r"^pp_(prev|next)_",
+                ),
                 CallbackQueryHandler(
                     bot.edit_delete_published_handler,
                     pattern=r"^(editpublished_|deletepublished_)",
@@ -362,15 +392,33 @@ async def main():
     await application.initialize()
     await application.start()
     await application.updater.start_polling()
+    publish_queue.start()
+    if dispatcher:
+        dispatcher.start()
+    else:
+        scheduler.start()
+    preflight.start()
 
     try:
         await asyncio.Event().wait()
     except KeyboardInterrupt:
         print("\nBot stop")
     finally:
+        await preflight.stop()
+        if dispatcher:
+            await dispatcher.stop()
+        else:
+            scheduler.shutdown(wait=False)
+        await publish_queue.stop()
+        await album_buffer.close()
+        await photo_converter.close()
         await application.updater.stop()
         await application.stop()
         await application.shutdown()
+        await http_client.close()
+        image_pool.shutdown()
+        async_database.shutdown()
+        close_db()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+"""metadata of media seen in incoming messages.
+
+A stored media item only has to carry file_id and type; size, dimensions,
+MIME type and duration come with the PhotoSize/Video/Document of the
+message the media arrived in. They are recorded here, keyed by
+file_unique_id (in an LRU over the media_metadata table, with a file_id
+index for items saved without file_unique_id), so later stages - the
+telegra.ph upload, pre-flight - can read them without a getFile call.
+"""
+
+import logging
+from collections import OrderedDict
+
+from async_database import (
+    get_media_metadata,
+    get_media_metadata_by_file_id,
+    save_media_metadata,
+)
+from config import MEDIA_METADATA_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# metadata key -> Telegram object attribute
+_ATTRIBUTES = (
+    ("file_unique_id", "file_unique_id"),
+    ("file_id", "file_id"),
+    ("width", "width"),
+    ("height", "height"),
+    ("file_size", "file_size"),
+    ("mime_type", "mime_type"),
+    ("duration", "duration"),
+    ("file_name", "file_name"),
+)
+
+
+def metadata_from(file, media_type):
+    """metadata dict of a PhotoSize/Video/Document (None without file_unique_id)."""
+    metadata = {"type": media_type}
+    for key, attr in _ATTRIBUTES:
+        value = getattr(file, attr, None)
+        if value is not None:
+            # Video.duration is a timedelta in newer PTB versions
+            metadata[key] = int(value.total_seconds()) if hasattr(value, "total_seconds") else value
+    if not metadata.get("file_unique_id"):
+        return None
+    if media_type == "photo":
+        # Telegram stores photos as JPEG
+        metadata.setdefault("mime_type", "image/jpeg")
+    return metadata
+
+
+class MediaMetadataCache:
+    """file_unique_id -> metadata, in memory over the database."""
+
+    def __init__(self, size=MEDIA_METADATA_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._by_file_id = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def record(self, file, media_type):
+        """remember the metadata of a file from an incoming message."""
+        metadata = metadata_from(file, media_type)
+        if metadata is None:
+            return None
+        if self._entries.get(metadata["file_unique_id"]) != metadata:
+            await save_media_metadata(metadata)
+        self._remember(metadata)
+        return metadata
+
+    async def get(self, file_unique_id):
+        """metadata of a file, or None if it was never seen."""
+        metadata = self._entries.get(file_unique_id)
+        if metadata is None:
+            metadata = await get_media_metadata(file_unique_id)
+            if metadata is None:
+                self.misses += 1
+                return None
+        self.hits += 1
+        self._remember(metadata)
+        return metadata
+
+    async def get_by_file_id(self, file_id):
+        """metadata of a file by its file_id, or None if it was never seen."""
+        key = self._by_file_id.get(file_id)
+        if key in self._entries:
+            return await self.get(key)
+        metadata = await get_media_metadata_by_file_id(file_id)
+        if metadata is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(metadata)
+        return metadata
+
+    async def for_item(self, media):
+        """metadata of a stored media item, or None."""
+        if media.get("file_unique_id"):
+            return await self.get(media["file_unique_id"])
+        return await self.get_by_file_id(media["file_id"])
+
+    def _remember(self, metadata):
+        key = metadata["file_unique_id"]
+        old = self._entries.get(key)
+        if old and old["file_id"] != metadata["file_id"]:
+            self._by_file_id.pop(old["file_id"], None)
+        self._entries[key] = metadata
+        self._entries.move_to_end(key)
+        self._by_file_id[metadata["file_id"]] = key
+        while len(self._entries) > self.size:
+            _, evicted = self._entries.popitem(last=False)
+            self._by_file_id.pop(evicted["file_id"], None)
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+# shared by the handlers and the publishing path
+media_metadata = MediaMetadataCache()
@@ -0,0 +1,318 @@
+"""ordered schema migrations applied once at startup.
+
+Each migration is ``(version, description, steps)`` where a step is either
+an SQL string or a callable taking the connection. Applied versions are
+recorded in the ``schema_version`` table; every migration runs in its own
+transaction, so a failed one leaves the database at the previous version.
+Append new migrations to the end of MIGRATIONS, never edit applied ones.
+"""
+
+import logging
+from datetime import datetime
+
+from post_codec import decode_buttons, decode_media, encode_buttons, encode_media
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(table, column, definition):
+    """step that adds a column unless the table already has it."""
+
+    def step(conn):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    return step
+
+
+def _reencode_media_and_buttons(conn):
+    """rewrite legacy str()/json blobs in canonical post_codec encoding."""
+    for table in ("scheduled_posts", "published_posts"):
+        rows = conn.execute(
+            f"SELECT id, photo_id, buttons FROM {table} "
+            "WHERE photo_id IS NOT NULL OR buttons IS NOT NULL"
+        ).fetchall()
+        updates = []
+        for row_id, photo_id, buttons in rows:
+            media = encode_media(decode_media(photo_id))
+            encoded_buttons = encode_buttons(decode_buttons(buttons))
+            if media != photo_id or encoded_buttons != buttons:
+                updates.append((media, encoded_buttons, row_id))
+        conn.executemany(
+            f"UPDATE {table} SET photo_id=?, buttons=? WHERE id=?", updates
+        )
+
+
+def _move_media_to_post_media(conn):
+    """copy serialized media lists into post_media rows."""
+    for kind, table in (("scheduled", "scheduled_posts"), ("published", "published_posts")):
+        rows = conn.execute(
+            f"SELECT id, photo_id FROM {table} WHERE photo_id IS NOT NULL"
+        ).fetchall()
+        conn.executemany(
+            "INSERT OR REPLACE INTO post_media (post_kind, post_id, position, file_id, file_unique_id, type, width, height, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    kind,
+                    post_id,
+                    position,
+                    item["file_id"],
+                    item.get("file_unique_id"),
+                    item["type"],
+                    item.get("width"),
+                    item.get("height"),
+                    item.get("size"),
+                )
+                for post_id, photo_id in rows
+                for position, item in enumerate(decode_media(photo_id))
+            ],
+        )
+        conn.execute(f"UPDATE {table} SET photo_id = NULL WHERE photo_id IS NOT NULL")
+
+
+MIGRATIONS = [
+    (
+        1,
+        "initial schema",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS channels (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                channel_id TEXT NOT NULL UNIQUE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS scheduled_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                text TEXT,
+                photo_id TEXT,
+                media_type TEXT,
+                buttons TEXT,
+                publish_time DATETIME NOT NULL,
+                channel_id TEXT NOT NULL,
+                job_id TEXT NOT NULL UNIQUE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS published_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                channel_id TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                text TEXT,
+                photo_id TEXT,
+                media_type TEXT,
+                buttons TEXT
+            )
+            """,
+        ],
+    ),
+    (
+        2,
+        "add layout column to scheduled_posts",
+        [_add_column("scheduled_posts", "layout", "TEXT")],
+    ),
+    (
+        3,
+        "indexes for per-user lists and message lookups",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_published_posts_channel_message "
+            "ON published_posts (channel_id, message_id)",
+            "CREATE INDEX IF NOT EXISTS idx_published_posts_user_id "
+            "ON published_posts (user_id, id DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_scheduled_posts_user_time "
+            "ON scheduled_posts (user_id, publish_time)",
+        ],
+    ),
+    (
+        4,
+        "re-encode media and buttons as canonical json",
+        [_reencode_media_and_buttons],
+    ),
+    (
+        5,
+        "normalized post_media table",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS post_media (
+                post_kind TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                file_id TEXT NOT NULL,
+                file_unique_id TEXT,
+                type TEXT NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                size INTEGER,
+                PRIMARY KEY (post_kind, post_id, position)
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_post_media_file_unique_id "
+            "ON post_media (file_unique_id)",
+            _move_media_to_post_media,
+        ],
+    ),
+    (
+        6,
+        "persistent scheduler job store",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS apscheduler_jobs (
+                id TEXT PRIMARY KEY,
+                next_run_time REAL,
+                job_state BLOB NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_apscheduler_jobs_next_run_time "
+            "ON apscheduler_jobs (next_run_time)",
+        ],
+    ),
+    (
+        7,
+        "index for due-post dispatcher",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_scheduled_posts_publish_time "
+            "ON scheduled_posts (publish_time)",
+        ],
+    ),
+    (
+        8,
+        "publish attempts log",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS publish_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                attempt INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                started_at DATETIME NOT NULL,
+                finished_at DATETIME
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_publish_attempts_post_id "
+            "ON publish_attempts (post_id, attempt)",
+            "CREATE INDEX IF NOT EXISTS idx_publish_attempts_status "
+            "ON publish_attempts (status)",
+        ],
+    ),
+    (
+        9,
+        "publish ledger and job ids derived from post ids",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS publish_ledger (
+                post_id INTEGER PRIMARY KEY,
+                attempt INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                claimed_at DATETIME NOT NULL,
+                lease_until DATETIME NOT NULL,
+                finished_at DATETIME,
+                message_id INTEGER
+            )
+            """,
+            # old ids were post_<user>_<unix seconds> and could collide;
+            # jobs are re-created under the new ids by reconciliation
+            "UPDATE scheduled_posts SET job_id = 'post_' || id",
+        ],
+    ),
+    (
+        10,
+        "telegraph url cache",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS telegraph_urls (
+                file_unique_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                created_at DATETIME NOT NULL
+            )
+            """,
+        ],
+    ),
+    (
+        11,
+        "photos converted from image documents",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS converted_photos (
+                document_unique_id TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                file_unique_id TEXT,
+                width INTEGER,
+                height INTEGER,
+                file_size INTEGER,
+                created_at DATETIME NOT NULL
+            )
+            """,
+        ],
+    ),
+    (
+        12,
+        "media metadata cache",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS media_metadata (
+                file_unique_id TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                file_size INTEGER,
+                mime_type TEXT,
+                duration INTEGER,
+                file_name TEXT,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_media_metadata_file_id ON media_metadata (file_id)",
+        ],
+    ),
+]
+
+
+def get_schema_version(conn):
+    """return the latest applied migration version (0 for a new database)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """
+    )
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """apply every migration newer than the current schema version."""
+    current = get_schema_version(conn)
+    conn.commit()
+    for version, description, steps in sorted(migrations, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        try:
+            conn.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now()),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {version} failed", exc_info=True)
+            raise
+        current = version
+    return current
@@ -0,0 +1,154 @@
+"""conversion of image documents to photos.
+
+An image sent as a file arrives as a document; to post it as a photo it
+is downloaded into memory, sent back to the author's chat with send_photo
+to get a photo file_id, and that scratch message is deleted again. The
+result is remembered by the document's file_unique_id (in an LRU over the
+converted_photos table), so the same file is converted only once, and
+concurrent conversions of it share one upload. Scratch messages are
+deleted in batches with deleteMessages, SCRATCH_DELETE_DELAY seconds after
+the last one of a chat, so an album costs one delete call instead of ten.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from telegram.error import TelegramError
+
+import image_pool
+from async_database import get_converted_photo, save_converted_photo
+from config import CONVERTED_PHOTO_CACHE_SIZE, SCRATCH_DELETE_DELAY
+from media_metadata import media_metadata
+from utils import _KeepBytes, media_item
+
+logger = logging.getLogger(__name__)
+
+# send_photo accepts up to 10 MB; larger images are re-encoded first
+PHOTO_SIZE_LIMIT = 10 * 1024 * 1024
+# formats send_photo takes as they are
+_PHOTO_MIME_TYPES = ("image/jpeg", "image/png", "image/webp")
+# deleteMessages takes at most this many ids per call
+_DELETE_BATCH = 100
+
+
+class PhotoConverter:
+    """document file_unique_id -> photo media item, in memory over the database."""
+
+    def __init__(self, size=CONVERTED_PHOTO_CACHE_SIZE, delete_delay=SCRATCH_DELETE_DELAY):
+        self.size = size
+        self.delete_delay = delete_delay
+        self._photos = OrderedDict()
+        self._conversions = {}
+        # chat id -> (bot, scratch message ids waiting to be deleted)
+        self._scratch = {}
+        self._flushers = {}
+        self.hits = 0
+        self.conversions = 0
+        self.delete_calls = 0
+
+    async def convert(self, bot, chat_id, document):
+        """photo media item for an image document, or None if it cannot be converted.
+
+        ``chat_id`` is the chat the scratch photo is sent to (the author's).
+        """
+        key = document.file_unique_id
+        item = self._photos.get(key)
+        if item:
+            self._photos.move_to_end(key)
+            self.hits += 1
+            return dict(item)
+
+        conversion = self._conversions.get(key)
+        if conversion is None:
+            conversion = asyncio.ensure_future(self._load(bot, chat_id, document))
+            self._conversions[key] = conversion
+            conversion.add_done_callback(lambda _: self._conversions.pop(key, None))
+        try:
+            item = await asyncio.shield(conversion)
+        except Exception as e:
+            logger.error(f"Could not convert document {document.file_id} to a photo: {e}")
+            return None
+        self._remember(key, item)
+        return dict(item)
+
+    async def _load(self, bot, chat_id, document):
+        item = await get_converted_photo(document.file_unique_id)
+        if item:
+            self.hits += 1
+            return item
+
+        self.conversions += 1
+        tg_file = await bot.get_file(document.file_id)
+        downloaded = _KeepBytes()
+        await tg_file.download_to_memory(downloaded)
+        data = downloaded.data
+        filename = document.file_name or "photo.jpg"
+        if len(data) > PHOTO_SIZE_LIMIT or document.mime_type not in _PHOTO_MIME_TYPES:
+            data = await image_pool.to_jpeg(data)
+            filename = "photo.jpg"
+
+        sent = await bot.send_photo(chat_id=chat_id, photo=data, filename=filename)
+        self._delete_later(bot, chat_id, sent.message_id)
+        await media_metadata.record(sent.photo[-1], "photo")
+        item = media_item(sent.photo[-1], "photo")
+        await save_converted_photo(document.file_unique_id, item)
+        return item
+
+    def _remember(self, key, item):
+        self._photos[key] = item
+        self._photos.move_to_end(key)
+        while len(self._photos) > self.size:
+            self._photos.popitem(last=False)
+
+    def _delete_later(self, bot, chat_id, message_id):
+        _, pending = self._scratch.setdefault(chat_id, (bot, []))
+        pending.append(message_id)
+        if len(pending) >= _DELETE_BATCH:
+            flusher = self._flushers.pop(chat_id, None)
+            if flusher:
+                flusher.cancel()
+            asyncio.ensure_future(self._flush(chat_id))
+        elif chat_id not in self._flushers:
+            self._flushers[chat_id] = asyncio.ensure_future(self._flush_later(chat_id))
+
+    async def _flush_later(self, chat_id):
+        # wait for the rest of an album before deleting
+        while True:
+            pending = len(self._scratch.get(chat_id, (None, []))[1])
+            await asyncio.sleep(self.delete_delay)
+            if len(self._scratch.get(chat_id, (None, []))[1]) == pending:
+                break
+        del self._flushers[chat_id]
+        await self._flush(chat_id)
+
+    async def _flush(self, chat_id):
+        if chat_id not in self._scratch:
+            return
+        bot, message_ids = self._scratch.pop(chat_id)
+        for start in range(0, len(message_ids), _DELETE_BATCH):
+            self.delete_calls += 1
+            try:
+                await bot.delete_messages(chat_id, message_ids[start : start + _DELETE_BATCH])
+            except TelegramError as e:
+                logger.warning(f"Could not delete scratch photos in {chat_id}: {e}")
+
+    async def close(self):
+        """delete the scratch messages that are still waiting."""
+        for task in self._flushers.values():
+            task.cancel()
+        self._flushers.clear()
+        for chat_id in list(self._scratch):
+            await self._flush(chat_id)
+
+    def metrics(self):
+        return {
+            "hits": self.hits,
+            "conversions": self.conversions,
+            "delete_calls": self.delete_calls,
+            "size": len(self._photos),
+        }
+
+
+# shared by the media handlers
+photo_converter = PhotoConverter()
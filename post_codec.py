@@ -0,0 +1,82 @@
+"""canonical encoding of media lists and buttons stored in the database.
+
+Both are stored as compact JSON:
+
+    media:   [{"file_id": "...", "type": "photo"}, ...]
+    buttons: [{"text": "...", "url": "..."}, ...]
+
+Older rows hold ``str(list)`` reprs (sometimes of bare file_id strings)
+or a single file_id. decode_* still read those, falling back to
+ast.literal_eval only when the value is not JSON. Migration 4 in
+migrations.py rewrites such rows once, so the slow path is only hit by
+rows written by an older version of the bot.
+"""
+
+import ast
+import json
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+_loads = json.loads
+
+
+def normalize_media(items):
+    """return media items as a list of dicts with file_id and type."""
+    media = []
+    for item in items or []:
+        if isinstance(item, str):
+            media.append({"file_id": item, "type": "photo"})
+        elif isinstance(item, dict) and item.get("file_id"):
+            normalized = dict(item)
+            normalized.setdefault("type", "photo")
+            media.append(normalized)
+    return media
+
+
+def _decode_list(raw):
+    if raw is None:
+        return None
+    if isinstance(raw, (list, tuple)):
+        return list(raw)
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        value = _loads(raw)
+    except ValueError:
+        if not raw.startswith("["):
+            return None
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return None
+    return value if isinstance(value, list) else None
+
+
+def encode_media(media):
+    """encode media list for storage (None for no media)."""
+    media = normalize_media(media)
+    return _dumps(media) if media else None
+
+
+def decode_media(raw):
+    """decode stored media into a list of dicts (empty list for no media)."""
+    value = _decode_list(raw)
+    if value is None:
+        # legacy rows may hold a single bare file_id
+        if isinstance(raw, str) and raw.strip() and not raw.lstrip().startswith("["):
+            return [{"file_id": raw.strip(), "type": "photo"}]
+        return []
+    return normalize_media(value)
+
+
+def encode_buttons(buttons):
+    """encode buttons list for storage (None for no buttons)."""
+    return _dumps(list(buttons)) if buttons else None
+
+
+def decode_buttons(raw):
+    """decode stored buttons into a list of dicts (empty list for none)."""
+    value = _decode_list(raw)
+    if not value:
+        return []
+    return [b for b in value if isinstance(b, dict) and "text" in b and "url" in b]
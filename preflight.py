@@ -0,0 +1,171 @@
+"""pre-flight checks of scheduled posts, PREFLIGHT_LEAD seconds ahead.
+
+Every PREFLIGHT_INTERVAL seconds the posts due within the lead time are
+prepared so that at publish time only the final send is left:
+
+- the channel is resolved with getChat (cached for send_post_job) and the
+  bot's right to post there is checked
+- file_ids are checked with getFile (skipped for files media_metadata
+  knows to be over the 20 MB download limit)
+- photo_bottom photos that still go through telegra.ph are uploaded
+  (the url lands in telegraph_cache)
+- the post is checked against Bot API limits again (validation.py), in
+  case it was stored before the checks existed
+
+Problems are sent to the author right away instead of surfacing when the
+post fails at its publish time. Each version of a post is checked once.
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from telegram.error import BadRequest, TelegramError
+
+from async_database import get_scheduled_post_for_job, get_upcoming_posts
+from chat_ids import remember_chat_id
+from config import PREFLIGHT_INTERVAL, PREFLIGHT_LEAD
+from media_metadata import media_metadata
+from post_codec import encode_buttons, encode_media
+from telegraph_cache import telegraph_cache
+from utils import resolve_chat_id, send_error_hint
+from validation import send_method, validate_post
+
+logger = logging.getLogger(__name__)
+
+# largest file getFile works for (bigger ones can still be sent)
+DOWNLOAD_LIMIT = 20 * 1024 * 1024
+# upcoming posts looked at per scan
+_BATCH = 500
+
+class Preflight:
+    """periodic task that prepares posts due within the lead time."""
+
+    def __init__(self, channel_bot, lead=PREFLIGHT_LEAD, interval=PREFLIGHT_INTERVAL):
+        self.channel_bot = channel_bot
+        self.lead = lead
+        self.interval = interval
+        # post id -> fingerprint of the version already checked
+        self._checked = {}
+        self._task = None
+        self.checked = 0
+        self.failed = 0
+
+    def start(self):
+        """start the scan loop on the running event loop (no-op if lead is 0)."""
+        if self.lead > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.scan()
+            except Exception:
+                logger.exception("Pre-flight scan failed")
+            await asyncio.sleep(self.interval)
+
+    async def scan(self, now=None):
+        """check every post due within the lead time that was not checked yet."""
+        now = now or datetime.now()
+        horizon = now + timedelta(seconds=self.lead)
+        due = set()
+        for post_id, publish_time in await get_upcoming_posts(now, _BATCH):
+            if datetime.fromisoformat(str(publish_time)) > horizon:
+                break
+            due.add(post_id)
+            post = await get_scheduled_post_for_job(post_id)
+            if post is None:
+                continue
+            fingerprint = self._fingerprint(post)
+            if self._checked.get(post_id) == fingerprint:
+                continue
+            self._checked[post_id] = fingerprint
+            await self.check_post(post_id, post)
+        # forget posts that were published, deleted or moved out of the window
+        for post_id in set(self._checked) - due:
+            del self._checked[post_id]
+
+    @staticmethod
+    def _fingerprint(post):
+        _, channel_id, publish_time, post_data = post
+        data = "\x00".join(
+            [
+                str(channel_id),
+                str(publish_time),
+                post_data.get("text") or "",
+                encode_media(post_data.get("media")) or "",
+                encode_buttons(post_data.get("buttons")) or "",
+                post_data.get("layout") or "",
+            ]
+        )
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    async def check_post(self, post_id, post):
+        """run the checks for one post and tell the author about problems."""
+        user_id, channel_id, publish_time, post_data = post
+        bot = await self.channel_bot.publishing_bot()
+        method = send_method(post_data)
+        problems = [error["message"] for error in validate_post(post_data)]
+
+        try:
+            # normalized like send_post_job does it (a bare "name" is "@name")
+            chat = await bot.get_chat(resolve_chat_id(channel_id))
+            remember_chat_id(channel_id, chat.id)
+            if chat.type == "channel":
+                member = await bot.get_chat_member(chat.id, bot.id)
+                if member.status not in ("administrator", "creator"):
+                    problems.append("бот не є адміністратором каналу")
+                elif member.status == "administrator" and not getattr(
+                    member, "can_post_messages", True
+                ):
+                    problems.append("бот не має права публікувати в каналі")
+        except TelegramError as e:
+            problems.append(send_error_hint(e))
+
+        for item in post_data.get("media") or []:
+            metadata = await media_metadata.for_item(item)
+            if metadata and metadata.get("file_size", 0) > DOWNLOAD_LIMIT:
+                # getFile would only answer "file is too big"
+                continue
+            try:
+                await bot.get_file(item["file_id"])
+            except BadRequest as e:
+                # files over 20 MB cannot be downloaded but can still be sent
+                if "too big" not in e.message.lower():
+                    problems.append(f"файл {item['type']} недійсний: {e.message}")
+            except TelegramError as e:
+                logger.warning(f"Pre-flight could not check a file of post {post_id}: {e}")
+
+        if method == "telegraph":
+            # warms the cache, publishing then reuses the url
+            if not await telegraph_cache.get_url(bot, post_data["media"][0]):
+                logger.warning(
+                    f"Pre-flight upload failed for post {post_id}, it will be sent as a captioned photo"
+                )
+
+        self.checked += 1
+        logger.info(f"Pre-flight post {post_id}: {method}, {len(problems)} problems")
+        if problems:
+            self.failed += 1
+            await self._notify(bot, user_id, channel_id, publish_time, problems)
+
+    async def _notify(self, bot, user_id, channel_id, publish_time, problems):
+        when = datetime.fromisoformat(str(publish_time)).strftime("%Y-%m-%d %H:%M")
+        text = (
+            f"⚠️ Пост на {when} у {channel_id} потрібно виправити до публікації:\n"
+            + "\n".join(f"• {problem}" for problem in problems)
+        )
+        try:
+            await bot.send_message(chat_id=user_id, text=text)
+        except TelegramError as e:
+            logger.error(f"Could not send pre-flight warning to {user_id}: {e}")
@@ -0,0 +1,126 @@
+"""per-channel publish queue drained by a fixed pool of workers.
+
+Posts for the same channel are published one after another in the order
+they were submitted (so albums never interleave and the per-chat limit is
+respected), while different channels are served in parallel by up to
+PUBLISH_WORKERS workers. Channels take turns, one post at a time, so a
+busy channel cannot starve the others.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from config import PUBLISH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def channel_key(channel_id):
+    """normalize '@Name' / 'name' / -100... into one queue key."""
+    return str(channel_id).strip().lstrip("@").lower()
+
+
+class PublishQueue:
+    """serializes publishing per channel across a bounded worker pool.
+
+    ``metrics_hook(channel, waited, took, depth)`` is called after every job
+    with the seconds it spent queued and running and the total number of
+    jobs still queued.
+    """
+
+    def __init__(self, workers=PUBLISH_WORKERS, metrics_hook=None):
+        self.workers = workers
+        self.metrics_hook = metrics_hook
+        # channel -> deque of (enqueued_at, job, future)
+        self._pending = {}
+        # channels with pending jobs, each listed at most once
+        self._ready = asyncio.Queue()
+        self._scheduled = set()
+        self._tasks = []
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """start the workers on the running event loop."""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """stop the workers; jobs that did not start yet are cancelled."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for jobs in self._pending.values():
+            for _, _, future in jobs:
+                future.cancel()
+        self._pending.clear()
+        self._scheduled.clear()
+
+    def submit(self, channel_id, job):
+        """queue ``job`` (a coroutine function) and return a future of its result."""
+        key = channel_key(channel_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, deque()).append((time.monotonic(), job, future))
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return future
+
+    async def run(self, channel_id, job):
+        """publish through the queue and wait (runs directly if not started)."""
+        if not self._tasks:
+            return await job()
+        return await self.submit(channel_id, job)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            jobs = self._pending[key]
+            enqueued_at, job, future = jobs.popleft()
+            started = time.monotonic()
+            try:
+                if not future.done():
+                    result = await job()
+                    if not future.done():
+                        future.set_result(result)
+                    self.completed += 1
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                if jobs:
+                    # back of the line, so other channels get their turn
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                    self._scheduled.discard(key)
+            waited = started - enqueued_at
+            took = time.monotonic() - started
+            logger.debug(f"Published to {key}: queued {waited:.2f}s, took {took:.2f}s")
+            if self.metrics_hook:
+                self.metrics_hook(key, waited, took, self.depth)
+
+    @property
+    def depth(self):
+        """number of jobs waiting (not counting the ones running)."""
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    def metrics(self):
+        """queue depth plus depth and lag (age of the oldest job) per channel."""
+        now = time.monotonic()
+        return {
+            "queue_depth": self.depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "channels": {
+                key: {"depth": len(jobs), "lag": now - jobs[0][0]}
+                for key, jobs in self._pending.items()
+                if jobs
+            },
+        }
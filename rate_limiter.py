@@ -0,0 +1,199 @@
+"""token-bucket throttling for every Bot API call made by the application.
+
+Plugged into python-telegram-bot with ``Application.builder().rate_limiter()``,
+so it sees each request before it is sent. A request that posts a
+message (send*, copy/forward) waits for a token from the bucket of its
+chat (private chats and groups/channels have different limits); every
+request then waits for one from the global bucket. Waiting is cooperative
+(asyncio sleeps in FIFO order), so bursts are smoothed out instead of
+coming back from Telegram as 429 errors. If a RetryAfter still happens,
+all requests are held for the time Telegram asked for.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from chat_ids import cached_chat_id, channel_key, remember_chat_id
+from config import (
+    RATE_LIMIT_GLOBAL_PER_SECOND,
+    RATE_LIMIT_GROUP_PER_MINUTE,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_PRIVATE_BURST,
+    RATE_LIMIT_PRIVATE_PER_SECOND,
+)
+
+logger = logging.getLogger(__name__)
+
+# drop idle per-chat buckets once there are more than this many
+_MAX_IDLE_BUCKETS = 1000
+# endpoints besides send* that post a message (and count against the chat limits)
+_MESSAGE_ENDPOINTS = ("copyMessage", "copyMessages", "forwardMessage", "forwardMessages")
+
+
+def _chat_key(endpoint, chat_id):
+    """bucket key of a request, or None for calls that post no message."""
+    if chat_id is None or not (
+        endpoint.startswith("send") or endpoint in _MESSAGE_ENDPOINTS
+    ):
+        return None
+    with contextlib.suppress(ValueError, TypeError):
+        return int(chat_id)
+    # '@name' shares the bucket of its numeric id once the channel is resolved
+    # (pre-flight or the first message sent to it); until then the two forms
+    # of one channel are throttled separately
+    return cached_chat_id(chat_id) or channel_key(chat_id)
+
+
+def _learn_chat_id(chat_id, result):
+    # a sent message carries the numeric id of the chat it went to
+    message = result[0] if isinstance(result, list) and result else result
+    chat = message.get("chat") if isinstance(message, dict) else None
+    if chat and chat.get("id"):
+        remember_chat_id(chat_id, chat["id"])
+
+
+class TokenBucket:
+    """refills ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def idle(self):
+        """True when the bucket is full and nobody is waiting on it."""
+        self._refill()
+        return self._tokens >= self.capacity and not self._lock.locked()
+
+    async def acquire(self):
+        """wait for a token and return the seconds spent waiting."""
+        started = time.monotonic()
+        # the lock queues waiters in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return time.monotonic() - started
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """global plus per-chat token buckets for outgoing requests.
+
+    ``rate_limit_args`` (passed per call by python-telegram-bot) overrides
+    the number of retries after a RetryAfter error.
+    """
+
+    def __init__(
+        self,
+        global_per_second=RATE_LIMIT_GLOBAL_PER_SECOND,
+        private_per_second=RATE_LIMIT_PRIVATE_PER_SECOND,
+        private_burst=RATE_LIMIT_PRIVATE_BURST,
+        group_per_minute=RATE_LIMIT_GROUP_PER_MINUTE,
+        max_retries=RATE_LIMIT_MAX_RETRIES,
+    ):
+        self.global_per_second = global_per_second
+        self.private_per_second = private_per_second
+        self.private_burst = private_burst
+        self.group_per_minute = group_per_minute
+        self.max_retries = max_retries
+        self._global = None
+        self._chats = {}
+        self._retry_after = None
+        # metrics
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retry_after_hits = 0
+
+    async def initialize(self):
+        self._global = TokenBucket(self.global_per_second, self.global_per_second)
+        self._retry_after = asyncio.Event()
+        self._retry_after.set()
+
+    async def shutdown(self):
+        self._chats.clear()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _MAX_IDLE_BUCKETS:
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle}
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = TokenBucket(self.private_per_second, self.private_burst)
+            else:
+                # channels, supergroups and @usernames
+                bucket = TokenBucket(self.group_per_minute / 60, self.group_per_minute)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _throttle(self, chat_id):
+        waited = 0.0
+        if chat_id is not None:
+            waited += await self._chat_bucket(chat_id).acquire()
+        waited += await self._global.acquire()
+        await self._retry_after.wait()
+        return waited
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        raw_chat_id = data.get("chat_id")
+        chat_id = _chat_key(endpoint, raw_chat_id)
+
+        self.requests += 1
+        for attempt in range(max_retries + 1):
+            self.waiting += 1
+            try:
+                waited = await self._throttle(chat_id)
+            finally:
+                self.waiting -= 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited > 0.01:
+                self.throttled += 1
+                logger.debug(f"{endpoint} to {chat_id} held back for {waited:.2f}s")
+            try:
+                result = await callback(*args, **kwargs)
+                if isinstance(chat_id, str):
+                    _learn_chat_id(raw_chat_id, result)
+                return result
+            except RetryAfter as e:
+                self.retry_after_hits += 1
+                if attempt == max_retries:
+                    raise
+                logger.warning(
+                    f"Rate limit hit on {endpoint}, pausing requests for {e.retry_after}s"
+                )
+                self._retry_after.clear()
+                try:
+                    await asyncio.sleep(float(e.retry_after) + 0.1)
+                finally:
+                    self._retry_after.set()
+
+    def metrics(self):
+        """snapshot of queue depth and wait-time counters."""
+        return {
+            "queue_depth": self.waiting,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "avg_wait": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait": self.max_wait,
+            "retry_after_hits": self.retry_after_hits,
+            "chat_buckets": len(self._chats),
+        }
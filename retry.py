@@ -0,0 +1,93 @@
+"""retry policy for the publish path.
+
+Transient Bot API failures are retried until a deadline. RetryAfter waits
+exactly as long as Telegram asks, timeouts and other network errors back
+off exponentially with full jitter. Anything else (bad request, bot is
+not an admin, ...) is raised right away.
+"""
+
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from config import (
+    PUBLISH_RETRY_BASE_DELAY,
+    PUBLISH_RETRY_DEADLINE,
+    PUBLISH_RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error):
+    """True for errors worth retrying (BadRequest subclasses NetworkError)."""
+    if isinstance(error, RetryAfter):
+        return True
+    return isinstance(error, NetworkError) and not isinstance(error, BadRequest)
+
+
+def retry_delay(error, attempt, base=PUBLISH_RETRY_BASE_DELAY, cap=PUBLISH_RETRY_MAX_DELAY):
+    """seconds to wait before retry number ``attempt`` (0-based)."""
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        if hasattr(retry_after, "total_seconds"):
+            retry_after = retry_after.total_seconds()
+        return float(retry_after) + 0.1
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+async def call_with_retry(func, *args, deadline=None, on_retry=None, **kwargs):
+    """await ``func`` and retry transient errors until ``deadline`` (monotonic).
+
+    ``on_retry(error, delay)`` is awaited before each retry.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + PUBLISH_RETRY_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            delay = retry_delay(e, attempt)
+            if time.monotonic() + delay > deadline:
+                raise
+            name = getattr(func, "__name__", repr(func))
+            logger.warning(f"{name} failed ({e!r}), retry {attempt + 1} in {delay:.1f}s")
+            if on_retry:
+                await on_retry(e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class RetryingBot:
+    """Bot proxy whose API methods go through call_with_retry.
+
+    Each call is retried on its own, so a failure in the middle of a
+    multi-message post does not resend the messages already delivered.
+    All calls made through one proxy share one deadline.
+    """
+
+    def __init__(self, bot, deadline=None, on_retry=None):
+        self._bot = bot
+        self._deadline = deadline or time.monotonic() + PUBLISH_RETRY_DEADLINE
+        self._on_retry = on_retry
+
+    def __getattr__(self, name):
+        attr = getattr(self._bot, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await call_with_retry(
+                attr, *args, deadline=self._deadline, on_retry=self._on_retry, **kwargs
+            )
+
+        return wrapper
@@ -15,17 +15,21 @@ from config import (
     EDIT_SCHEDULED_PHOTO,
     EDIT_SCHEDULED_BUTTONS,
     EDIT_SCHEDULED_TIME,
+    LIST_PAGE_SIZE,
     MAIN_MENU,
     VIEW_SCHEDULED,
 )
-from database import (
+from async_database import (
     delete_scheduled_post,
     get_job_id_by_post_id,
     get_scheduled_post_by_id,
-    get_scheduled_posts,
+    get_scheduled_posts_page,
+    job_id_for_post,
     update_scheduled_post,
 )
+import scheduled_jobs
 from handlers import PostHandlers
+from media_metadata import media_metadata
 from telegramcalendar import create_calendar, process_calendar_selection
 from utils import (
     cancel_keyboard,
@@ -35,11 +39,16 @@ from utils import (
     create_photo_management_keyboard,
     create_main_keyboard,
     entities_to_html,
+    media_item,
     parse_buttons,
+    parse_page_callback,
     photo_management_keyboard,
     photo_selection_keyboard,
+    scheduled_posts_page,
+    send_error_hint,
     skip_keyboard,
 )
+from validation import format_errors, validate_post
 
 logger = logging.getLogger(__name__)
 
@@ -50,39 +59,52 @@ class ScheduledPostHandlers:
         self.post_handlers = PostHandlers(bot_instance)
 
     # --- MANAGE SCHEDULED POSTS ---
+    async def _scheduled_posts_page(self, user_id, cursor=None, backward=False):
+        """render a page of the scheduled list, or None if there are no posts."""
+        rows, has_more = await get_scheduled_posts_page(
+            user_id, LIST_PAGE_SIZE, cursor, backward
+        )
+        if not rows and cursor is not None:
+            # the page was emptied (posts published or deleted) - start over
+            cursor, backward = None, False
+            rows, has_more = await get_scheduled_posts_page(user_id, LIST_PAGE_SIZE)
+        if not rows:
+            return None
+        if backward:
+            return scheduled_posts_page(rows, has_prev=has_more, has_next=True)
+        return scheduled_posts_page(rows, has_prev=cursor is not None, has_next=has_more)
+
     async def view_scheduled_posts(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
-        posts = get_scheduled_posts(update.effective_user.id)
+        page = await self._scheduled_posts_page(update.effective_user.id)
 
-        if not posts:
+        if not page:
             await update.message.reply_text("📅 У вас немає запланованих постів.")
             return MAIN_MENU
 
-        for post in posts:
-            post_id, time, channel, text = post
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "✏️ Редагувати", callback_data=f"edit_scheduled_{post_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "⬆️ Опублікувати зараз", callback_data=f"publish_now_{post_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🗑️ Видалити пост", callback_data=f"cancel_scheduled_{post_id}"
-                    )
-                ],
-            ]
-            await update.message.reply_text(
-                f"🕒 **{time}** -> **{channel}**\n\n{text[:200]}...",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
+        text, keyboard = page
+        await update.message.reply_text(text, reply_markup=keyboard, parse_mode="HTML")
+        return VIEW_SCHEDULED
+
+    async def scheduled_posts_page_handler(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ):
+        """switch the scheduled list message to the previous/next page."""
+        query = update.callback_query
+        await query.answer()
+        backward, key = parse_page_callback(query.data)
+        publish_time, post_id = key.rsplit("_", 1)
+
+        page = await self._scheduled_posts_page(
+            update.effective_user.id, (publish_time, int(post_id)), backward
+        )
+        if not page:
+            await query.edit_message_text("📅 У вас немає запланованих постів.")
+            return VIEW_SCHEDULED
+
+        text, keyboard = page
+        await query.edit_message_text(text, reply_markup=keyboard, parse_mode="HTML")
         return VIEW_SCHEDULED
 
     async def edit_scheduled_post_start(
@@ -95,43 +117,28 @@ class ScheduledPostHandlers:
 
         context.user_data["editing_post_id"] = post_id
 
-        post_data = get_scheduled_post_by_id(post_id)
+        post_data = await get_scheduled_post_by_id(post_id)
 
         if not post_data:
             await query.edit_message_text("❌ Post not found.")
             return VIEW_SCHEDULED
 
-        text, photo_id, buttons, publish_time, channel_id, layout = post_data
-
-        photos = []
-        if photo_id:
-            try:
-                photos = eval(photo_id) if photo_id.startswith("[") else [photo_id]
-            except Exception:
-                photos = [photo_id]
-        parsed_buttons = []
-        if buttons:
-            try:
-                import json
-
-                parsed_buttons = json.loads(buttons) if buttons else []
-            except Exception as e:
-                logger.warning(f"Failed to parse buttons: {e}, buttons: {buttons}")
-                parsed_buttons = []
+        text, media, buttons, publish_time, channel_id, layout = post_data
 
         context.user_data["editing_post"] = {
             "text": text,
-            "photos": photos,
-            "buttons": parsed_buttons,
+            "media": media,
+            "buttons": buttons,
             "time": datetime.fromisoformat(publish_time),
             "channel_id": channel_id,
+            "layout": layout or "photo_top",
         }
 
         await query.edit_message_text(
             "✏️ **РЕДАГУВАННЯ ПОСТА**\n\n"
             f"**Текст:** {text[:100]}{'...' if len(text) > 100 else ''}\n"
-            f"**Фото:** {'✅' if photos else '❌'}\n"
-            f"**Кнопки:** {len(parsed_buttons)}\n"
+            f"**Фото:** {'✅' if media else '❌'}\n"
+            f"**Кнопки:** {len(buttons)}\n"
             f"**Час публікації:** {publish_time}\n"
             f"**Канал:** {channel_id}\n\n"
             "Що хочете редагувати?",
@@ -146,13 +153,10 @@ class ScheduledPostHandlers:
         query = update.callback_query
         post_id = int(query.data.split("_")[-1])
 
-        job_id = get_job_id_by_post_id(post_id)
+        job_id = await get_job_id_by_post_id(post_id)
         if job_id:
-            try:
-                self.bot.scheduler.remove_job(job_id)
-            except:
-                pass  # Job may not exist
-            delete_scheduled_post(post_id)
+            self.bot.unschedule_post(job_id)
+            await delete_scheduled_post(post_id)
             await query.edit_message_text("✅ Публікацію скасовано.")
 
             await self.show_scheduled_posts_after_callback(update, context)
@@ -168,49 +172,40 @@ class ScheduledPostHandlers:
         await query.answer()
         post_id = int(query.data.split("_")[-1])
 
-        post_data = get_scheduled_post_by_id(post_id)
-
-        if not post_data:
+        if not await get_scheduled_post_by_id(post_id):
             await query.edit_message_text("❌ Post not found.")
             return VIEW_SCHEDULED
 
-        text, photo_id, buttons, publish_time, channel_id, layout = post_data
-
-        photos = []
-        if photo_id:
-            try:
-                photos = eval(photo_id) if photo_id.startswith("[") else [photo_id]
-            except Exception:
-                photos = [photo_id]
-
-        parsed_buttons = []
-        if buttons:
-            try:
-                import json
-
-                parsed_buttons = json.loads(buttons) if buttons else []
-            except Exception as e:
-                logger.warning(f"Failed to parse buttons: {e}, buttons: {buttons}")
-                parsed_buttons = []
-
-        post_data_dict = {"text": text, "photos": photos, "buttons": parsed_buttons, "layout": layout or "photo_top"}
-
-        await self.post_handlers.send_post_job(
-            channel_id, post_data_dict, update.effective_user.id, context
+        # sent from a task, so the update does not wait for the queue and retries
+        await query.edit_message_text("⏳ Пост у черзі на публікацію...")
+        context.application.create_task(
+            self._publish_now_in_background(update, context, post_id), update=update
         )
+        return VIEW_SCHEDULED
 
-        job_id = get_job_id_by_post_id(post_id)
-        if job_id:
-            try:
-                self.bot.scheduler.remove_job(job_id)
-            except:
-                pass  # Job may not exist
-        delete_scheduled_post(post_id)
-
-        await query.edit_message_text("✅ Пост опубліковано зараз!")
+    async def _publish_now_in_background(self, update, context, post_id):
+        """publish a scheduled post now and report the result to the author."""
+        query = update.callback_query
+        try:
+            # claims the post first, so it cannot also go out from its scheduled job
+            # the error is reported by editing this message, not also by send_post_job
+            published = await scheduled_jobs.publish_scheduled_post(
+                post_id, context=context, notify_failure=False
+            )
+        except Exception as e:
+            # the post stays scheduled for its original time
+            logger.error(f"Failed to publish scheduled post {post_id} now: {e}")
+            await query.edit_message_text(
+                f"❌ Не вдалося опублікувати пост. {send_error_hint(e)}"
+            )
+        else:
+            self.bot.unschedule_post(job_id_for_post(post_id))
+            if published:
+                await query.edit_message_text("✅ Пост опубліковано зараз!")
+            else:
+                await query.edit_message_text("ℹ️ Цей пост вже публікується.")
 
         await self.show_scheduled_posts_after_callback(update, context)
-        return VIEW_SCHEDULED
 
     # --- EDIT SCHEDULED POSTS ---
     async def edit_post_menu_handler(
@@ -271,7 +266,7 @@ class ScheduledPostHandlers:
         await query.answer()
         
         editing_post = context.user_data.get("editing_post", {})
-        photos = editing_post.get("photos") or []
+        photos = editing_post.get("media") or []
 
         if not photos:
             await query.message.reply_text(
@@ -318,14 +313,14 @@ class ScheduledPostHandlers:
 
         data = query.data
         editing_post = context.user_data.get("editing_post", {})
-        photos = editing_post.get("photos", [])
+        photos = editing_post.get("media", [])
 
         if data.startswith("photo_del_scheduled_"):
             # delete photo
             idx = int(data.split("_")[-1])
             if 0 <= idx < len(photos):
                 deleted_photo = photos.pop(idx)
-                editing_post["photos"] = photos
+                editing_post["media"] = photos
                 context.user_data["editing_post"] = editing_post
                 await query.answer(f"Видалено фото {idx + 1}")
 
@@ -432,9 +427,11 @@ class ScheduledPostHandlers:
     ):
         """add new photo to editing post."""
         editing_post = context.user_data.get("editing_post", {})
-        photos = editing_post.get("photos") or []
-        photos.append(update.message.photo[-1].file_id)
-        editing_post["photos"] = photos
+        photos = editing_post.get("media") or []
+        photo = update.message.photo[-1]
+        await media_metadata.record(photo, "photo")
+        photos.append(media_item(photo, "photo"))
+        editing_post["media"] = photos
         context.user_data["editing_post"] = editing_post
 
         await update.message.reply_text(
@@ -452,11 +449,11 @@ class ScheduledPostHandlers:
         photo_num = int(message_text.split()[-1]) - 1  # Convert to 0-based index
 
         editing_post = context.user_data.get("editing_post", {})
-        photos = editing_post.get("photos") or []
+        photos = editing_post.get("media") or []
 
         if 0 <= photo_num < len(photos):
             deleted_photo = photos.pop(photo_num)
-            editing_post["photos"] = photos
+            editing_post["media"] = photos
             context.user_data["editing_post"] = editing_post
 
             await update.message.reply_text(
@@ -482,7 +479,7 @@ class ScheduledPostHandlers:
     ):
         """preview photos being edited."""
         editing_post = context.user_data.get("editing_post", {})
-        photos = editing_post.get("photos", [])
+        photos = editing_post.get("media", [])
 
         if not photos:
             await update.message.reply_text("❌ Немає фото для перегляду!")
@@ -491,14 +488,15 @@ class ScheduledPostHandlers:
         try:
             if len(photos) == 1:
                 await update.effective_message.reply_photo(
-                    photo=photos[0], caption=f"📸 Попередній перегляд фото (1 з 1)"
+                    photo=photos[0]["file_id"], caption=f"📸 Попередній перегляд фото (1 з 1)"
                 )
             else:
                 # Send media group for multiple photos
                 from telegram import InputMediaPhoto
 
                 media = []
-                for idx, fid in enumerate(photos):
+                for idx, item in enumerate(photos):
+                    fid = item["file_id"]
                     if idx == 0:
                         media.append(
                             InputMediaPhoto(
@@ -520,8 +518,8 @@ class ScheduledPostHandlers:
     ):
         """delete all photos from editing post."""
         editing_post = context.user_data.get("editing_post", {})
-        photos_count = len(editing_post.get("photos", []))
-        editing_post["photos"] = []  # Remove all photos
+        photos_count = len(editing_post.get("media", []))
+        editing_post["media"] = []  # Remove all photos
         context.user_data["editing_post"] = editing_post
 
         await update.message.reply_text(
@@ -535,7 +533,7 @@ class ScheduledPostHandlers:
     async def skip_photo_edit(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """skip photo editing."""
         editing_post = context.user_data.get("editing_post", {})
-        editing_post["photos"] = []  # Remove all photos
+        editing_post["media"] = []  # Remove all photos
         context.user_data["editing_post"] = editing_post
 
         await update.message.reply_text("✅ Фото пропущено!")
@@ -627,7 +625,7 @@ class ScheduledPostHandlers:
         editing_post = context.user_data.get("editing_post", {})
 
         text = editing_post.get("text", "")
-        photos = editing_post.get("photos", [])
+        photos = editing_post.get("media", [])
         buttons = editing_post.get("buttons", [])
         time = editing_post.get("time", "")
         channel_id = editing_post.get("channel_id", "")
@@ -661,39 +659,27 @@ class ScheduledPostHandlers:
             )
             return VIEW_SCHEDULED
 
-        # first remove old job from scheduler
-        old_job_id = get_job_id_by_post_id(post_id)
-        if old_job_id:
-            try:
-                self.bot.scheduler.remove_job(old_job_id)
-            except:
-                pass  # Job may not exist
-
-        # add new job with updated time
-        new_job_id = (
-            f"post_{update.effective_user.id}_{int(datetime.now().timestamp())}"
-        )
-        self.bot.scheduler.add_job(
-            self.post_handlers.send_post_job,
-            "date",
-            run_date=editing_post["time"],
-            args=[editing_post["channel_id"], editing_post, update.effective_user.id],
-            id=new_job_id,
-        )
+        errors = validate_post(editing_post)
+        if errors:
+            await query.edit_message_text(format_errors(errors))
+            await query.message.reply_text(
+                "Що хочете редагувати?", reply_markup=create_edit_menu_keyboard()
+            )
+            return EDIT_SCHEDULED_POST
 
         # update record in db
-        update_scheduled_post(
+        media = editing_post.get("media") or []
+        await update_scheduled_post(
             post_id,
             editing_post["text"],
-            (
-                str(editing_post.get("photos", []))
-                if editing_post.get("photos") is not None
-                else None
-            ),
+            media,
+            media[0]["type"] if media else None,
             editing_post["buttons"],
             editing_post["time"],
-            new_job_id,
+            editing_post.get("layout"),
         )
+        # the job reads the post from db, so replace it after the update
+        self.bot.schedule_post(job_id_for_post(post_id), post_id, editing_post["time"])
 
         # clear editing data
         context.user_data.pop("editing_post", None)
@@ -709,9 +695,9 @@ class ScheduledPostHandlers:
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
         """show list of scheduled posts after callback query."""
-        posts = get_scheduled_posts(update.effective_user.id)
+        page = await self._scheduled_posts_page(update.effective_user.id)
 
-        if not posts:
+        if not page:
             await context.bot.send_message(
                 chat_id=update.effective_user.id,
                 text="📅 У вас немає запланованих постів.",
@@ -727,31 +713,13 @@ class ScheduledPostHandlers:
             parse_mode="Markdown",
         )
 
-        for post in posts:
-            post_id, time, channel, text = post
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "✏️ Редагувати", callback_data=f"edit_scheduled_{post_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "⬆️ Опублікувати зараз", callback_data=f"publish_now_{post_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🗑️ Видалити пост", callback_data=f"cancel_scheduled_{post_id}"
-                    )
-                ],
-            ]
-            await context.bot.send_message(
-                chat_id=update.effective_user.id,
-                text=f"🕒 **{time}** -> **{channel}**\n\n{text[:200]}...",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
+        text, keyboard = page
+        await context.bot.send_message(
+            chat_id=update.effective_user.id,
+            text=text,
+            reply_markup=keyboard,
+            parse_mode="HTML",
+        )
 
     async def edit_scheduled_layout(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Edit scheduled post layout."""
@@ -0,0 +1,232 @@
+"""scheduler jobs that publish scheduled posts.
+
+A job only carries the post id; the post is loaded from scheduled_posts
+when the job fires, so nothing in the job store can go stale and jobs
+survive a restart (see jobstore.SQLiteJobStore). reconcile_jobs() brings
+the job store in line with scheduled_posts at startup.
+
+Before sending, a job claims the post in publish_ledger and marks it sent
+as soon as Telegram accepted it, so a post is never sent twice by jobs
+that overlap (a retried or duplicated job, "publish now" racing the
+scheduled run). A claim left by a crashed process is released on startup.
+"""
+
+import logging
+import os
+import socket
+from datetime import datetime
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.triggers.date import DateTrigger
+
+import database
+from async_database import (
+    claim_publish,
+    delete_scheduled_post,
+    finish_publish_attempt,
+    get_publish_ledger,
+    get_scheduled_post_for_job,
+    mark_publish_sent,
+    release_publish_claim,
+    start_publish_attempt,
+)
+from config import (
+    PUBLISH_CLAIM_LEASE,
+    SCHEDULE_CATCHUP_MAX_LATENESS,
+    SCHEDULE_CATCHUP_POLICY,
+)
+
+logger = logging.getLogger(__name__)
+
+_channel_bot = None
+
+# owner of the publish claims taken by this process
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def setup(channel_bot):
+    """register the ChannelBot used by publish jobs."""
+    global _channel_bot
+    _channel_bot = channel_bot
+
+
+async def publish_scheduled_post(post_id, expected_time=None, context=None, notify_failure=True):
+    """job target: publish a scheduled post and drop it from the queue.
+
+    When ``expected_time`` is given the post is only published if it is
+    still scheduled for that time (it may have been edited meanwhile).
+    Returns True if this call published the post, False if it was skipped
+    because it is gone, was rescheduled or is published by someone else.
+    ``notify_failure`` is passed on to send_post_job.
+    """
+    post = await get_scheduled_post_for_job(post_id)
+    if post is None:
+        logger.warning(f"Scheduled post {post_id} no longer exists, skipping")
+        return False
+    user_id, channel_id, publish_time, post_data = post
+    if expected_time is not None and datetime.fromisoformat(str(publish_time)) != expected_time:
+        logger.info(f"Scheduled post {post_id} was rescheduled, skipping stale run")
+        return False
+
+    async def send():
+        attempt = await claim_publish(post_id, _OWNER, PUBLISH_CLAIM_LEASE)
+        if attempt is None:
+            ledger = await get_publish_ledger(post_id)
+            if ledger and ledger[1] == "sent":
+                # sent, but the process stopped before the row was deleted
+                logger.info(f"Scheduled post {post_id} was already sent, removing it")
+                await delete_scheduled_post(post_id)
+            else:
+                logger.info(f"Scheduled post {post_id} is published elsewhere, skipping")
+            return False
+
+        # every attempt is logged so a post cut off by a crash is retried on startup
+        attempt_id = await start_publish_attempt(post_id)
+        sent = False
+
+        async def on_retry(error, delay):
+            nonlocal attempt_id
+            await finish_publish_attempt(attempt_id, "retry", repr(error))
+            attempt_id = await start_publish_attempt(post_id)
+
+        async def on_sent(message):
+            nonlocal sent
+            sent = True
+            await mark_publish_sent(post_id, attempt, getattr(message, "message_id", None))
+
+        try:
+            await _channel_bot.post_handlers.send_post_job(
+                channel_id,
+                post_data,
+                user_id,
+                context,
+                on_retry=on_retry,
+                on_sent=on_sent,
+                notify_failure=notify_failure,
+            )
+        except Exception as e:
+            if not sent:
+                await finish_publish_attempt(attempt_id, "failed", repr(e))
+                await release_publish_claim(post_id, attempt)
+                raise
+            # only the bookkeeping after the channel send failed
+            logger.exception(f"Scheduled post {post_id} was sent but not fully recorded")
+        else:
+            if not sent:
+                await mark_publish_sent(post_id, attempt)
+        await finish_publish_attempt(attempt_id, "sent")
+        await delete_scheduled_post(post_id)
+        return True
+
+    # posts to one channel go out one at a time (see publish_queue.py)
+    return await _channel_bot.publish_queue.run(channel_id, send)
+
+
+def release_orphaned_claims():
+    """release publish claims of processes on this host that no longer run.
+
+    Call once at startup; claims of other hosts expire with their lease.
+    """
+    released = 0
+    for post_id, attempt, owner in database.get_open_claims():
+        host, _, pid = owner.rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit() or owner == _OWNER:
+            continue
+        try:
+            os.kill(int(pid), 0)
+            continue
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            # the process exists but belongs to another user
+            continue
+        database.release_publish_claim(post_id, attempt)
+        released += 1
+    if released:
+        logger.info(f"Released {released} publish claims of stopped processes")
+
+
+def schedule_post(scheduler, job_id, post_id, run_date):
+    """add (or replace) the publish job of a saved scheduled post."""
+    scheduler.add_job(
+        publish_scheduled_post,
+        "date",
+        run_date=run_date,
+        args=[post_id],
+        id=job_id,
+        replace_existing=True,
+        # a job delayed by a busy loop still has to publish
+        misfire_grace_time=None,
+    )
+
+
+def unschedule_post(scheduler, job_id):
+    """remove a publish job if it is still pending."""
+    try:
+        scheduler.remove_job(job_id)
+    except JobLookupError:
+        pass
+
+
+def _build_job(scheduler, job_id, post_id, run_date):
+    trigger = DateTrigger(run_date, timezone=scheduler.timezone)
+    return Job(
+        scheduler,
+        id=job_id,
+        func=publish_scheduled_post,
+        trigger=trigger,
+        executor="default",
+        args=(post_id,),
+        kwargs={},
+        name=publish_scheduled_post.__name__,
+        misfire_grace_time=None,
+        coalesce=True,
+        max_instances=1,
+        next_run_time=trigger.run_date,
+    )
+
+
+def reconcile_jobs(scheduler, jobstore, now=None):
+    """sync the job store with scheduled_posts (call before scheduler.start()).
+
+    Posts without a job get one, jobs without a post are dropped, and posts
+    whose time passed while the bot was down are handled according to
+    SCHEDULE_CATCHUP_POLICY, except those whose publish was interrupted by
+    a crash, which are always retried. Everything is read and written in
+    bulk.
+    """
+    now = now or datetime.now()
+    release_orphaned_claims()
+    interrupted = {post_id for post_id, _ in database.recover_interrupted_attempts()}
+    existing = jobstore.get_job_ids()
+    keep = set()
+    new_jobs = []
+    skipped = 0
+
+    for post_id, job_id, publish_time in database.get_pending_schedule():
+        run_date = datetime.fromisoformat(str(publish_time))
+        if run_date <= now:
+            lateness = (now - run_date).total_seconds()
+            # a publish cut off by a crash is always finished
+            if post_id in interrupted:
+                pass
+            elif SCHEDULE_CATCHUP_POLICY != "run" or lateness > SCHEDULE_CATCHUP_MAX_LATENESS:
+                skipped += 1
+                continue
+            run_date = now
+        elif job_id in existing:
+            keep.add(job_id)
+            continue
+        keep.add(job_id)
+        new_jobs.append(_build_job(scheduler, job_id, post_id, run_date))
+
+    orphaned = existing - keep
+    if orphaned:
+        jobstore.remove_jobs(orphaned)
+    if new_jobs:
+        jobstore.add_jobs(new_jobs)
+    logger.info(
+        f"Scheduler reconciled: {len(keep)} jobs, {len(new_jobs)} (re)created, "
+        f"{len(orphaned)} orphaned removed, {skipped} missed posts skipped"
+    )
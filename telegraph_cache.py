@@ -0,0 +1,103 @@
+"""cache of telegra.ph urls for the photo_bottom layout.
+
+A photo shown under the text is uploaded to telegra.ph and linked as the
+message preview. The upload (download from Telegram, re-encode, upload)
+only has to happen once per photo: urls are cached by file_unique_id,
+which stays the same for a file across bots and file_ids, in an LRU in
+memory backed by the telegraph_urls table. Concurrent lookups of the same
+photo share one upload.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from async_database import get_telegraph_url, save_telegraph_url
+from config import TELEGRAPH_CACHE_SIZE
+from media_metadata import media_metadata
+from utils import upload_photo_to_telegraph_by_file_id
+
+logger = logging.getLogger(__name__)
+
+
+class TelegraphCache:
+    """file_unique_id -> telegra.ph url, in memory over the database."""
+
+    def __init__(self, size=TELEGRAPH_CACHE_SIZE):
+        self.size = size
+        self._urls = OrderedDict()
+        self._uploads = {}
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get_url(self, bot, media):
+        """telegra.ph url of a photo media item, uploading it on a miss.
+
+        Returns None if the upload failed (failures are not cached).
+        """
+        key = media.get("file_unique_id")
+        if not key:
+            # items saved before file_unique_id was stored
+            metadata = await media_metadata.get_by_file_id(media["file_id"])
+            key = metadata and metadata["file_unique_id"]
+        if not key:
+            try:
+                key = (await bot.get_file(media["file_id"])).file_unique_id
+            except Exception as e:
+                logger.error(f"Could not resolve {media['file_id']}: {e}")
+                return None
+
+        url = self._urls.get(key)
+        if url:
+            self._urls.move_to_end(key)
+            self.memory_hits += 1
+            return url
+
+        upload = self._uploads.get(key)
+        if upload is None:
+            upload = asyncio.ensure_future(self._load(bot, key, media))
+            self._uploads[key] = upload
+            upload.add_done_callback(lambda _: self._uploads.pop(key, None))
+        url = await asyncio.shield(upload)
+        if url:
+            self._remember(key, url)
+        return url
+
+    async def _load(self, bot, key, media):
+        url = await get_telegraph_url(key)
+        if url:
+            self.db_hits += 1
+            return url
+        self.misses += 1
+        metadata = await media_metadata.get(key)
+        if metadata is None and media.get("width"):
+            # photo items carry the size of the photo, which Telegram keeps as JPEG
+            metadata = {"mime_type": "image/jpeg", "width": media["width"], "height": media.get("height")}
+        url = await upload_photo_to_telegraph_by_file_id(bot, media["file_id"], metadata)
+        if url:
+            await save_telegraph_url(key, url)
+        logger.info(f"Telegraph cache miss for {key}: {self.metrics()}")
+        return url
+
+    def _remember(self, key, url):
+        self._urls[key] = url
+        self._urls.move_to_end(key)
+        while len(self._urls) > self.size:
+            self._urls.popitem(last=False)
+
+    def metrics(self):
+        """hit/miss counters (db hits are memory misses served without upload)."""
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "hits": self.memory_hits + self.db_hits,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+            "size": len(self._urls),
+        }
+
+
+# shared by previews and publishing
+telegraph_cache = TelegraphCache()
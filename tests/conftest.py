@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def db(tmp_path_factory):
+    """one migrated database for the whole run (the pool is process-wide)."""
+    database.init_db(str(tmp_path_factory.mktemp("db") / "test.db"))
+    yield
+    database.close_db()
+
+
+@pytest.fixture
+def clean_db():
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM scheduled_posts")
+        conn.execute("DELETE FROM publish_ledger")
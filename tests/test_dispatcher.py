@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import database
+import dispatcher
+from dispatcher import DuePostDispatcher
+
+
+def insert_post(publish_time):
+    with database.transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO scheduled_posts (user_id, text, publish_time, channel_id, job_id) VALUES (1, 'text', ?, '@test', ?)",
+            (str(publish_time), f"test_{publish_time}"),
+        )
+        return cursor.lastrowid
+
+
+def test_failed_past_due_posts_do_not_hide_later_posts(clean_db, monkeypatch):
+    window = 3
+    now = datetime.now()
+    failing = {insert_post(now - timedelta(minutes=10, seconds=-i)) for i in range(window + 2)}
+    future = insert_post(now + timedelta(seconds=0.3))
+    published = []
+
+    async def publish_scheduled_post(post_id, expected_time=None, context=None):
+        if post_id in failing:
+            raise RuntimeError("send failed")
+        published.append(post_id)
+        return True
+
+    monkeypatch.setattr(dispatcher, "SCHEDULE_CATCHUP_POLICY", "run")
+    monkeypatch.setattr(dispatcher, "SCHEDULE_CATCHUP_MAX_LATENESS", 3600)
+    monkeypatch.setattr(
+        dispatcher.scheduled_jobs, "publish_scheduled_post", publish_scheduled_post
+    )
+
+    async def run():
+        due = DuePostDispatcher(window=window, refill_interval=0.05)
+        due.start()
+        try:
+            for _ in range(100):
+                if published:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await due.stop()
+        return due
+
+    due = asyncio.run(run())
+    assert published == [future]
+    assert due._failed == failing
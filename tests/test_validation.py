@@ -0,0 +1,25 @@
+import pytest
+
+from validation import markdown_errors, validate_text
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "*bold* _italic_ `code`",
+        "```x_y * z```",
+        "[link](https://example.com) and \\_escaped\\*",
+        "**double** markers",
+    ],
+)
+def test_balanced_markdown_passes(text):
+    assert markdown_errors(text) == []
+    assert validate_text(text) == []
+
+
+@pytest.mark.parametrize(
+    "text", ["hi_there_*", "snake_case", "`code", "```pre", "[link](https://"]
+)
+def test_unclosed_markdown_is_an_error(text):
+    assert markdown_errors(text)
+    assert [error["code"] for error in validate_text(text)] == ["invalid_markdown"]
@@ -1,6 +1,10 @@
+import html
+import inspect
 import logging
+import re
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
 
 # configure logging
 logging.basicConfig(
@@ -9,101 +13,83 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def _is_valid_html_markup(sample: str) -> bool:
-    """Very small validator for Telegram-supported HTML.
-
-    Checks balanced pairs for a limited set of tags to avoid
-    BadRequest: Can't parse entities errors when using parse_mode='HTML'.
-    This is intentionally simple and conservative.
-    """
-    import re
-
-    # Normalize tags like <a href="..."> to just <a>
-    normalized = re.sub(r"<a\s+[^>]*>", "<a>", sample, flags=re.IGNORECASE)
-
-    # Supported paired tags
-    paired_tags = [
-        "b", "strong", "i", "em", "u", "s", "strike", "code",
-        "pre", "a", "tg-spoiler", "blockquote",
-    ]
+# tags Telegram accepts with parse_mode="HTML"
+_HTML_TAGS = frozenset(
+    {
+        "b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "span",
+        "tg-spoiler", "a", "tg-emoji", "code", "pre", "blockquote",
+    }
+)
+# one token per start/end tag: (closing slash, tag name)
+_HTML_TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9\-]*)[^<>]*>")
 
-    for tag in paired_tags:
-        opens = len(re.findall(fr"<\s*{tag}\s*>", normalized, flags=re.IGNORECASE))
-        closes = len(re.findall(fr"</\s*{tag}\s*>", normalized, flags=re.IGNORECASE))
-        if opens != closes:
-            return False
 
-    # Basic check for unexpected end tags without any opening tag
-    # e.g. stray </i>
-    for m in re.finditer(r"</\s*([a-zA-Z\-]+)\s*>", normalized):
-        tag = m.group(1).lower()
-        if tag in paired_tags:
-            # Ensure there is at least one opening tag before this position
-            before = normalized[: m.start()]
-            if not re.search(fr"<\s*{tag}\b", before, flags=re.IGNORECASE):
-                return False
+def _scan_html(sample: str):
+    """Check Telegram-supported HTML in one pass.
 
-    return True
+    Tags are matched with a stack, so unclosed, stray and crossed tags are
+    all found. Returns (whether any supported tag was seen, errors).
+    """
+    stack = []
+    errors = []
+    found = False
+    for closing, tag in _HTML_TAG_RE.findall(sample):
+        tag = tag.lower()
+        if tag not in _HTML_TAGS:
+            errors.append(f"непідтримуваний тег <{tag}>")
+            continue
+        found = True
+        if not closing:
+            stack.append(tag)
+        elif stack and stack[-1] == tag:
+            stack.pop()
+        elif tag in stack:
+            # closes an outer tag while inner ones are still open
+            errors.append(f"</{tag}> закриває <{stack[-1]}>")
+            del stack[len(stack) - 1 - stack[::-1].index(tag):]
+        else:
+            errors.append(f"зайвий </{tag}>")
+    errors.extend(f"незакритий тег <{tag}>" for tag in stack)
+    return found, errors
 
 
-def detect_parse_mode(text: str):
-    """Return appropriate Telegram parse_mode for given text or None.
+def analyze_markup(text: str):
+    """Return (parse_mode, errors) for the given text.
 
-    Heuristics:
-    - If HTML-like tags are present AND markup looks valid, use 'HTML'.
-    - Else if common Markdown markers are present, use 'Markdown'.
-    - Else return None (plain text).
+    - If supported HTML tags are present, the parse mode is 'HTML' when the
+      markup is valid, otherwise None and the errors say what is wrong.
+    - Else if common Markdown markers are present, 'Markdown'.
+    - Else None (plain text).
 
-    Supported HTML tags: <b>, <strong>, <i>, <em>, <u>, <s>, <strike>,
-    <code>, <pre>, <a href="">, <blockquote>, <tg-spoiler>.
+    Supported HTML tags: <b>, <strong>, <i>, <em>, <u>, <ins>, <s>,
+    <strike>, <del>, <span class="tg-spoiler">, <tg-spoiler>, <a href="">,
+    <tg-emoji>, <code>, <pre>, <blockquote>.
     """
     if not text:
-        return None
+        return None, []
 
     sample = text.strip()
+    if "<" in sample:
+        found, errors = _scan_html(sample)
+        if found:
+            return ("HTML" if not errors else None), errors
 
-    # Simple HTML detection
+    # Basic Markdown detection: **bold**, *, _, `code`, [text](url), # heading
     if (
-        "<b>" in sample
-        or "</b>" in sample
-        or "<strong>" in sample
-        or "</strong>" in sample
-        or "<i>" in sample
-        or "</i>" in sample
-        or "<em>" in sample
-        or "</em>" in sample
-        or "<u>" in sample
-        or "</u>" in sample
-        or "<s>" in sample
-        or "</s>" in sample
-        or "<strike>" in sample
-        or "</strike>" in sample
-        or "<a href=" in sample
-        or "</a>" in sample
-        or "<code>" in sample
-        or "</code>" in sample
-        or "<pre>" in sample
-        or "</pre>" in sample
-        or "<tg-spoiler>" in sample
-        or "</tg-spoiler>" in sample
-        or "<blockquote>" in sample
-        or "</blockquote>" in sample
+        "*" in sample
+        or "_" in sample
+        or "`" in sample
+        or "](" in sample
+        or sample.startswith("#")
     ):
-        return "HTML" if _is_valid_html_markup(sample) else None
+        return "Markdown", []
 
-    # Basic Markdown detection
-    if (
-        "**" in sample  # bold (some users enter double asterisks)
-        or "*" in sample  # bold/italic legacy
-        or "_" in sample  # italic/underline legacy
-        or "[`".strip() in sample
-        or "`" in sample  # inline code/backticks
-        or "](" in sample  # [text](url)
-        or sample.startswith("#")  # headings pasted as markdown
-    ):
-        return "Markdown"
+    return None, []
 
-    return None
+
+def detect_parse_mode(text: str):
+    """Return appropriate Telegram parse_mode for given text or None."""
+    return analyze_markup(text)[0]
 
 
 def entities_to_html(text: str, entities):
@@ -320,6 +306,124 @@ def create_schedule_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+_TAG_RE = re.compile(r"<[^>]*>?")
+
+
+def list_snippet(text, limit=60):
+    """one-line plain text preview of a post for list views."""
+    plain = " ".join(html.unescape(_TAG_RE.sub("", text or "")).split())
+    if not plain:
+        return "📷 Медіа"
+    return plain if len(plain) <= limit else plain[: limit - 1].rstrip() + "…"
+
+
+def _page_nav_row(prefix, prev_key, next_key):
+    nav = []
+    if prev_key is not None:
+        nav.append(InlineKeyboardButton("◀️ Назад", callback_data=f"{prefix}_prev_{prev_key}"))
+    if next_key is not None:
+        nav.append(InlineKeyboardButton("Далі ▶️", callback_data=f"{prefix}_next_{next_key}"))
+    return nav
+
+
+def scheduled_posts_page(rows, has_prev, has_next):
+    """text and keyboard of one page of the scheduled posts list.
+
+    rows are (id, publish_time, channel_id, text) as returned by
+    get_scheduled_posts_page; nav buttons carry the keyset cursor.
+    """
+    lines = ["📅 <b>Ваші відкладені пости:</b>"]
+    keyboard = []
+    for n, (post_id, publish_time, channel_id, text) in enumerate(rows, 1):
+        lines.append(
+            f"\n{n}. 🕒 <b>{html.escape(str(publish_time)[:16])}</b> → "
+            f"{html.escape(str(channel_id))}\n{html.escape(list_snippet(text))}"
+        )
+        keyboard.append(
+            [
+                InlineKeyboardButton(f"✏️ {n}", callback_data=f"edit_scheduled_{post_id}"),
+                InlineKeyboardButton(f"⬆️ {n}", callback_data=f"publish_now_{post_id}"),
+                InlineKeyboardButton(f"🗑️ {n}", callback_data=f"cancel_scheduled_{post_id}"),
+            ]
+        )
+    first, last = rows[0], rows[-1]
+    nav = _page_nav_row(
+        "sp",
+        f"{first[1]}_{first[0]}" if has_prev else None,
+        f"{last[1]}_{last[0]}" if has_next else None,
+    )
+    if nav:
+        keyboard.append(nav)
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+def published_posts_page(rows, has_prev, has_next):
+    """text and keyboard of one page of the published posts list.
+
+    rows are (id, channel_id, message_id, text) as returned by
+    get_published_posts_page.
+    """
+    lines = ["📋 <b>Ваші опубліковані пости:</b>"]
+    keyboard = []
+    for n, (post_id, channel_id, message_id, text) in enumerate(rows, 1):
+        lines.append(
+            f"\n{n}. 📝 <b>@{html.escape(str(channel_id))}</b> (ID: {message_id})\n"
+            f"{html.escape(list_snippet(text))}"
+        )
+        keyboard.append(
+            [
+                InlineKeyboardButton(f"👀 {n}", callback_data=f"preview_{message_id}_{channel_id}"),
+                InlineKeyboardButton(f"✏️ {n}", callback_data=f"editpublished_{message_id}_{channel_id}"),
+                InlineKeyboardButton(f"🗑️ {n}", callback_data=f"deletepublished_{message_id}_{channel_id}"),
+            ]
+        )
+    nav = _page_nav_row(
+        "pp",
+        rows[0][0] if has_prev else None,
+        rows[-1][0] if has_next else None,
+    )
+    if nav:
+        keyboard.append(nav)
+    return "\n".join(lines), InlineKeyboardMarkup(keyboard)
+
+
+def parse_page_callback(data):
+    """split 'xx_prev_<key>' / 'xx_next_<key>' into (backward, key)."""
+    _, direction, key = data.split("_", 2)
+    return direction == "prev", key
+
+
+def resolve_chat_id(channel_id):
+    """chat_id for Bot API calls from a stored channel (numeric id, @name or name)."""
+    s = str(channel_id).strip()
+    if s.lstrip("-").isdigit():
+        return int(s)
+    return f"@{s.lstrip('@')}"
+
+
+def send_error_hint(error):
+    """short explanation for the user of why sending to a channel failed."""
+    if isinstance(error, Forbidden):
+        return "Бот не має доступу до каналу. Перевірте, чи бот є адміністратором з правами на публікацію."
+    if isinstance(error, RetryAfter):
+        return f"Telegram тимчасово обмежив надсилання, спробуйте через {error.retry_after} с."
+    if isinstance(error, BadRequest):
+        return f"Telegram відхилив пост: {error.message}"
+    if isinstance(error, NetworkError):
+        return "Немає зв'язку з Telegram, спробуйте пізніше."
+    return "Перевірте, чи бот є адміністратором з правами на публікацію."
+
+
+def create_layout_keyboard():
+    """create keyboard for choosing photo position relative to text."""
+    keyboard = [
+        [InlineKeyboardButton("🖼 Фото зверху", callback_data="layout_photo_top")],
+        [InlineKeyboardButton("🖼 Фото під текстом", callback_data="layout_photo_bottom")],
+        [InlineKeyboardButton("🔙 Назад", callback_data="back_to_schedule")],
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
 def create_button_management_keyboard(buttons, context="new"):
     """create keyboard for managing buttons (add/delete)."""
     keyboard = []
@@ -413,6 +517,21 @@ def get_media_file_id(file):
     return None
 
 
+def media_item(file, media_type):
+    """build a stored media item from a PhotoSize/Video/Document."""
+    item = {"file_id": file.file_id, "type": media_type}
+    for key, attr in (
+        ("file_unique_id", "file_unique_id"),
+        ("width", "width"),
+        ("height", "height"),
+        ("size", "file_size"),
+    ):
+        value = getattr(file, attr, None)
+        if value is not None:
+            item[key] = value
+    return item
+
+
 def create_media_management_keyboard(media_list, context="new"):
     """create keyboard for managing media (add/delete)."""
     keyboard = []
@@ -464,110 +583,114 @@ def create_photo_management_keyboard(photos, context="new"):
     return InlineKeyboardMarkup(keyboard)
 
 
-async def upload_photo_to_telegraph_by_file_id(bot, file_id: str):
-    """Upload photo to Telegraph using raw urllib approach.
-    
-    Telegraph is very picky about multipart encoding, so we build it manually.
+# longest photo caption Telegram accepts
+CAPTION_LIMIT = 1024
+
+
+def use_native_photo_bottom(caption):
+    """True if a photo_bottom post can be one photo with the caption above it."""
+    from config import PHOTO_BOTTOM_MODE
+
+    return PHOTO_BOTTOM_MODE == "native" and len(caption or "") <= CAPTION_LIMIT
+
+
+def caption_above_media_kwargs():
+    """send_photo kwargs that show the caption above the photo."""
+    if "show_caption_above_media" in inspect.signature(Bot.send_photo).parameters:
+        return {"show_caption_above_media": True}
+    # python-telegram-bot before 21.2 has no parameter for it yet
+    return {"api_kwargs": {"show_caption_above_media": True}}
+
+
+class _KeepBytes:
+    """write() target that keeps the downloaded bytes object as is."""
+
+    data = b""
+
+    def write(self, data):
+        self.data = data
+
+
+# chunk size of the streamed upload body
+_UPLOAD_CHUNK = 64 * 1024
+
+
+def multipart_file_body(boundary, field, filename, content_type, data):
+    """stream a one-file multipart/form-data body.
+
+    Returns (length, chunks): the file is sent as memoryview slices of
+    ``data``, so the body is never joined into one copy.
+    """
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    view = memoryview(data)
+
+    async def chunks():
+        yield head
+        for offset in range(0, len(view), _UPLOAD_CHUNK):
+            yield view[offset : offset + _UPLOAD_CHUNK]
+        yield tail
+
+    return len(head) + len(view) + len(tail), chunks()
+
+
+def _fits_image_host(metadata):
+    """True if the metadata shows a JPEG no larger than IMAGE_MAX_SIDE."""
+    from config import IMAGE_MAX_SIDE
+
+    if not metadata or metadata.get("mime_type") != "image/jpeg":
+        return False
+    width, height = metadata.get("width"), metadata.get("height")
+    return bool(width and height) and max(width, height) <= IMAGE_MAX_SIDE
+
+
+async def upload_photo_to_telegraph_by_file_id(bot, file_id: str, metadata=None):
+    """Upload a Telegram photo to the image host and return its url.
+
+    The host is telegra.ph unless IMAGE_HOST says otherwise (see
+    image_hosts.py). ``metadata`` (see media_metadata.py) lets a JPEG that
+    is already small enough skip re-encoding. Returns None if anything fails.
     """
     import logging
-    from io import BytesIO
-    from PIL import Image
-    import httpx
-    import uuid
+
+    import image_hosts
+    import image_pool
     
     logger = logging.getLogger(__name__)
     
     try:
-        # 1) Download file
+        # 1) Download file, keeping the bytes object the request returned
         tg_file = await bot.get_file(file_id)
-        file_bytes = await tg_file.download_as_bytearray()
+        downloaded = _KeepBytes()
+        await tg_file.download_to_memory(downloaded)
+        file_bytes = downloaded.data
         
         logger.info(f"Downloaded: {len(file_bytes)} bytes")
 
-        # 2) Process with PIL
-        try:
-            img = Image.open(BytesIO(file_bytes))
-            img = img.convert("RGB")
-            
-            # Resize if too large
-            max_side = 1600
-            w, h = img.size
-            if max(w, h) > max_side:
-                ratio = max_side / max(w, h)
-                img = img.resize((int(w * ratio), int(h * ratio)), Image.Resampling.LANCZOS)
-
-            # Save as JPEG with good quality
-            buf = BytesIO()
-            img.save(buf, format="JPEG", quality=90, optimize=True)
-            jpeg_data = buf.getvalue()
-            
-            logger.info(f"JPEG: {len(jpeg_data)} bytes")
-                
-        except Exception as e:
-            logger.error(f"PIL failed: {e}")
-            jpeg_data = bytes(file_bytes)
-
-        # 3) Manual multipart/form-data encoding
-        boundary = f'----WebKitFormBoundary{uuid.uuid4().hex[:16]}'
-        
-        # Build multipart body manually
-        body_parts = []
-        
-        # Add file field
-        body_parts.append(f'--{boundary}'.encode())
-        body_parts.append(b'Content-Disposition: form-data; name="file"; filename="image.jpg"')
-        body_parts.append(b'Content-Type: image/jpeg')
-        body_parts.append(b'')
-        body_parts.append(jpeg_data)
-        
-        # End boundary
-        body_parts.append(f'--{boundary}--'.encode())
-        body_parts.append(b'')
-        
-        # Join with CRLF
-        body = b'\r\n'.join(body_parts)
-        
-        logger.info(f"Multipart body: {len(body)} bytes")
-        
-        # 4) Upload with manual headers
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                'https://telegra.ph/upload',
-                content=body,
-                headers={
-                    'Content-Type': f'multipart/form-data; boundary={boundary}',
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                    'Accept': '*/*',
-                    'Origin': 'https://telegra.ph',
-                    'Referer': 'https://telegra.ph/',
-                }
-            )
-            
-            logger.info(f"Response: {response.status_code}")
-            logger.info(f"Body: {response.text[:300]}")
-            
-            if response.status_code == 200:
-                import json
-                try:
-                    result = json.loads(response.text)
-                    
-                    if isinstance(result, list) and len(result) > 0:
-                        src = result[0].get('src')
-                        if src:
-                            url = f"https://telegra.ph{src}"
-                            logger.info(f"✓ Success: {url}")
-                            return url
-                    
-                    if isinstance(result, dict) and result.get('error'):
-                        logger.error(f"API error: {result['error']}")
-                        
-                except Exception as e:
-                    logger.error(f"Parse error: {e}")
-            else:
-                logger.error(f"HTTP {response.status_code}: {response.text}")
-        
+        # 2) Re-encode on the image pool, off the event loop
+        if _fits_image_host(metadata):
+            jpeg_data = file_bytes
+        else:
+            try:
+                jpeg_data = await image_pool.to_jpeg(file_bytes)
+                logger.info(f"JPEG: {len(jpeg_data)} bytes")
+            except Exception as e:
+                logger.error(f"PIL failed: {e}")
+                jpeg_data = file_bytes
+
+        # 3) Upload
+        host = image_hosts.get_image_host()
+        url = await host.upload(jpeg_data)
+        logger.info(f"✓ Uploaded to {host.name}: {url}")
+        return url
+
+    except image_hosts.ImageHostError as e:
+        logger.error(f"Upload failed: {e}")
         return None
-                
     except Exception as e:
         logger.error(f"Upload failed: {e}", exc_info=True)
         return None
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""local checks of a post against Bot API limits and formatting rules.
+
+A post that breaks a limit is otherwise only found out when the send call
+fails - for a scheduled post, at its publish time. The checks here need
+no network: posts are validated when the text is entered and again before
+they are sent or scheduled.
+
+Every check returns a list of errors, each a dict with ``code`` (stable,
+for logs), ``field`` (text/media/buttons) and ``message`` (shown to the
+author).
+"""
+
+import html
+import re
+from urllib.parse import urlsplit
+
+from utils import (
+    CAPTION_LIMIT,
+    analyze_markup,
+    clean_unsupported_formatting,
+    use_native_photo_bottom,
+)
+
+# longest text message Telegram accepts
+MESSAGE_LIMIT = 4096
+# items in one sendMediaGroup call
+MEDIA_GROUP_LIMIT = 10
+# buttons in one inline keyboard
+BUTTON_LIMIT = 100
+# url schemes inline keyboard buttons accept
+BUTTON_SCHEMES = ("http", "https", "tg")
+MEDIA_TYPES = ("photo", "video", "document")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_MARKDOWN_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+
+
+def _error(code, field, message):
+    return {"code": code, "field": field, "message": message}
+
+
+def markdown_errors(text):
+    """unclosed entities of legacy Markdown (*bold*, _italic_, `code`,
+    ```pre```, [text](url)), which Telegram rejects with "can't parse
+    entities". Entities do not nest, so everything up to the closing
+    marker is plain text; a backslash escapes a marker outside them."""
+    errors = []
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char == "\\" and i + 1 < n and text[i + 1] in "_*`[":
+            i += 2
+            continue
+        if text.startswith("```", i):
+            end = text.find("```", i + 3)
+            if end == -1:
+                errors.append(f"незакритий ``` (символ {i + 1})")
+                break
+            i = end + 3
+        elif char in "*_`":
+            end = text.find(char, i + 1)
+            if end == -1:
+                errors.append(f"незакритий {char} (символ {i + 1})")
+                break
+            i = end + 1
+        elif char == "[":
+            end = text.find("]", i + 1)
+            if end == -1:
+                errors.append(f"незакрита [ (символ {i + 1})")
+                break
+            i = end + 1
+            if text.startswith("(", i):
+                end = text.find(")", i + 1)
+                if end == -1:
+                    errors.append(f"незакрите посилання (символ {i + 1})")
+                    break
+                i = end + 1
+        else:
+            i += 1
+    return errors
+
+
+def visible_length(text, parse_mode=None):
+    """length of the text as Telegram counts it (markup removed)."""
+    if parse_mode == "HTML":
+        text = html.unescape(_TAG_RE.sub("", text))
+    elif parse_mode == "Markdown":
+        text = _MARKDOWN_LINK_RE.sub(r"\1", text)
+        text = re.sub(r"[*_`]", "", text)
+    return len(text)
+
+
+def send_method(post_data):
+    """the Bot API call send_post_job makes for the post ("telegraph" for the
+    photo_bottom link preview)."""
+    media = post_data.get("media") or []
+    photos = post_data.get("photos") or ([post_data["photo"]] if post_data.get("photo") else [])
+    text = clean_unsupported_formatting(post_data.get("text") or "")
+    if media:
+        if len(media) > 1:
+            if any(m.get("type") == "photo" for m in media):
+                return "send_media_group"
+            return f"send_{media[0].get('type')}"
+        if media[0].get("type") == "photo" and post_data.get("layout") == "photo_bottom":
+            return "send_photo" if use_native_photo_bottom(text) else "telegraph"
+        return f"send_{media[0].get('type')}"
+    if photos:
+        return "send_media_group" if len(photos) > 1 else "send_photo"
+    return "send_message"
+
+
+def validate_text(text, caption=False):
+    """errors of the post text on its own (markup, length); ``caption`` when
+    it is sent as a media caption."""
+    errors = []
+    text = clean_unsupported_formatting(text or "")
+    parse_mode, markup_errors = analyze_markup(text)
+    if markup_errors:
+        errors.append(
+            _error(
+                "invalid_html",
+                "text",
+                f"некоректна HTML-розмітка ({'; '.join(markup_errors[:3])}) - "
+                "виправте теги",
+            )
+        )
+    elif parse_mode == "Markdown":
+        markup_errors = markdown_errors(text)
+        if markup_errors:
+            errors.append(
+                _error(
+                    "invalid_markdown",
+                    "text",
+                    f"некоректна Markdown-розмітка ({markup_errors[0]}) - "
+                    "закрийте або екрануйте символ (\\*, \\_, \\`)",
+                )
+            )
+    length = visible_length(text, parse_mode)
+    if caption and length > CAPTION_LIMIT:
+        errors.append(
+            _error(
+                "caption_too_long",
+                "text",
+                f"підпис до медіа довший за {CAPTION_LIMIT} символів ({length})",
+            )
+        )
+    elif length > MESSAGE_LIMIT:
+        errors.append(
+            _error(
+                "text_too_long",
+                "text",
+                f"текст довший за {MESSAGE_LIMIT} символів ({length})",
+            )
+        )
+    return errors
+
+
+def validate_buttons(buttons):
+    """errors of the inline buttons (count, empty labels, urls)."""
+    errors = []
+    buttons = buttons or []
+    if len(buttons) > BUTTON_LIMIT:
+        errors.append(
+            _error("too_many_buttons", "buttons", f"кнопок більше ніж {BUTTON_LIMIT}")
+        )
+    for i, button in enumerate(buttons, 1):
+        text = (button.get("text") or "").strip()
+        url = (button.get("url") or "").strip()
+        if not text:
+            errors.append(_error("empty_button_text", "buttons", f"кнопка {i}: порожня назва"))
+        parts = urlsplit(url)
+        if (
+            parts.scheme.lower() not in BUTTON_SCHEMES
+            or not parts.netloc
+            or any(c.isspace() for c in url)
+        ):
+            errors.append(
+                _error(
+                    "invalid_button_url",
+                    "buttons",
+                    f"кнопка {i}: некоректне посилання {url!r} (потрібно https://...)",
+                )
+            )
+    return errors
+
+
+def validate_post(post_data):
+    """all errors of a post, as send_post_job would send it."""
+    media = post_data.get("media") or []
+    photos = post_data.get("photos") or ([post_data["photo"]] if post_data.get("photo") else [])
+    method = send_method(post_data)
+    errors = []
+
+    for item in media:
+        if item.get("type") not in MEDIA_TYPES or not item.get("file_id"):
+            errors.append(
+                _error("invalid_media", "media", f"невідомий тип медіа: {item.get('type')}")
+            )
+
+    group = [m for m in media if m.get("type") == "photo"] or photos
+    if method == "send_media_group":
+        if len(group) > MEDIA_GROUP_LIMIT:
+            errors.append(
+                _error(
+                    "too_many_media",
+                    "media",
+                    f"в альбомі більше ніж {MEDIA_GROUP_LIMIT} фото ({len(group)})",
+                )
+            )
+        if len(group) < len(media):
+            errors.append(
+                _error(
+                    "mixed_album",
+                    "media",
+                    "фото не можна поєднувати з відео чи документами в одному пості - "
+                    "надішліть їх окремими постами",
+                )
+            )
+
+    caption = method not in ("send_message", "telegraph")
+    errors.extend(validate_text(post_data.get("text"), caption))
+    errors.extend(validate_buttons(post_data.get("buttons")))
+    return errors
+
+
+def format_errors(errors):
+    """errors as a message for the author."""
+    return "❌ Пост не пройде перевірку Telegram:\n" + "\n".join(
+        f"• {error['message']}" for error in errors
+    )